@@ -0,0 +1,436 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from time import perf_counter
+import tempfile
+import argparse
+import pickle
+import random
+import sys
+import os
+
+import pandas as pd
+import numpy as np
+
+path_prefix = str(Path(__file__).parent.absolute())
+path_prefix += '/..'
+sys.path.insert(0, path_prefix)
+
+from src.utils.mindex import MultiIndex, ColumnarMultiIndex, ConcurrentMultiIndex, MultiIndexException
+from src.utils.msnapshot import MultiIndexSnapshot
+from src.utils.msearch import NameSearchIndex
+from src.utils.functional.prices import parse_aggregate_bars, merge_bars
+from src.storage.bars import BarStore
+from src.storage.panel import PricePanel
+
+
+def build_ticker_index(size: int) -> MultiIndex:
+    multi_index = MultiIndex(['ticker'], default_index_key='ticker', safe_mode=True)
+    for i in range(size):
+        multi_index.insert({
+            'ticker': 'T{}'.format(i),
+            'name': 'Company {}'.format(i),
+            'locale': 'US'
+        })
+    return multi_index
+
+
+def benchmark_mindex_iteration() -> None:
+    print('MultiIndex iteration (ns per record should stay flat as size grows):')
+    for size in [125000, 250000, 500000, 1000000]:
+        multi_index = build_ticker_index(size)
+
+        # time full iteration
+        start = perf_counter()
+        count = 0
+        for _ in multi_index:
+            count += 1
+        iteration_secs = perf_counter() - start
+
+        # time positional access
+        start = perf_counter()
+        for i in range(0, size, 1000):
+            multi_index[i]
+        positional_secs = perf_counter() - start
+
+        print('  {:>8} records: iteration {:.3f}s ({:.1f} ns/record), positional {:.1f} ns/access'.format(
+            count, iteration_secs, iteration_secs / count * 1e9, positional_secs / (size // 1000) * 1e9
+        ))
+
+
+def benchmark_mindex_memory() -> None:
+    print('MultiIndex memory footprint by backend (CIK lookup shaped records):')
+    for size in [100000, 500000]:
+        for cls in [MultiIndex, ColumnarMultiIndex]:
+            multi_index = cls(['cik'], default_index_key='cik', safe_mode=True)
+            start = perf_counter()
+            for i in range(size):
+                multi_index.insert({
+                    'cik': str(1000000 + i),
+                    'company_names': ['COMPANY {} INC'.format(i)],
+                    'state': 'DE'
+                })
+            build_secs = perf_counter() - start
+            
+            # time lookups
+            start = perf_counter()
+            for i in range(0, size, 100):
+                multi_index.get('cik', str(1000000 + i))
+            lookup_secs = perf_counter() - start
+
+            print('  {:>8} records, {:<18}: {:8.1f} MB, build {:.2f}s, {:.0f} ns/lookup'.format(
+                size, cls.__name__, multi_index.memory_usage() / 1e6, build_secs, lookup_secs / (size // 100) * 1e9
+            ))
+
+
+def benchmark_mindex_bulk_build() -> None:
+    print('MultiIndex bulk build vs per-row insert loop (10% duplicate rows):')
+    for index_keys in [['ticker'], ['ticker', 'cik']]:
+        for size in [100000, 1000000]:
+            records = [{'ticker': 'T{}'.format(i % (size - size // 10)), 'cik': str(i), 'name': 'Company {}'.format(i)} for i in range(size)]
+
+            # time per-row loop
+            start = perf_counter()
+            multi_index = MultiIndex(index_keys, default_index_key='ticker', safe_mode=True)
+            for record in records:
+                try:
+                    multi_index.insert(record)
+                except MultiIndexException:
+                    continue
+            loop_secs = perf_counter() - start
+
+            # time bulk build
+            start = perf_counter()
+            bulk_index, skipped = MultiIndex.from_records(records, index_keys, default_index_key='ticker', safe_mode=True,
+                                                          on_conflict='first', return_skipped=True)
+            bulk_secs = perf_counter() - start
+
+            assert bulk_index.get_all() == multi_index.get_all()
+            print('  {:>8} records, keys {:<18}: per-row {:.2f}s, from_records {:.2f}s ({:.1f}x), {} skipped'.format(
+                size, str(index_keys), loop_secs, bulk_secs, loop_secs / bulk_secs, len(skipped)
+            ))
+
+
+def benchmark_mindex_snapshot() -> None:
+    print('MultiIndex cold start, pickle load vs snapshot open (time to first lookup):')
+    for size in [100000, 1000000]:
+        multi_index = build_ticker_index(size)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            pickle_path, snapshot_path = os.path.join(tmp_dir, 'index.pkl'), os.path.join(tmp_dir, 'index.mvi')
+            with open(pickle_path, 'wb') as f: pickle.dump(multi_index, f)
+            MultiIndexSnapshot.write(multi_index, snapshot_path)
+
+            # time pickle load and lookup
+            start = perf_counter()
+            with open(pickle_path, 'rb') as f: loaded_index = pickle.load(f)
+            pickle_record = loaded_index.get('ticker', 'T{}'.format(size // 2))
+            pickle_secs = perf_counter() - start
+
+            # time snapshot open and lookup
+            start = perf_counter()
+            snapshot = MultiIndexSnapshot(snapshot_path)
+            snapshot_record = snapshot.get('ticker', 'T{}'.format(size // 2))
+            snapshot_secs = perf_counter() - start
+            snapshot.close()
+
+            assert snapshot_record == pickle_record
+            print('  {:>8} records: pickle {:.3f}s ({:.1f} MB), snapshot {:.5f}s ({:.1f} MB)'.format(
+                size, pickle_secs, os.path.getsize(pickle_path) / 1e6, snapshot_secs, os.path.getsize(snapshot_path) / 1e6
+            ))
+
+
+def benchmark_mindex_join() -> None:
+    print('MultiIndex per-row get vs batched get_many/join:')
+    for size in [100000, 1000000]:
+        left_index = build_ticker_index(size)
+        right_index = MultiIndex.from_records(
+            [{'ticker': 'T{}'.format(i), 'cusip': str(i).zfill(9)} for i in range(0, size, 2)],
+            ['ticker'], default_index_key='ticker', safe_mode=True
+        )
+        tickers = left_index.get_all_key_values('ticker')
+
+        # time per-row gets
+        start = perf_counter()
+        get_objs = [right_index.get('ticker', ticker) for ticker in tickers]
+        get_secs = perf_counter() - start
+
+        # time batched get
+        start = perf_counter()
+        get_many_objs = right_index.get_many('ticker', tickers)
+        get_many_secs = perf_counter() - start
+
+        # time join
+        start = perf_counter()
+        left_index.join(right_index, 'ticker', 'ticker')
+        join_secs = perf_counter() - start
+
+        assert get_many_objs == get_objs
+        print('  {:>8} records: get {:.3f}s, get_many {:.3f}s ({:.1f}x), join {:.3f}s'.format(
+            size, get_secs, get_many_secs, get_secs / get_many_secs, join_secs
+        ))
+
+
+def benchmark_name_search() -> None:
+    print('NameSearchIndex build and query latency (EDGAR sized synthetic company names):')
+    rng = random.Random(0)
+    words = [''.join(rng.choice('ABCDEFGHIJKLMNOPQRSTUVWXYZ') for _ in range(rng.randint(3, 10))) for _ in range(150000)]
+    suffixes = ['INC', 'CORP', 'LLC', 'LP', 'TRUST', 'FUND', 'HOLDINGS', 'CO']
+    records = [{
+        'cik': str(1000000 + i),
+        'company_names': [' '.join(rng.choice(words) for _ in range(rng.randint(1, 3))) + ' ' + rng.choice(suffixes)]
+    } for i in range(900000)]
+    records[0]['company_names'] = ['BERKSHIRE HATHAWAY INC', 'BERKSHIRE HATHAWAY INC /DE/']
+    multi_index = ColumnarMultiIndex.from_records(records, ['cik'], default_index_key='cik', safe_mode=True)
+
+    # time build
+    start = perf_counter()
+    search_index = NameSearchIndex(multi_index, 'company_names')
+    print('  build {:.2f}s over {} names, {} tokens'.format(perf_counter() - start, len(search_index), len(search_index.vocabulary)))
+
+    # time queries
+    for query in ['berkshire hath', 'berkshre hathaway', 'berk', records[1]['company_names'][0].lower()[:6]]:
+        start = perf_counter()
+        results = search_index.search(query)
+        print('  {:<20}: {:.2f}ms, {} results'.format('\'{}\''.format(query), (perf_counter() - start) * 1e3, len(results)))
+
+
+def benchmark_mindex_diff() -> None:
+    print('MultiIndex refresh, full pickle vs diff/apply_delta (500 changed, 100 added, 100 removed):')
+    for size in [100000, 1000000]:
+        old_index = build_ticker_index(size)
+        new_records = [dict(obj) for obj in old_index][100:]
+        for obj in new_records[:500]: obj['name'] += ' HOLDINGS'
+        new_records += [{'ticker': 'N{}'.format(i), 'name': 'New Company {}'.format(i), 'locale': 'US'} for i in range(100)]
+        new_index = MultiIndex.from_records(new_records, ['ticker'], default_index_key='ticker', safe_mode=True)
+
+        # time diff and patch
+        start = perf_counter()
+        delta = MultiIndex.diff(old_index, new_index)
+        diff_secs = perf_counter() - start
+        start = perf_counter()
+        old_index.apply_delta(delta)
+        apply_secs = perf_counter() - start
+
+        assert len(old_index) == len(new_index)
+        print('  {:>8} records: diff {:.2f}s, apply {:.4f}s, full {:.1f} MB vs delta {:.3f} MB'.format(
+            size, diff_secs, apply_secs, len(pickle.dumps(new_index)) / 1e6, len(pickle.dumps(delta)) / 1e6
+        ))
+
+
+def benchmark_mindex_concurrent() -> None:
+    print('ConcurrentMultiIndex snapshot reads by thread count (GIL-bound: extra threads add contention, not throughput):')
+    size, reads_per_task, task_count = 100000, 20000, 16
+    concurrent_index = ConcurrentMultiIndex(build_ticker_index(size))
+    tickers = ['T{}'.format(i) for i in range(0, size, size // reads_per_task)]
+
+    def read_task(_: int) -> int:
+        snapshot = concurrent_index.snapshot()
+        return sum(1 for ticker in tickers if snapshot.get('ticker', ticker) is not None)
+
+    def time_reads(threads: int, with_writer: bool) -> tuple:
+        with ThreadPoolExecutor(max_workers=threads + 1) as executor:
+            stop = []
+
+            # optionally write continuously in the background
+            def write_task() -> int:
+                batches = 0
+                while len(stop) == 0:
+                    with concurrent_index.batch() as multi_index:
+                        multi_index.insert({'ticker': 'W{}-{}'.format(threads, batches), 'locale': 'US'})
+                    batches += 1
+                return batches
+            writer = executor.submit(write_task) if with_writer else None
+
+            # time the same total reads split across threads
+            start = perf_counter()
+            found = sum(executor.map(read_task, range(task_count)))
+            read_secs = perf_counter() - start
+            stop.append(True)
+
+            assert found == task_count * len(tickers)
+            return found / read_secs, writer.result() if writer is not None else 0
+
+    single_rate, _ = time_reads(1, False)
+    for threads in [1, 2, 4, 8]:
+        rate, _ = time_reads(threads, False)
+        writer_rate, batches = time_reads(threads, True)
+        print('  {} threads: {:.2f}M reads/s ({:.2f}x single thread); with a writer {:.2f}M reads/s, {} batches'.format(
+            threads, rate / 1e6, rate / single_rate, writer_rate / 1e6, batches
+        ))
+
+    # each batch copies the index tables, so write cost grows with size
+    print('ConcurrentMultiIndex single-insert batch cost (copy-on-write, O(n) per batch):')
+    for size in [25000, 100000, 400000]:
+        concurrent_index = ConcurrentMultiIndex(build_ticker_index(size))
+        start = perf_counter()
+        for i in range(20):
+            concurrent_index.insert({'ticker': 'W{}'.format(i), 'name': 'Writer {}'.format(i), 'locale': 'US'})
+        batch_secs = (perf_counter() - start) / 20
+        print('  {:>8} records: {:.2f} ms per batch'.format(size, batch_secs * 1e3))
+
+
+def benchmark_mindex_query() -> None:
+    print('MultiIndex screen, hand-written loop vs indexed where() query:')
+    rng = random.Random(0)
+    records = [{
+        'ticker': 'T{}'.format(i),
+        'locale': rng.choice(['us', 'us', 'us', 'gb']),
+        'asset_class': rng.choice(['CS', 'ETF']),
+        'details': rng.choice([None, {'sector': rng.choice(['Technology', 'Energy', 'Financials', 'Utilities'])}]),
+        'dividend': rng.choice([None, {'dividend_yield': rng.random() * 0.05}])
+    } for i in range(200000)]
+    multi_index = MultiIndex.from_records(records, ['ticker'], default_index_key='ticker', safe_mode=True,
+                                          secondary_index_keys=['locale', 'details.sector'],
+                                          sorted_index_keys=['dividend.dividend_yield'])
+
+    # time hand-written loop
+    start = perf_counter()
+    loop_records = [obj for obj in multi_index if obj['locale'] == 'us' and obj['asset_class'] == 'CS' and
+                    obj['details'] is not None and obj['details']['sector'] == 'Technology' and
+                    obj['dividend'] is not None and obj['dividend']['dividend_yield'] > 0.04]
+    loop_secs = perf_counter() - start
+
+    # time query
+    query = multi_index.where('locale', '==', 'us').where('asset_class', '==', 'CS') \
+        .where('details.sector', '==', 'Technology').where('dividend.dividend_yield', '>', 0.04)
+    start = perf_counter()
+    query.all()
+    cold_secs = perf_counter() - start
+    start = perf_counter()
+    query_records = query.all()
+    query_secs = perf_counter() - start
+
+    assert query_records == loop_records
+    print('  {} records: loop {:.1f}ms, query {:.1f}ms ({:.1f}x; {:.1f}ms with first range sort), {} matches'.format(
+        len(multi_index), loop_secs * 1e3, query_secs * 1e3, loop_secs / query_secs, cold_secs * 1e3, len(query_records)
+    ))
+    print('  ' + query.explain().replace('\n', '\n  '))
+
+
+def benchmark_bars_ingest() -> None:
+    print('Aggregate bar ingest, pandas frames vs numpy arrays (parse and merge with stored history):')
+    rng = random.Random(0)
+    day_ms = 86400000
+    for ticker_count, history_days, new_days in [(1000, 1, 1), (1000, 20, 5), (200, 1000, 1000)]:
+        stored_days = 1000
+
+        # generate stored history and overlapping aggregate results
+        histories, results = [], []
+        for _ in range(ticker_count):
+            start_day = 15000 + stored_days - history_days
+            histories.append([{
+                'v': float(rng.randrange(1000, 10 ** 7)), 'vw': rng.uniform(1, 500), 'o': rng.uniform(1, 500),
+                'c': rng.uniform(1, 500), 'h': rng.uniform(1, 500), 'l': rng.uniform(1, 500),
+                't': (15000 + day) * day_ms + 4 * 3600000, 'n': rng.randrange(1, 10 ** 5)
+            } for day in range(stored_days)])
+            results.append([{
+                'v': float(rng.randrange(1000, 10 ** 7)), 'vw': rng.uniform(1, 500), 'o': rng.uniform(1, 500),
+                'c': rng.uniform(1, 500), 'h': rng.uniform(1, 500), 'l': rng.uniform(1, 500),
+                't': (start_day + day) * day_ms + 4 * 3600000, 'n': rng.randrange(1, 10 ** 5)
+            } for day in range(new_days)])
+
+        def parse_frame(historical_quotes: list) -> pd.DataFrame:
+            df = pd.DataFrame.from_records(historical_quotes)
+            df.columns = ['volume', 'vwap', 'open', 'close', 'high', 'low', 'date', 'transactions']
+            df['date'] = pd.to_datetime(df['date'], unit='ms').dt.date
+            df = df.set_index('date', drop=True).sort_index(ascending=True)
+            return df.groupby(df.index).first()
+
+        # time pandas parse and merge
+        stored_frames = [parse_frame(history) for history in histories]
+        start = perf_counter()
+        merged_frames = []
+        for stored_df, historical_quotes in zip(stored_frames, results):
+            df = pd.concat([stored_df, parse_frame(historical_quotes)], axis=0).sort_index(kind='stable')
+            merged_frames.append(df.groupby(df.index).last())
+        pandas_secs = perf_counter() - start
+
+        # time numpy parse and merge
+        stored_bars = [parse_aggregate_bars(history) for history in histories]
+        start = perf_counter()
+        merged_bars = [merge_bars(bars, parse_aggregate_bars(historical_quotes)) for bars, historical_quotes in zip(stored_bars, results)]
+        numpy_secs = perf_counter() - start
+
+        for df, bars in zip(merged_frames, merged_bars):
+            expected_bars = BarStore.frame_to_bars(df)
+            assert all(np.array_equal(expected_bars[name], bars[name]) for name in expected_bars)
+        print('  {} tickers x {} bars from {} days back: pandas {:.0f}ms, numpy {:.0f}ms ({:.1f}x)'.format(
+            ticker_count, new_days, history_days, pandas_secs * 1e3, numpy_secs * 1e3, pandas_secs / numpy_secs
+        ))
+
+
+def benchmark_price_panel() -> None:
+    print('Cross-sectional close alignment, pandas concat vs memory-mapped price panel:')
+    rng = np.random.default_rng(0)
+    ticker_count, date_count = 4000, 1500
+    calendar = np.arange(18000, 18000 + date_count)
+
+    # generate historical quotes with listing starts and random gaps
+    historical_quotes = MultiIndex(['ticker'], default_index_key='ticker', safe_mode=True)
+    for i in range(ticker_count):
+        ticker_dates = calendar[int(rng.integers(0, date_count - 10)):]
+        ticker_dates = ticker_dates[rng.random(len(ticker_dates)) > 0.02]
+        values = rng.uniform(1, 500, size=(len(ticker_dates), 6))
+        historical_quotes.insert({
+            'ticker': 'T{}'.format(i),
+            'historical_quotes': pd.DataFrame(values, columns=['volume', 'vwap', 'open', 'close', 'high', 'low'],
+                                              index=pd.Index(ticker_dates.astype('datetime64[D]').astype(object), name='date'))
+        })
+
+    # time pandas alignment
+    start = perf_counter()
+    close_df = pd.concat({record['ticker']: record['historical_quotes']['close'] for record in historical_quotes}, axis=1).sort_index()
+    pandas_secs = perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as directory:
+
+        # time panel build and reopen
+        start = perf_counter()
+        PricePanel(directory).update_from_historical_quotes(historical_quotes)
+        build_secs = perf_counter() - start
+        start = perf_counter()
+        panel = PricePanel(directory)
+        panel_close_df = panel.read_frame('close')
+        open_secs = perf_counter() - start
+
+        # time one-day incremental update
+        day_bars = {ticker: {'date': np.array([18000 + date_count]), 'close': np.ones(1), 'vwap': np.ones(1), 'volume': np.ones(1)}
+                    for ticker in panel.get_tickers()}
+        start = perf_counter()
+        panel.update(day_bars)
+        update_secs = perf_counter() - start
+
+        assert np.allclose(panel_close_df.to_numpy(), close_df[panel_close_df.columns].to_numpy(dtype='float32'), equal_nan=True)
+        print('  {} tickers x {} dates: pandas concat {:.0f}ms ({:.0f}MB), panel build {:.0f}ms, reopen {:.1f}ms ({:.0f}MB shared), one-day update {:.0f}ms'.format(
+            ticker_count, date_count, pandas_secs * 1e3, close_df.memory_usage().sum() / 1e6, build_secs * 1e3, open_secs * 1e3,
+            panel_close_df.to_numpy().nbytes / 1e6, update_secs * 1e3
+        ))
+        del panel, panel_close_df
+
+
+benchmarks = {
+    'mindex-iteration': benchmark_mindex_iteration,
+    'mindex-memory': benchmark_mindex_memory,
+    'mindex-bulk-build': benchmark_mindex_bulk_build,
+    'mindex-snapshot': benchmark_mindex_snapshot,
+    'mindex-join': benchmark_mindex_join,
+    'name-search': benchmark_name_search,
+    'mindex-diff': benchmark_mindex_diff,
+    'mindex-concurrent': benchmark_mindex_concurrent,
+    'mindex-query': benchmark_mindex_query,
+    'bars-ingest': benchmark_bars_ingest,
+    'price-panel': benchmark_price_panel
+}
+
+
+# define arguments
+parser = argparse.ArgumentParser(description='Utility for running local performance benchmarks.')
+parser.add_argument('benchmarks', nargs='*', help='Benchmarks to run (default all): {}.'.format(', '.join(benchmarks.keys())))
+
+# parse arguments
+args = parser.parse_args()
+for name in args.benchmarks:
+    if name not in benchmarks: parser.error('Unknown benchmark: {}.'.format(name))
+
+# run benchmarks
+for name in args.benchmarks or benchmarks.keys():
+    benchmarks[name]()
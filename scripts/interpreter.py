@@ -13,6 +13,8 @@ from src.api.raf import RankAndFiledAPIConnector
 from src.api.sec import SECAPIConnector
 from src.api.secgov import SECGovAPIConnector
 from src.api.gleif import GLEIFAPIConnector
+from src.utils.msnapshot import MultiIndexSnapshot
+from src.utils.msearch import NameSearchIndex
 
 redis = cachelib.RedisCache(
     host='localhost',
@@ -20,4 +22,7 @@ redis = cachelib.RedisCache(
     db=0,
     default_timeout=0,
     socket_keepalive=True
-)
\ No newline at end of file
+)
+
+def load_snapshot(data_name: str) -> MultiIndexSnapshot:
+    return MultiIndexSnapshot(path_prefix + '/snapshots/' + data_name + '.mvi')
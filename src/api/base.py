@@ -1,22 +1,157 @@
 from datetime import datetime, timezone, timedelta
-from time import time
-from typing import Any
+from time import time, sleep
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from typing import Any, Tuple, Callable
+from urllib.parse import urlparse
 from pathlib import Path
+from tqdm import tqdm
+import functools
+import threading
+import requests
+import requests.adapters
 import atexit
 import pickle
 import json
 
+from src.api.ratelimit import TokenBucketRateLimiter, ThrottledError
+from src.cache.base import RevalidatedValue
+from src.cache.tiered import TieredCache
 from src.utils.logger import BaseModuleWithLogging
 
+# define max misses awaiting their add
+MAX_PENDING_MISSES = 1024
+
+
+def single_flight(method: Callable) -> Callable:
+    """
+        Coalesces concurrent calls of a connector method with the same
+        arguments into one in-flight call whose result (or exception) they
+        all share. Results (other than failures) are also reused by
+        identical calls within the connector's single-flight memo window.
+        Every call gets its own shallow copy of the result when it has
+        one, so records are still shared and should be treated as immutable.
+    """
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        flight_key = (method.__name__, args, tuple(sorted(kwargs.items())))
+        try:
+            hash(flight_key)
+        except TypeError:
+            return method(self, *args, **kwargs)
+        return self._single_flight(flight_key, lambda: method(self, *args, **kwargs))
+
+    return wrapper
+
+
+def save_cache_report(report_name: str, connectors: list) -> str:
+    """
+        Writes the cache, conditional request and throttling stats of
+        each connector to a timestamped JSON report under reports/cache/
+        and returns its path.
+    """
+
+    current_dt = datetime.now(tz=timezone.utc)
+    report = {'name': report_name, 'created': current_dt.isoformat(), 'connectors': {}}
+    for connector in connectors:
+        report['connectors'][connector.get_name()] = {
+            'cache': connector.get_cache_stats(),
+            'conditional': connector.get_conditional_stats(),
+            'throttle': connector.get_throttle_stats()
+        }
+
+    Path('reports/cache').mkdir(parents=True, exist_ok=True)
+    path = 'reports/cache/{}_{}.json'.format(report_name, current_dt.strftime('%Y%m%dT%H%M%SZ'))
+    f = open(path, 'w')
+    json.dump(report, f, indent=4)
+    f.close()
+    return path
+
+
+def reports_cache(update: Callable) -> Callable:
+    """
+        Saves a cache report for the API connectors of a loader module
+        after each update, whether it succeeded or failed. Background
+        refreshes are waited for first, so the run stores and counts them.
+    """
+
+    @functools.wraps(update)
+    def wrapper(self, *args, **kwargs):
+        try:
+            return update(self, *args, **kwargs)
+        finally:
+            try:
+                connectors = [v for v in vars(self).values() if isinstance(v, BaseAPIConnector)]
+                for connector in connectors: connector.wait_for_revalidations()
+                report_path = save_cache_report(self.name, connectors)
+                self.logger.info('Saved cache report to {}.'.format(report_path))
+            except Exception as e:
+                self.logger.exception('Error in save_cache_report: ' + str(e))
+
+    return wrapper
+
+
+_http_sessions = {}
+_http_sessions_lock = threading.Lock()
+
+
+def get_http_session(pool_connections: int=16, pool_maxsize: int=32,
+                     pool_block: bool=False, max_retries: int=0) -> requests.Session:
+    """
+        Returns the process-wide keep-alive session for a pool
+        configuration. Each session keeps up to pool_connections host
+        pools of up to pool_maxsize connections, so connectors sharing a
+        configuration reuse each other's connections.
+    """
+
+    pool_config = (pool_connections, pool_maxsize, pool_block, max_retries)
+    with _http_sessions_lock:
+        if pool_config not in _http_sessions:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+                                                    pool_block=pool_block, max_retries=max_retries)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _http_sessions[pool_config] = session
+        return _http_sessions[pool_config]
+
+
+def _copy_result(result: Any) -> Any:
+    return result.copy() if hasattr(result, 'copy') else result
+
+
+class _Flight(object):
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.finished = None
+
 
 class BaseAPIConnector(BaseModuleWithLogging):
 
     def __init__(self, name: str, credentials_file_path: str,
-                 load_cache: bool=True):
+                 load_cache: bool=True,
+                 cache_config_file_path: str='config/cache.json',
+                 http_config_file_path: str='config/http.json'):
 
         super().__init__(name)
         self.credentials_file_path = credentials_file_path
         self.load_cache = load_cache
+        self.cache_config_file_path = cache_config_file_path
+        self.conditional_stats = {}
+        self.revalidations = {}
+        self.revalidation_lock = threading.Lock()
+        self.flights = {}
+        self.flight_lock = threading.Lock()
+        self.cache_stats = {}
+        self.cache_miss_times = OrderedDict()
+        self.cache_stats_lock = threading.Lock()
+        self.throttle_stats = {'throttled': 0, 'exhausted': 0, 'dropped': 0}
+        self.throttle_stats_lock = threading.Lock()
+        self.throttle_local = threading.local()
 
         # load API credentials
         f = open(credentials_file_path, 'r')
@@ -26,62 +161,378 @@ class BaseAPIConnector(BaseModuleWithLogging):
         self.api_credentials = api_credentials
         f.close()
 
+        # load HTTP config
+        f = open(http_config_file_path, 'r')
+        http_config = json.load(f)
+        f.close()
+        self.http_config = dict(http_config.get('default', {}))
+        self.http_config.update(http_config.get(name, {}))
+
+        # share pooled keep-alive session
+        self.http_session = get_http_session(
+            pool_connections=self.http_config.get('pool-connections', 16),
+            pool_maxsize=self.http_config.get('pool-maxsize', 32),
+            pool_block=self.http_config.get('pool-block', False),
+            max_retries=self.http_config.get('max-retries', 0)
+        )
+        self.http_timeout = (self.http_config.get('connect-timeout-secs'), self.http_config.get('read-timeout-secs'))
+        self.max_concurrency = self.http_config.get('max-concurrency', 1)
+
+        # share per-host request budgets through redis
+        self.max_throttle_retries = self.http_config.get('max-throttle-retries', 5)
+        self.rate_limiter = TokenBucketRateLimiter(
+            rate_limits=self.http_config.get('rate-limits', {}),
+            redis_credentials_file_path=self.http_config.get('rate-limit-redis-credentials-file'),
+            logger=self.logger
+        )
+
         # initialize cache
         self.cache_file = 'cache/' + name + '.pkl'
         Path('cache').mkdir(parents=True, exist_ok=True)
+        self.api_cache = TieredCache.from_config(cache_config_file_path, name, load=load_cache,
+                                                logger=self.logger)
+        cache_config = TieredCache.load_config(cache_config_file_path, name)
+        self.single_flight_memo_secs = cache_config.get('single-flight-memo-secs', 0)
+        self.conditional_ttl = timedelta(seconds=cache_config.get('conditional-ttl-secs', 2592000))
+        self.revalidate_ttls = {}
+        for cache_id, ttls in cache_config.get('revalidate', {}).items():
+            self.revalidate_ttls[cache_id] = (timedelta(seconds=ttls['soft-ttl-secs']), 
+                                              timedelta(seconds=ttls['hard-ttl-secs']))
         if self.load_cache and Path(self.cache_file).exists():
             self.logger.info('Loading cache.')
             f = open(self.cache_file, 'rb')
-            self.api_cache = pickle.load(f)
+            cached_entries = pickle.load(f)
             f.close()
-        else:
-            self.api_cache = {}
+            for cache_id, cache_entries in cached_entries.items():
+                for cache_entry_id, (cache_value, expiry_dt) in cache_entries.items():
+                    self.api_cache.add((cache_id, cache_entry_id), cache_value, expiry_dt)
+
+            # retire legacy cache file once persisted per entry
+            if self.api_cache.is_persistent():
+                Path(self.cache_file).rename(self.cache_file + '.migrated')
 
-        # register cache dump
-        atexit.register(self._dump_cache)
+        # register cache dump for non-persistent caches
+        if not self.api_cache.is_persistent():
+            atexit.register(self._dump_cache)
+
+        # let background refreshes finish (before any dump) at exit
+        atexit.register(self.wait_for_revalidations)
 
     def _add_cache(self, cache_id: str, cache_entry_id: str, cache_value: Any,
-                   expiry_delta: timedelta=None) -> None:
+                   expiry_delta: timedelta=None,
+                   hard_expiry_delta: timedelta=None) -> None:
+
+        # revalidated entries go stale after their configured soft ttl (in
+        # place of the caller's expiry delta) and expire at the hard ttl
+        current_dt = datetime.now(tz=timezone.utc)
+        if cache_id in self.revalidate_ttls:
+            expiry_delta, hard_expiry_delta = self.revalidate_ttls[cache_id]
+        if hard_expiry_delta is not None:
+            cache_value = RevalidatedValue(cache_value, current_dt + expiry_delta)
+            expiry_delta = max(expiry_delta, hard_expiry_delta)
 
         # get cache expiry target
         if expiry_delta is not None:
-            expiry_dt = datetime.now(tz=timezone.utc) + expiry_delta
+            expiry_dt = current_dt + expiry_delta
         else:
             expiry_dt = None
 
         # insert cache entry
-        if cache_id in self.api_cache:
-            self.api_cache[cache_id][cache_entry_id] = (cache_value, expiry_dt)
-        else:
-            self.api_cache[cache_id] = {}
-            self.api_cache[cache_id][cache_entry_id] = (cache_value, expiry_dt)
+        cache_entry = self.api_cache.add((cache_id, cache_entry_id), cache_value, expiry_dt)
 
-    def _get_cache(self, cache_id: str, cache_entry_id: str) -> Any:
+        # record entry size (when a tier measured it) and fetch time since the miss
+        with self.cache_stats_lock:
+            stats = self._get_cache_id_stats(cache_id)
+            miss_time = self.cache_miss_times.pop((cache_id, cache_entry_id), None)
+            if cache_entry is not None:
+                stats['adds'] += 1
+                if cache_entry.size is not None:
+                    stats['last_entry_bytes'] = cache_entry.size
+                    stats['max_entry_bytes'] = max(stats['max_entry_bytes'], cache_entry.size)
+            if miss_time is not None:
+                stats['last_fetch_secs'] = time() - miss_time
+
+    def _get_cache(self, cache_id: str, cache_entry_id: str,
+                   revalidate: Callable[[], Any]=None) -> Any:
 
         # retrieve cache entry
-        if cache_id in self.api_cache:
-            if cache_entry_id in self.api_cache[cache_id]: 
-                cache_entry = self.api_cache[cache_id][cache_entry_id]
-                if cache_entry is None: 
-                    return None
-                else:
-                    cache_value, expiry_dt = cache_entry
-                    if expiry_dt is None: 
-                        return cache_value
-                    else:
-                        current_dt = datetime.now(tz=timezone.utc)
-                        if current_dt >= expiry_dt:
-                            self.api_cache[cache_id].pop(cache_entry_id)
-                            return None
-                        else:
-                            return cache_value
+        cache_value, status = self.api_cache.lookup((cache_id, cache_entry_id))
+        is_stale = isinstance(cache_value, RevalidatedValue) and cache_value.is_stale(datetime.now(tz=timezone.utc))
+
+        # stale values are only served while revalidating
+        if is_stale and revalidate is None:
+            cache_value, status, is_stale = None, 'expired', False
+
+        # count lookup
+        with self.cache_stats_lock:
+            stats = self._get_cache_id_stats(cache_id)
+            if status == 'hit':
+                stats['hits'] += 1
+                if is_stale: stats['stale_hits'] += 1
+            else:
+                stats['misses'] += 1
+                if status == 'expired': stats['expirations'] += 1
+
+                # track pending misses (dropping the oldest ones never added)
+                self.cache_miss_times.pop((cache_id, cache_entry_id), None)
+                self.cache_miss_times[(cache_id, cache_entry_id)] = time()
+                while len(self.cache_miss_times) > MAX_PENDING_MISSES:
+                    self.cache_miss_times.popitem(last=False)
+
+        # serve stale values while refreshing them
+        if isinstance(cache_value, RevalidatedValue):
+            if revalidate is not None and is_stale:
+                self._revalidate(cache_id, cache_entry_id, revalidate)
+            cache_value = cache_value.value
+        return cache_value
+
+    def get_cache_stats(self) -> dict:
+        """
+            Returns per cache id counters: lookups that hit (stale_hits
+            of which were served while revalidating), missed or found an
+            expired entry, entries added and their (pickled) sizes where a
+            cache tier measured them, and the last fetch time measured
+            from a miss to its add.
+        """
+
+        with self.cache_stats_lock:
+            return {cache_id: dict(stats) for cache_id, stats in self.cache_stats.items()}
+
+    def _get_cache_id_stats(self, cache_id: str) -> dict:
+        if cache_id not in self.cache_stats:
+            self.cache_stats[cache_id] = {
+                'hits': 0,
+                'stale_hits': 0,
+                'misses': 0,
+                'expirations': 0,
+                'adds': 0,
+                'last_entry_bytes': None,
+                'max_entry_bytes': 0,
+                'last_fetch_secs': None
+            }
+        return self.cache_stats[cache_id]
+
+    def wait_for_revalidations(self, timeout: float=None) -> bool:
+        """
+            Blocks until running background refreshes finish (or the
+            timeout passes) and returns whether none are left running.
+        """
+
+        with self.revalidation_lock:
+            threads = list(self.revalidations.values())
+        for thread in threads:
+            thread.join(timeout)
+        return not any(thread.is_alive() for thread in threads)
+
+    def _single_flight(self, flight_key: tuple, call: Callable[[], Any]) -> Any:
+
+        # join an in-flight or memoized call, else lead a new one
+        with self.flight_lock:
+            current_time = time()
+            for key, flight in list(self.flights.items()):
+                if flight.finished is not None and current_time - flight.finished >= self.single_flight_memo_secs:
+                    del self.flights[key]
+            flight = self.flights.get(flight_key)
+            is_leader = flight is None
+            if is_leader:
+                flight = _Flight()
+                self.flights[flight_key] = flight
+
+        if not is_leader:
+            self.logger.info('Joining in-flight {}.'.format(flight_key[0]))
+            flight.done.wait()
+            if flight.error is not None: raise flight.error
+            return _copy_result(flight.result)
+
+        try:
+            flight.result = call()
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+
+            # failed calls are not memoized
+            with self.flight_lock:
+                flight.finished = time()
+                if flight.result is None: del self.flights[flight_key]
+            flight.done.set()
+        return _copy_result(flight.result)
+
+    def _revalidate(self, cache_id: str, cache_entry_id: str, revalidate: Callable[[], Any]) -> None:
+
+        # start at most one refresh per entry
+        with self.revalidation_lock:
+            if (cache_id, cache_entry_id) in self.revalidations:
+                return
+            self.logger.info('Revalidating {} in background.'.format(cache_id))
+            thread = threading.Thread(target=self._run_revalidation, args=(cache_id, cache_entry_id, revalidate), daemon=True)
+            self.revalidations[(cache_id, cache_entry_id)] = thread
+        thread.start()
+
+    def _run_revalidation(self, cache_id: str, cache_entry_id: str, revalidate: Callable[[], Any]) -> None:
+        try:
+
+            # refresh replaces the cache entry when it succeeds
+            if revalidate() is None:
+                self.logger.error('Failed to revalidate {}; serving stale value.'.format(cache_id))
             else:
-                return None
+                self.logger.info('Revalidated {}.'.format(cache_id))
+        except Exception as e:
+            self.logger.exception('Error in revalidate: ' + str(e))
+        finally:
+            with self.revalidation_lock:
+                del self.revalidations[(cache_id, cache_entry_id)]
+
+    def get_conditional_stats(self) -> dict:
+        """
+            Returns per cache id counters for conditional bulk downloads:
+            requests sent, 304 (not modified) hits and bytes not re-downloaded.
+        """
+
+        with self.cache_stats_lock:
+            return {cache_id: dict(stats) for cache_id, stats in self.conditional_stats.items()}
+
+    def _conditional_get(self, cache_id: str, url: str, headers: dict=None,
+                         no_cache: bool=False,
+                         expiry_delta: timedelta=None) -> Tuple[requests.Response, Any]:
+
+        # send stored validators for the same url, if its value is kept
+        headers = dict(headers) if headers is not None else {}
+        validators = None if no_cache else self._get_cache('conditional', cache_id)
+        cached_value = None
+        if validators is not None and validators['url'] == url:
+            cached_value = self.api_cache.get((cache_id, 'all'))
+        if cached_value is not None:
+            if validators['etag'] is not None: headers['If-None-Match'] = validators['etag']
+            if validators['last_modified'] is not None: headers['If-Modified-Since'] = validators['last_modified']
+
+        # revive stale value when not modified
+        response = self._http_get(url, headers=headers)
+        is_not_modified = response.status_code == 304 and cached_value is not None
+        with self.cache_stats_lock:
+            stats = self.conditional_stats.setdefault(cache_id, {'requests': 0, 'not_modified': 0, 'bytes_saved': 0})
+            stats['requests'] += 1
+            if is_not_modified:
+                stats['not_modified'] += 1
+                stats['bytes_saved'] += validators['content_length']
+        if is_not_modified:
+            if isinstance(cached_value, RevalidatedValue): cached_value = cached_value.value
+            self._add_cache(cache_id, 'all', cached_value, expiry_delta=expiry_delta,
+                            hard_expiry_delta=self.conditional_ttl)
+            self._add_cache('conditional', cache_id, validators, expiry_delta=self.conditional_ttl)
+            return response, cached_value
         else:
-            return None
+            response.raise_for_status()
+            return response, None
+
+    def _http_get(self, url: str, **kwargs) -> requests.Response:
+        return self._http_request('GET', url, **kwargs)
+
+    def _http_post(self, url: str, **kwargs) -> requests.Response:
+        return self._http_request('POST', url, **kwargs)
+
+    def get_throttle_stats(self) -> dict:
+        """
+            Returns counters for throttled (429) responses, requests that
+            exhausted their retries and mapped items dropped because of it.
+        """
+
+        with self.throttle_stats_lock:
+            return dict(self.throttle_stats)
+
+    def _http_request(self, method: str, url: str, **kwargs) -> requests.Response:
+        kwargs.setdefault('timeout', self.http_timeout)
+        host = urlparse(url).netloc
+
+        # retry throttled requests after backing off
+        for attempt in range(self.max_throttle_retries + 1):
+            self.rate_limiter.acquire(host)
+            response = self.http_session.request(method, url, **kwargs)
+            if response.status_code != 429:
+                return response
+
+            with self.throttle_stats_lock:
+                self.throttle_stats['throttled'] += 1
+            retry_after_secs = TokenBucketRateLimiter.parse_retry_after(response.headers.get('Retry-After'))
+            rate = self.rate_limiter.throttle(host, retry_after_secs)
+            if attempt == self.max_throttle_retries:
+                break
+            if rate is None: sleep(retry_after_secs if retry_after_secs is not None else 1)
+            self.logger.warning('Throttled by {} (attempt {}); retry after {}s at {} req/s.'.format(
+                host, attempt + 1, retry_after_secs, rate
+            ))
+
+        # fail distinctly so callers can tell throttling from missing data
+        with self.throttle_stats_lock:
+            self.throttle_stats['exhausted'] += 1
+        self.throttle_local.exhausted = True
+        self.logger.error('Throttled by {} after {} attempts; giving up.'.format(host, self.max_throttle_retries + 1))
+        raise ThrottledError(host, self.max_throttle_retries + 1)
+
+    def _map_concurrently(self, fetch: Callable[[Any], Any], items: list,
+                          progress_bar: bool=False) -> list:
+        """
+            Returns [fetch(item) for item in items], running up to
+            max-concurrency fetches at once in a thread pool, so it can
+            also be called from a running event loop. Items whose fetch
+            failed after exhausting throttle retries are logged and counted
+            as dropped.
+        """
+
+        # note fetches that failed on throttling (each runs in one thread)
+        dropped_items = []
+        def fetch_item(item: Any) -> Any:
+            self.throttle_local.exhausted = False
+            result = fetch(item)
+            if result is None and self.throttle_local.exhausted: dropped_items.append(item)
+            return result
+
+        if self.max_concurrency <= 1 or len(items) <= 1:
+            results = [fetch_item(item) for item in tqdm(items, disable=not progress_bar)]
+        else:
+            with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+                results = list(tqdm(executor.map(fetch_item, items), total=len(items), disable=not progress_bar))
+
+        if len(dropped_items) > 0:
+            with self.throttle_stats_lock:
+                self.throttle_stats['dropped'] += len(dropped_items)
+            self.logger.error('Dropped {} of {} items after exhausting throttle retries: {}.'.format(
+                len(dropped_items), len(items), dropped_items[:10]
+            ))
+        return results
+
+    def _add_conditional_cache(self, cache_id: str, url: str, response: requests.Response,
+                               cache_value: Any,
+                               expiry_delta: timedelta=None) -> None:
+
+        # keep the value past its expiry while its validators last
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if etag is None and last_modified is None:
+            self._add_cache(cache_id, 'all', cache_value, expiry_delta=expiry_delta)
+            return
+        self._add_cache(cache_id, 'all', cache_value, expiry_delta=expiry_delta,
+                        hard_expiry_delta=self.conditional_ttl)
+
+        # store only validators next to it
+        self._add_cache('conditional', cache_id, {
+            'url': url,
+            'etag': etag,
+            'last_modified': last_modified,
+            'content_length': len(response.content)
+        }, expiry_delta=self.conditional_ttl)
 
     def _dump_cache(self) -> None:
         self.logger.info('Dumping API cache.')
+
+        # dump memory tier (lower tiers persist themselves)
+        cached_entries = {}
+        current_dt = datetime.now(tz=timezone.utc)
+        for (cache_id, cache_entry_id), entry in self.api_cache.memory_items():
+            if entry.is_expired(current_dt): continue
+            elif cache_id not in cached_entries: cached_entries[cache_id] = {}
+            cached_entries[cache_id][cache_entry_id] = (entry.value, entry.expiry_dt)
+
         f = open(self.cache_file, 'wb+')
-        pickle.dump(self.api_cache, f)
-        f.close()
\ No newline at end of file
+        pickle.dump(cached_entries, f)
+        f.close()
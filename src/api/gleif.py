@@ -1,11 +1,10 @@
 from datetime import timedelta
 from io import BytesIO
-import requests
 import zipfile
 
 from src.utils.functional.identifiers import to_string
-from src.api.base import BaseAPIConnector
-from src.utils.mindex import MultiIndex
+from src.api.base import BaseAPIConnector, single_flight
+from src.utils.mindex import MultiIndex, ColumnarMultiIndex
 
 
 class GLEIFAPIConnector(BaseAPIConnector):
@@ -13,6 +12,7 @@ class GLEIFAPIConnector(BaseAPIConnector):
     def __init__(self, credentials_file_path: str):
         super().__init__(self.__class__.__name__, credentials_file_path)
 
+    @single_flight
     def get_leis(self,
                  no_cache: bool=False,
                  cache_expiry_delta: timedelta=timedelta(days=1)) -> MultiIndex:
@@ -36,15 +36,17 @@ class GLEIFAPIConnector(BaseAPIConnector):
             
             # get leis files data
             self.logger.info('Loading get_leis from cloud.')
-            response = requests.get(self.api_domain)
+            response = self._http_get(self.api_domain)
             response.raise_for_status()
             data_files = response.json()
             download_url = data_files['data'][0]['links']['download']
             download_url = download_url.replace('\/', '/')
 
-            # get leis data
-            response = requests.get(download_url)
-            response.raise_for_status()
+            response, multi_index = self._conditional_get('get_leis', download_url, no_cache=no_cache,
+                                                          expiry_delta=cache_expiry_delta)
+            if multi_index is not None:
+                self.logger.info('Reviving get_leis from cache (not modified).')
+                return multi_index
 
             # parse ZIP file
             fp = BytesIO(response.content)
@@ -55,22 +57,27 @@ class GLEIFAPIConnector(BaseAPIConnector):
             data = [row for row in data if row[1].startswith('US')]
             zip_fp.close()
             
-            # build multi-index
-            indices = ['isin']
-            multi_index = MultiIndex(indices, default_index_key='isin', safe_mode=True)
+            # parse records
+            records = []
             for row in data:
                 try:
-                    multi_index.insert({
+                    records.append({
                         'isin': to_string(row[1]),
                         'lei': to_string(row[0])
                     })
                 except Exception:
                     continue
-            
+
+            # build multi-index
+            indices = ['isin']
+            multi_index, skipped = ColumnarMultiIndex.from_records(records, indices, default_index_key='isin', safe_mode=True,
+                                                                   on_conflict='first', return_skipped=True)
+            self.logger.info('Skipped {} conflicting get_leis rows.'.format(len(skipped)))
+
             # cache item
             if not no_cache:
-                self._add_cache('get_leis', 'all', multi_index, 
-                                expiry_delta=cache_expiry_delta)
+                self._add_conditional_cache('get_leis', download_url, response, multi_index,
+                                            expiry_delta=cache_expiry_delta)
 
             return multi_index
 
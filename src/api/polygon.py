@@ -1,21 +1,27 @@
 from datetime import timezone, timedelta, datetime, date
 from dateutil import parser
 from typing import Any
-from tqdm import tqdm
-import pandas as pd
-import requests
 
 from src.utils.functional.identifiers import check_ticker, to_string, parse_cik
-from src.utils.functional.prices import parse_price
+from src.utils.functional.prices import parse_price, parse_aggregate_bars
 from src.utils.mindex import MultiIndex
-from src.api.base import BaseAPIConnector
+from src.storage.bars import BarStore
+from src.api.base import BaseAPIConnector, single_flight
+
+
+# ticker range split points, roughly balancing the common stock universe
+TICKER_RANGE_BOUNDS = ('B', 'C', 'E', 'G', 'I', 'L', 'N', 'P', 'S', 'U')
 
 
 class PolygonAPIConnector(BaseAPIConnector):
 
-    def __init__(self, credentials_file_path: str):
+    def __init__(self, credentials_file_path: str,
+                 bars_directory: str='bars'):
+
         super().__init__(self.__class__.__name__, credentials_file_path)
+        self.bar_store = BarStore(bars_directory)
 
+    @single_flight
     def get_internal_exchanges(self) -> MultiIndex:
         """
             Returns a multi-index with the following fields for all 
@@ -36,12 +42,11 @@ class PolygonAPIConnector(BaseAPIConnector):
                 check_ok=False
             )
 
-            # post-process data
-            indices = ['mic']
-            multi_index = MultiIndex(indices, default_index_key='mic', safe_mode=True)
+            # parse records
+            records = []
             for exchange_data in exchanges_data:
                 try:
-                    multi_index.insert({
+                    records.append({
                         'mic': to_string(exchange_data['mic']),
                         'name': to_string(exchange_data['name']),
                         'type': exchange_data['type'],
@@ -50,15 +55,25 @@ class PolygonAPIConnector(BaseAPIConnector):
                     })
                 except Exception:
                     continue
-            
+
+            # build multi-index
+            indices = ['mic']
+            multi_index, skipped = MultiIndex.from_records(records, indices, default_index_key='mic', safe_mode=True,
+                                                           on_conflict='first', return_skipped=True)
+            self.logger.info('Skipped {} conflicting get_internal_exchanges rows.'.format(len(skipped)))
+
             return multi_index
 
         except Exception as e:
             self.logger.exception('Error in get_internal_exchanges: ' + str(e))
             return None
     
+    @single_flight
     def get_internal_tickers(self,
-                             max_iters: int=15) -> MultiIndex:
+                             max_iters: int=15,
+                             no_cache: bool=False,
+                             cache_expiry_delta: timedelta=timedelta(hours=1),
+                             range_bounds: tuple=TICKER_RANGE_BOUNDS) -> MultiIndex:
 
         """
             Returns a multi-index with the following fields for all 
@@ -72,64 +87,33 @@ class PolygonAPIConnector(BaseAPIConnector):
             - currency_code
             - figi
             - last_updated
+
+            The ticker universe is split at range_bounds into ticker
+            ranges that are paged through concurrently and merged in
+            order.
         """
 
         try:
-            tickers_data = []
 
-            # send initial request
-            self.logger.info('Loading get_internal_tickers from cloud.')
-            response = requests.get(
-                url=self.api_domain + 'tickers', 
-                params={
-                    'apiKey': self.api_key,
-                    'limit': 1000,
-                    'active': True,
-                    'type': 'CS',
-                    'market': 'stocks'
-                }
-            )
+            # check cache
+            if not no_cache:
+                cached_item = self._get_cache('get_internal_tickers', 'all')
+                if cached_item is not None:
+                    self.logger.info('Loading get_internal_tickers from cache.')
+                    return cached_item
 
-            # verify response
-            response.raise_for_status()
-            json_response = response.json()
-            assert json_response['status'] == 'OK', 'bad response status'
-            assert json_response['count'] > 0, 'no data in response'
-            assert len(json_response['next_url']) > 0, 'no next_url in response'
-            tickers_data.extend(json_response['results'])
-            next_url = json_response['next_url']
-
-            # iteratively request cursor
-            iters = 0
-            while True:
-            
-                # send initial request
-                response = requests.get(
-                    url=next_url, 
-                    headers={
-                        'Authorization': 'Bearer ' + self.api_key
-                    }
-                )
+            # fetch ticker ranges
+            self.logger.info('Loading get_internal_tickers from cloud.')
+            bounds = [None] + list(range_bounds) + [None]
+            ticker_ranges = list(zip(bounds[:-1], bounds[1:]))
+            fetch_tickers_range = lambda ticker_range: self._fetch_tickers_range(ticker_range[0], ticker_range[1], max_iters)
+            tickers_data = []
+            for range_data in self._map_concurrently(fetch_tickers_range, ticker_ranges):
+                tickers_data.extend(range_data)
+            assert len(tickers_data) > 0, 'no data in response'
 
-                # verify response
-                response.raise_for_status()
-                json_response = response.json()
-                assert json_response['status'] == 'OK', 'bad response status'
-                assert json_response['count'] > 0, 'no data in response'
-                tickers_data.extend(json_response['results'])
-
-                # check next url
-                if 'next_url' not in json_response: 
-                    break
-                elif iters >= max_iters: 
-                    raise Exception('max iterations exceeded')
-                else: 
-                    next_url = json_response['next_url']
-                    iters += 1
-
-            # post-process data
-            indices = ['ticker']
-            multi_index = MultiIndex(indices, default_index_key='ticker', safe_mode=True)
+            # parse records
+            records = []
             for ticker_data in tickers_data:
                 try:
 
@@ -137,8 +121,8 @@ class PolygonAPIConnector(BaseAPIConnector):
                     if not check_ticker(ticker_data['ticker']):
                         continue
 
-                    # insert ticker
-                    multi_index.insert({
+                    # add ticker
+                    records.append({
                         'ticker': to_string(ticker_data['ticker']),
                         'name': to_string(ticker_data['name']),
                         'figi': None if 'composite_figi' not in ticker_data else to_string(ticker_data['composite_figi']),
@@ -150,13 +134,25 @@ class PolygonAPIConnector(BaseAPIConnector):
                     })
                 except Exception:
                     continue
-            
+
+            # build multi-index
+            indices = ['ticker']
+            multi_index, skipped = MultiIndex.from_records(records, indices, default_index_key='ticker', safe_mode=True,
+                                                           secondary_index_keys=['exchange_mic', 'locale'],
+                                                           on_conflict='first', return_skipped=True)
+            self.logger.info('Skipped {} conflicting get_internal_tickers rows.'.format(len(skipped)))
+
+            # cache item
+            self._add_cache('get_internal_tickers', 'all', multi_index, 
+                            expiry_delta=cache_expiry_delta)
+
             return multi_index
 
         except Exception as e:
             self.logger.exception('Error in get_internal_tickers: ' + str(e))
             return None
     
+    @single_flight
     def get_internal_ticker_quotes(self, internal_tickers: MultiIndex,
                                    no_cache: bool=False,
                                    cache_expiry_delta: timedelta=timedelta(days=30)) -> MultiIndex:
@@ -180,7 +176,7 @@ class PolygonAPIConnector(BaseAPIConnector):
 
             # query ticker quotes
             self.logger.info('Loading get_internal_ticker_quotes from cloud.')
-            response = requests.get(
+            response = self._http_get(
                 url=self.api_credentials['api-domain-snapshot'] + 'tickers', 
                 params={
                     'apiKey': self.api_key
@@ -319,8 +315,11 @@ class PolygonAPIConnector(BaseAPIConnector):
             self.logger.exception('Error in get_internal_ticker_quotes: ' + str(e))
             return None
 
+    @single_flight
     def get_internal_historical_quotes(self, internal_tickers: MultiIndex,
                                        history_start_date: date=date(2000, 1, 1),
+                                       grouped: bool=True,
+                                       grouped_max_days: int=30,
                                        progress_bar: bool=False) -> MultiIndex:
 
         """
@@ -328,80 +327,53 @@ class PolygonAPIConnector(BaseAPIConnector):
             internal tickers:
 
             - ticker (index)
+            - historical_quotes
+
+            In grouped mode, tickers with bars stored in the last
+            grouped_max_days days are refreshed from the grouped daily
+            endpoint with one request per weekday up to the last
+            completed session; new listings and tickers with older gaps
+            use per-ticker range queries.
         """
 
         try: 
 
-            # check cache
+            # move legacy cached quotes into the bar store
             past_historical_quotes = self._get_cache('get_internal_historical_quotes', 'all')
+            if past_historical_quotes is not None:
+                self.logger.info('Moving cached get_internal_historical_quotes into bar store.')
+                for cache_data in past_historical_quotes:
+                    if self.bar_store.get_row_count(cache_data['ticker']) == 0:
+                        self.bar_store.write(cache_data['ticker'], BarStore.frame_to_bars(cache_data['historical_quotes']))
+                self.api_cache.pop(('get_internal_historical_quotes', 'all'))
 
             # get internal tickers
             internal_tickers = internal_tickers.get_all_key_values('ticker')
                 
-            # get ticker details data
+            # refresh recent tickers from grouped daily bars
             self.logger.info('Loading get_internal_historical_quotes from cloud.')
+            range_tickers = internal_tickers
+            if grouped:
+                range_tickers = self._update_grouped_historical_quotes(internal_tickers, grouped_max_days, progress_bar)
+
+            # query gaps and new listings per ticker
+            fetch_historical_quotes = lambda ticker: self._fetch_historical_quotes(ticker, history_start_date)
+            records = dict(zip(range_tickers, self._map_concurrently(fetch_historical_quotes, range_tickers, progress_bar)))
+
+            # build historical quotes index
             indices = ['ticker']
             multi_index = MultiIndex(indices, default_index_key='ticker', safe_mode=True)
-            for ticker in tqdm(internal_tickers, disable=not progress_bar):
-                try:
-                    
-                    # get previous historical data
-                    if past_historical_quotes is not None:
-                        cache_data = past_historical_quotes.get('ticker', ticker)
-                        if cache_data is not None: past_historical_quotes_df = cache_data['historical_quotes']
-                        else: past_historical_quotes_df = None
-                    else:
-                        cache_data = None
-                        past_historical_quotes_df = None
-
-                    # get start/end date strings
-                    if past_historical_quotes_df is None: start_date = str(history_start_date)
-                    else: start_date = past_historical_quotes_df.index[-1]
-                    if start_date == date.today(): raise Exception
-                    end_date = str(date.today() + timedelta(days=10))
-
-                    # query historical quotes
-                    historical_quotes = self._query_endpoint(
-                        endpoint_name='{}/range/1/day/{}/{}'.format(ticker, start_date, end_date),
-                        alt_domain=self.api_credentials['api-domain-aggs'],
-                        delayed_status=True
-                    )
-
-                    # validate result
-                    if historical_quotes is None or len(historical_quotes) == 0:
-                        raise Exception
-
-                    # parse quotes
-                    historical_quotes_df = pd.DataFrame.from_records(historical_quotes)
-                    historical_quotes_df.columns = ['volume', 'vwap', 'open', 'close', 'high', 'low', 'date', 'transactions']
-                    historical_quotes_df['date'] = pd.to_datetime(historical_quotes_df['date'], unit='ms').dt.date
-                    historical_quotes_df = historical_quotes_df.set_index('date', drop=True).sort_index(ascending=True)
-                    historical_quotes_df = historical_quotes_df.groupby(historical_quotes_df.index).first()                    
-
-                    # merge quotes
-                    if past_historical_quotes_df is not None:
-                        historical_quotes_df = pd.concat([past_historical_quotes_df, historical_quotes_df], axis=0)
-                        historical_quotes_df = historical_quotes_df.sort_index(ascending=True)
-                        historical_quotes_df = historical_quotes_df.groupby(historical_quotes_df.index).last()
-
-                    # insert indices
-                    multi_index.insert({
-                        'ticker': ticker,
-                        'historical_quotes': historical_quotes_df
-                    })
+            for ticker in internal_tickers:
+                record = records[ticker] if ticker in records else self._read_historical_quotes(ticker)
+                if record is not None: multi_index.insert(record)
 
-                except Exception:
-                    if cache_data is not None:
-                        multi_index.insert(cache_data)
-                
-            # cache item
-            self._add_cache('get_internal_historical_quotes', 'all', multi_index)
             return multi_index
             
         except Exception as e:
             self.logger.exception('Error in get_internal_historical_quotes: ' + str(e))
             return None
 
+    @single_flight
     def get_internal_ticker_details(self, internal_tickers: MultiIndex,
                                     no_cache: bool=False,
                                     cache_expiry_delta: timedelta=timedelta(days=7),
@@ -436,7 +408,8 @@ class PolygonAPIConnector(BaseAPIConnector):
 
             # check cache
             if not no_cache:
-                cached_item = self._get_cache('get_internal_ticker_details', 'all')
+                cached_item = self._get_cache('get_internal_ticker_details', 'all', revalidate=lambda: self.get_internal_ticker_details(
+                    internal_tickers, no_cache=True, cache_expiry_delta=cache_expiry_delta))
                 if cached_item is not None: 
                     self.logger.info('Loading get_internal_ticker_details from cache.')
                     return cached_item
@@ -447,42 +420,11 @@ class PolygonAPIConnector(BaseAPIConnector):
             # get ticker details data
             self.logger.info('Loading get_internal_ticker_details from cloud.')
             indices = ['ticker']
-            multi_index = MultiIndex(indices, default_index_key='ticker', safe_mode=True)
-            for ticker in tqdm(internal_tickers, disable=not progress_bar):
-                try:
-
-                    # query ticker details
-                    ticker_details = self._query_endpoint(
-                        endpoint_name='symbols/{}/company'.format(ticker),    
-                        alt_domain=self.api_credentials['api-domain-meta'],
-                        check_ok=False
-                    )
-
-                    # insert indices
-                    multi_index.insert({
-                        'ticker': to_string(ticker_details['symbol']),
-                        'name': to_string(ticker_details['name']),
-                        'cik': parse_cik(to_string(ticker_details['cik'])),
-                        'figi': to_string(ticker_details['figi']),
-                        'lei': to_string(ticker_details['lei']),
-                        'bloomberg': to_string(ticker_details['bloomberg']),
-                        'sic': to_string(ticker_details['sic']),
-                        'sector': ticker_details['sector'],
-                        'industry': ticker_details['industry'],
-                        'country': ticker_details['country'].upper(),
-                        'list_date': ticker_details['listdate'],
-                        'ceo': ticker_details['ceo'],
-                        'phone': ticker_details['phone'],
-                        'employees': ticker_details['employees'],
-                        'url': ticker_details['url'],
-                        'description': ticker_details['description'],
-                        'hq_address': ticker_details['hq_address'],
-                        'hq_state': ticker_details['hq_state'],
-                        'hq_country': ticker_details['hq_country']
-                    })
-
-                except Exception:
-                    pass
+            records = [r for r in self._map_concurrently(self._fetch_ticker_details, internal_tickers, progress_bar) if r is not None]
+            multi_index, skipped = MultiIndex.from_records(records, indices, default_index_key='ticker', safe_mode=True,
+                                                           secondary_index_keys=['sic', 'sector'],
+                                                           on_conflict='first', return_skipped=True)
+            self.logger.info('Skipped {} conflicting get_internal_ticker_details rows.'.format(len(skipped)))
                 
             # cache item
             self._add_cache('get_internal_ticker_details', 'all', multi_index, 
@@ -494,6 +436,7 @@ class PolygonAPIConnector(BaseAPIConnector):
             self.logger.exception('Error in get_internal_ticker_details: ' + str(e))
             return None
 
+    @single_flight
     def get_internal_ticker_financials(self, internal_tickers: MultiIndex,
                                        no_cache: bool=False,
                                        cache_expiry_delta: timedelta=timedelta(days=7),
@@ -513,7 +456,8 @@ class PolygonAPIConnector(BaseAPIConnector):
 
             # check cache
             if not no_cache:
-                cached_item = self._get_cache('get_internal_ticker_financials', 'all')
+                cached_item = self._get_cache('get_internal_ticker_financials', 'all', revalidate=lambda: self.get_internal_ticker_financials(
+                    internal_tickers, no_cache=True, cache_expiry_delta=cache_expiry_delta))
                 if cached_item is not None: 
                     self.logger.info('Loading get_internal_ticker_financials from cache.')
                     return cached_item
@@ -524,65 +468,10 @@ class PolygonAPIConnector(BaseAPIConnector):
             # get ticker details data
             self.logger.info('Loading get_internal_ticker_financials from cloud.')
             indices = ['ticker']
-            multi_index = MultiIndex(indices, default_index_key='ticker', safe_mode=True)
-            for ticker in tqdm(internal_tickers, disable=not progress_bar):
-                try:
-
-                    # query quarterly financial details
-                    quarterly_financials = self._query_endpoint(
-                        endpoint_name='financials', 
-                        alt_domain=self.api_credentials['api-domain-vx'],
-                        additional_params={
-                            'ticker': ticker,
-                            'limit': 1,
-                            'timeframe': 'quarterly'
-                        }
-                    )
-
-                    # parse quarterly details
-                    fiscal_period = str(quarterly_financials[0]['fiscal_period']) + ' ' + str(quarterly_financials[0]['fiscal_year'])
-                    quarterly_details = {'fiscal_period': fiscal_period}
-                    quarterly_financials = quarterly_financials[0]['financials']
-                    if quarterly_financials is None or len(quarterly_financials) == 0: continue
-                    for financial_class in quarterly_financials.keys():
-                        quarterly_details[financial_class] = {}
-                        for key, value in quarterly_financials[financial_class].items():
-                            quarterly_details[financial_class][key] = value['value']
-                        if len(quarterly_details[financial_class]) == 0:
-                            quarterly_details[financial_class] = None
-
-                    # query annual financial details
-                    annual_financials = self._query_endpoint(
-                        endpoint_name='financials', 
-                        alt_domain=self.api_credentials['api-domain-vx'],
-                        additional_params={
-                            'ticker': ticker,
-                            'limit': 1,
-                            'timeframe': 'annual'
-                        }
-                    )
-
-                    # parse annual details
-                    fiscal_year = str(annual_financials[0]['fiscal_year'])
-                    annual_details = {'fiscal_year': fiscal_year}
-                    annual_financials = annual_financials[0]['financials']
-                    if annual_financials is None or len(annual_financials) == 0: continue
-                    for financial_class in annual_financials.keys():
-                        annual_details[financial_class] = {}
-                        for key, value in annual_financials[financial_class].items():
-                            annual_details[financial_class][key] = value['value']
-                        if len(annual_details[financial_class]) == 0:
-                            annual_details[financial_class] = None
-
-                    # insert indices
-                    multi_index.insert({
-                        'ticker': ticker,
-                        'last_quarterly_report': quarterly_details,
-                        'last_annual_report': annual_details
-                    })
-
-                except Exception:
-                    pass
+            records = [r for r in self._map_concurrently(self._fetch_ticker_financials, internal_tickers, progress_bar) if r is not None]
+            multi_index, skipped = MultiIndex.from_records(records, indices, default_index_key='ticker', safe_mode=True,
+                                                           on_conflict='first', return_skipped=True)
+            self.logger.info('Skipped {} conflicting get_internal_ticker_financials rows.'.format(len(skipped)))
                 
             # cache item
             self._add_cache('get_internal_ticker_financials', 'all', multi_index, 
@@ -594,6 +483,7 @@ class PolygonAPIConnector(BaseAPIConnector):
             self.logger.exception('Error in get_internal_ticker_financials: ' + str(e))
             return None
 
+    @single_flight
     def get_internal_ticker_dividends(self, internal_tickers: MultiIndex, ticker_quotes: MultiIndex,
                                       no_cache: bool=False,
                                       cache_expiry_delta: timedelta=timedelta(days=7),
@@ -610,7 +500,8 @@ class PolygonAPIConnector(BaseAPIConnector):
 
             # check cache
             if not no_cache:
-                cached_item = self._get_cache('get_internal_ticker_dividends', 'all')
+                cached_item = self._get_cache('get_internal_ticker_dividends', 'all', revalidate=lambda: self.get_internal_ticker_dividends(
+                    internal_tickers, ticker_quotes, no_cache=True, cache_expiry_delta=cache_expiry_delta))
                 if cached_item is not None: 
                     self.logger.info('Loading get_internal_ticker_dividends from cache.')
                     return cached_item
@@ -621,63 +512,12 @@ class PolygonAPIConnector(BaseAPIConnector):
             # get ticker details data
             self.logger.info('Loading get_internal_ticker_dividends from cloud.')
             indices = ['ticker']
-            multi_index = MultiIndex(indices, default_index_key='ticker', safe_mode=True)
-            for ticker in tqdm(internal_tickers, disable=not progress_bar):
-                try:
-
-                    # query ticker details
-                    ticker_dividends = self._query_endpoint(
-                        endpoint_name='dividends/{}'.format(ticker),    
-                        alt_domain=self.api_credentials['api-domain-v2']
-                    )
-
-                    # get ticker quote
-                    quote = ticker_quotes.get('ticker', ticker)
-                    if quote is None: continue
-                    else: price = quote['quote']['weighted_mid_price']
-                    
-                    # get last year dividends
-                    idx = 0
-                    annual_dividends = []
-                    cur_dividend_date = ticker_dividends[idx]['paymentDate']
-                    cur_dividend_date = parser.parse(cur_dividend_date).date()
-                    start_dividend_date = cur_dividend_date - timedelta(days=400)
-                    while cur_dividend_date > start_dividend_date:
-                        annual_dividends.append(ticker_dividends[idx]['amount'])
-                        idx += 1
-                        cur_dividend_date = ticker_dividends[idx]['paymentDate']
-                        cur_dividend_date = parser.parse(cur_dividend_date).date()
-
-                    # get dividend metrics
-                    if len(annual_dividends) > 6:
-                        dividend_type = 'monthly'
-                        annual_dividends = annual_dividends[:12]
-                        rolling_annual_dividend = float(sum(annual_dividends))
-                        annual_dividend = float(annual_dividends[0] * 12)
-                        dividend_yield = round(float(annual_dividend / price), 6)
-                    else:
-                        dividend_type = 'quarterly'
-                        annual_dividends = annual_dividends[:4]
-                        rolling_annual_dividend = float(sum(annual_dividends))
-                        annual_dividend = float(annual_dividends[0] * 4)
-                        dividend_yield = round(float(annual_dividend / price), 6)
-
-                    multi_index.insert({
-                        'ticker': ticker,
-                        'dividend_type': dividend_type,
-                        'rolling_annual_dividend': rolling_annual_dividend,
-                        'annual_dividend': annual_dividend,
-                        'dividend_yield': dividend_yield,
-                        'last_dividend': {
-                            'amount': float(ticker_dividends[0]['amount']),
-                            'ex_date': parser.parse(ticker_dividends[0]['exDate']).astimezone(timezone.utc).isoformat(),
-                            'payment_date': parser.parse(ticker_dividends[0]['paymentDate']).astimezone(timezone.utc).isoformat(),
-                            'record_date': parser.parse(ticker_dividends[0]['recordDate']).astimezone(timezone.utc).isoformat()
-                        }
-                    })
-
-                except Exception:
-                    pass
+            fetch_ticker_dividends = lambda ticker: self._fetch_ticker_dividends(ticker, ticker_quotes)
+            records = [r for r in self._map_concurrently(fetch_ticker_dividends, internal_tickers, progress_bar) if r is not None]
+            multi_index, skipped = MultiIndex.from_records(records, indices, default_index_key='ticker', safe_mode=True,
+                                                           sorted_index_keys=['dividend_yield'],
+                                                           on_conflict='first', return_skipped=True)
+            self.logger.info('Skipped {} conflicting get_internal_ticker_dividends rows.'.format(len(skipped)))
                 
             # cache item
             self._add_cache('get_internal_ticker_dividends', 'all', multi_index, 
@@ -689,6 +529,297 @@ class PolygonAPIConnector(BaseAPIConnector):
             self.logger.exception('Error in get_internal_ticker_dividends: ' + str(e))
             return None
 
+    def _fetch_tickers_range(self, ticker_gte: str, ticker_lt: str, max_iters: int) -> list:
+
+        # send initial request
+        params = {
+            'apiKey': self.api_key,
+            'limit': 1000,
+            'active': True,
+            'type': 'CS',
+            'market': 'stocks',
+            'sort': 'ticker',
+            'order': 'asc'
+        }
+        if ticker_gte is not None: params['ticker.gte'] = ticker_gte
+        if ticker_lt is not None: params['ticker.lt'] = ticker_lt
+        response = self._http_get(
+            url=self.api_domain + 'tickers', 
+            params=params
+        )
+
+        # iteratively request cursor
+        tickers_data = []
+        iters = 0
+        while True:
+
+            # verify response
+            response.raise_for_status()
+            json_response = response.json()
+            assert json_response['status'] == 'OK', 'bad response status'
+            tickers_data.extend(json_response.get('results', []))
+
+            # check next url
+            if 'next_url' not in json_response: 
+                return tickers_data
+            elif iters >= max_iters: 
+                raise Exception('max iterations exceeded')
+            else:
+                response = self._http_get(
+                    url=json_response['next_url'], 
+                    headers={
+                        'Authorization': 'Bearer ' + self.api_key
+                    }
+                )
+                iters += 1
+
+    def _fetch_historical_quotes(self, ticker: str, history_start_date: date) -> dict:
+        try:
+
+            # get start/end date strings (refetching the last stored bar)
+            last_date = self.bar_store.get_last_date(ticker)
+            if last_date is None: start_date = str(history_start_date)
+            else: start_date = str(last_date)
+            if last_date == date.today(): raise Exception
+            end_date = str(date.today() + timedelta(days=10))
+
+            # query historical quotes
+            historical_quotes = self._query_endpoint(
+                endpoint_name='{}/range/1/day/{}/{}'.format(ticker, start_date, end_date),
+                alt_domain=self.api_credentials['api-domain-aggs'],
+                delayed_status=True
+            )
+
+            # validate result
+            if historical_quotes is None or len(historical_quotes) == 0:
+                raise Exception
+
+            # parse and append new bars
+            self.bar_store.append(ticker, parse_aggregate_bars(historical_quotes))
+
+        except Exception:
+            pass
+
+        return self._read_historical_quotes(ticker)
+
+    def _update_grouped_historical_quotes(self, internal_tickers: list, grouped_max_days: int, progress_bar: bool) -> list:
+
+        # split tickers with recent bars from gaps and new listings
+        window_start_date = date.today() - timedelta(days=grouped_max_days)
+        last_dates = {ticker: self.bar_store.get_last_date(ticker) for ticker in internal_tickers}
+        grouped_tickers = [t for t in internal_tickers if last_dates[t] is not None and last_dates[t] >= window_start_date]
+        if len(grouped_tickers) == 0:
+            return internal_tickers
+
+        # get weekdays from the earliest last stored bar (refetching it) to
+        # the last completed session, as today's grouped bars are partial
+        grouped_start_date = min(last_dates[t] for t in grouped_tickers)
+        end_date = date.today() - timedelta(days=1)
+        days = [grouped_start_date + timedelta(days=i) for i in range((end_date - grouped_start_date).days + 1)]
+        days = [day for day in days if day.weekday() < 5]
+
+        # query grouped bars, retrying failed days once
+        day_quotes = dict(zip(days, self._map_concurrently(self._fetch_grouped_quotes, days, progress_bar)))
+        retry_days = [day for day in days if day_quotes[day] is None]
+        if len(retry_days) > 0:
+            self.logger.warning('Retrying grouped daily bars for {} days.'.format(len(retry_days)))
+            day_quotes.update(zip(retry_days, self._map_concurrently(self._fetch_grouped_quotes, retry_days)))
+
+        # collect results by ticker
+        ticker_results = {ticker: [] for ticker in grouped_tickers}
+        failed_days = [day for day in days if day_quotes[day] is None]
+        for day in days:
+            for result in day_quotes[day] or []:
+                if result.get('T') in ticker_results: ticker_results[result['T']].append(result)
+
+        # hand tickers behind a failed day back to range queries
+        if len(failed_days) > 0:
+            self.logger.warning('Grouped daily bars failed for {} days; using range queries.'.format(len(failed_days)))
+            grouped_tickers = [t for t in grouped_tickers if last_dates[t] > max(failed_days)]
+
+        # append new bars
+        for ticker in grouped_tickers:
+            if len(ticker_results[ticker]) > 0:
+                self.bar_store.append(ticker, parse_aggregate_bars(ticker_results[ticker]))
+
+        grouped_tickers = set(grouped_tickers)
+        return [ticker for ticker in internal_tickers if ticker not in grouped_tickers]
+
+    def _fetch_grouped_quotes(self, day: date) -> list:
+        try:
+
+            # query all tickers' bars for the day
+            json_response = self._query_endpoint(
+                endpoint_name=str(day),
+                alt_domain=self.api_credentials['api-domain-grouped'],
+                check_ok=False
+            )
+
+            # validate result (empty on market holidays)
+            assert json_response['status'] in ['OK', 'DELAYED'], 'bad response status'
+            return json_response.get('results', [])
+
+        except Exception:
+            return None
+
+    def _read_historical_quotes(self, ticker: str) -> dict:
+        if self.bar_store.get_row_count(ticker) == 0:
+            return None
+        return {
+            'ticker': ticker,
+            'historical_quotes': self.bar_store.read_frame(ticker)
+        }
+
+    def _fetch_ticker_details(self, ticker: str) -> dict:
+        try:
+
+            # query ticker details
+            ticker_details = self._query_endpoint(
+                endpoint_name='symbols/{}/company'.format(ticker),    
+                alt_domain=self.api_credentials['api-domain-meta'],
+                check_ok=False
+            )
+
+            return {
+                'ticker': to_string(ticker_details['symbol']),
+                'name': to_string(ticker_details['name']),
+                'cik': parse_cik(to_string(ticker_details['cik'])),
+                'figi': to_string(ticker_details['figi']),
+                'lei': to_string(ticker_details['lei']),
+                'bloomberg': to_string(ticker_details['bloomberg']),
+                'sic': to_string(ticker_details['sic']),
+                'sector': ticker_details['sector'],
+                'industry': ticker_details['industry'],
+                'country': ticker_details['country'].upper(),
+                'list_date': ticker_details['listdate'],
+                'ceo': ticker_details['ceo'],
+                'phone': ticker_details['phone'],
+                'employees': ticker_details['employees'],
+                'url': ticker_details['url'],
+                'description': ticker_details['description'],
+                'hq_address': ticker_details['hq_address'],
+                'hq_state': ticker_details['hq_state'],
+                'hq_country': ticker_details['hq_country']
+            }
+
+        except Exception:
+            return None
+
+    def _fetch_ticker_financials(self, ticker: str) -> dict:
+        try:
+
+            # query quarterly financial details
+            quarterly_financials = self._query_endpoint(
+                endpoint_name='financials', 
+                alt_domain=self.api_credentials['api-domain-vx'],
+                additional_params={
+                    'ticker': ticker,
+                    'limit': 1,
+                    'timeframe': 'quarterly'
+                }
+            )
+
+            # parse quarterly details
+            fiscal_period = str(quarterly_financials[0]['fiscal_period']) + ' ' + str(quarterly_financials[0]['fiscal_year'])
+            quarterly_details = {'fiscal_period': fiscal_period}
+            quarterly_financials = quarterly_financials[0]['financials']
+            if quarterly_financials is None or len(quarterly_financials) == 0: return None
+            for financial_class in quarterly_financials.keys():
+                quarterly_details[financial_class] = {}
+                for key, value in quarterly_financials[financial_class].items():
+                    quarterly_details[financial_class][key] = value['value']
+                if len(quarterly_details[financial_class]) == 0:
+                    quarterly_details[financial_class] = None
+
+            # query annual financial details
+            annual_financials = self._query_endpoint(
+                endpoint_name='financials', 
+                alt_domain=self.api_credentials['api-domain-vx'],
+                additional_params={
+                    'ticker': ticker,
+                    'limit': 1,
+                    'timeframe': 'annual'
+                }
+            )
+
+            # parse annual details
+            fiscal_year = str(annual_financials[0]['fiscal_year'])
+            annual_details = {'fiscal_year': fiscal_year}
+            annual_financials = annual_financials[0]['financials']
+            if annual_financials is None or len(annual_financials) == 0: return None
+            for financial_class in annual_financials.keys():
+                annual_details[financial_class] = {}
+                for key, value in annual_financials[financial_class].items():
+                    annual_details[financial_class][key] = value['value']
+                if len(annual_details[financial_class]) == 0:
+                    annual_details[financial_class] = None
+
+            return {
+                'ticker': ticker,
+                'last_quarterly_report': quarterly_details,
+                'last_annual_report': annual_details
+            }
+
+        except Exception:
+            return None
+
+    def _fetch_ticker_dividends(self, ticker: str, ticker_quotes: MultiIndex) -> dict:
+        try:
+
+            # query ticker details
+            ticker_dividends = self._query_endpoint(
+                endpoint_name='dividends/{}'.format(ticker),    
+                alt_domain=self.api_credentials['api-domain-v2']
+            )
+
+            # get ticker quote
+            quote = ticker_quotes.get('ticker', ticker)
+            if quote is None: return None
+            else: price = quote['quote']['weighted_mid_price']
+
+            # get last year dividends
+            idx = 0
+            annual_dividends = []
+            cur_dividend_date = ticker_dividends[idx]['paymentDate']
+            cur_dividend_date = parser.parse(cur_dividend_date).date()
+            start_dividend_date = cur_dividend_date - timedelta(days=400)
+            while cur_dividend_date > start_dividend_date:
+                annual_dividends.append(ticker_dividends[idx]['amount'])
+                idx += 1
+                cur_dividend_date = ticker_dividends[idx]['paymentDate']
+                cur_dividend_date = parser.parse(cur_dividend_date).date()
+
+            # get dividend metrics
+            if len(annual_dividends) > 6:
+                dividend_type = 'monthly'
+                annual_dividends = annual_dividends[:12]
+                rolling_annual_dividend = float(sum(annual_dividends))
+                annual_dividend = float(annual_dividends[0] * 12)
+                dividend_yield = round(float(annual_dividend / price), 6)
+            else:
+                dividend_type = 'quarterly'
+                annual_dividends = annual_dividends[:4]
+                rolling_annual_dividend = float(sum(annual_dividends))
+                annual_dividend = float(annual_dividends[0] * 4)
+                dividend_yield = round(float(annual_dividend / price), 6)
+
+            return {
+                'ticker': ticker,
+                'dividend_type': dividend_type,
+                'rolling_annual_dividend': rolling_annual_dividend,
+                'annual_dividend': annual_dividend,
+                'dividend_yield': dividend_yield,
+                'last_dividend': {
+                    'amount': float(ticker_dividends[0]['amount']),
+                    'ex_date': parser.parse(ticker_dividends[0]['exDate']).astimezone(timezone.utc).isoformat(),
+                    'payment_date': parser.parse(ticker_dividends[0]['paymentDate']).astimezone(timezone.utc).isoformat(),
+                    'record_date': parser.parse(ticker_dividends[0]['recordDate']).astimezone(timezone.utc).isoformat()
+                }
+            }
+
+        except Exception:
+            return None
+
     def _query_endpoint(self, endpoint_name: str,
                         alt_domain: str=None,
                         check_ok: bool=True,
@@ -698,7 +829,7 @@ class PolygonAPIConnector(BaseAPIConnector):
         # send no-param request
         if alt_domain is None: domain = self.api_domain
         else: domain = alt_domain
-        response = requests.get(
+        response = self._http_get(
             url=domain + endpoint_name, 
             params={
                 'apiKey': self.api_key,
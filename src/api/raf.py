@@ -1,8 +1,7 @@
 from datetime import timedelta
-import requests
 
 from src.utils.functional.identifiers import check_ticker, to_string, parse_cik
-from src.api.base import BaseAPIConnector
+from src.api.base import BaseAPIConnector, single_flight
 from src.utils.mindex import MultiIndex
 
 
@@ -11,6 +10,7 @@ class RankAndFiledAPIConnector(BaseAPIConnector):
     def __init__(self, credentials_file_path: str):
         super().__init__(self.__class__.__name__, credentials_file_path)
 
+    @single_flight
     def get_tickers(self,
                     no_cache: bool=False,
                     cache_expiry_delta: timedelta=timedelta(days=1)) -> MultiIndex:
@@ -40,8 +40,12 @@ class RankAndFiledAPIConnector(BaseAPIConnector):
             
             # get tickers data
             self.logger.info('Loading get_tickers from cloud.')
-            response = requests.get(self.api_domain + 'cik_ticker.csv')
-            response.raise_for_status()          
+            url = self.api_domain + 'cik_ticker.csv'
+            response, multi_index = self._conditional_get('get_tickers', url, no_cache=no_cache,
+                                                          expiry_delta=cache_expiry_delta)
+            if multi_index is not None:
+                self.logger.info('Reviving get_tickers from cache (not modified).')
+                return multi_index
             content = str(response.content.decode('utf-8'))
 
             # parse csv data
@@ -49,9 +53,8 @@ class RankAndFiledAPIConnector(BaseAPIConnector):
             data = [line.split('|') for line in lines]
             data = data[1:]
             
-            # build multi-index
-            indices = ['ticker']
-            multi_index = MultiIndex(indices, default_index_key='ticker', safe_mode=True)
+            # parse records
+            records = []
             for row in data:
                 try:
 
@@ -65,7 +68,7 @@ class RankAndFiledAPIConnector(BaseAPIConnector):
                     elif len(exchange) == 0: continue
                     elif exchange.startswith('OTC'): continue
                     else:
-                        multi_index.insert({
+                        records.append({
                             'cik': parse_cik(to_string(row[0])),
                             'ticker': to_string(row[1]),
                             'name': to_string(row[2]),
@@ -79,10 +82,16 @@ class RankAndFiledAPIConnector(BaseAPIConnector):
                 except Exception:
                     continue
 
+            # build multi-index
+            indices = ['ticker']
+            multi_index, skipped = MultiIndex.from_records(records, indices, default_index_key='ticker', safe_mode=True,
+                                                           on_conflict='first', return_skipped=True)
+            self.logger.info('Skipped {} conflicting get_tickers rows.'.format(len(skipped)))
+
             # cache item
             if not no_cache:
-                self._add_cache('get_tickers', 'all', multi_index, 
-                                expiry_delta=cache_expiry_delta)
+                self._add_conditional_cache('get_tickers', url, response, multi_index,
+                                            expiry_delta=cache_expiry_delta)
 
             return multi_index
 
@@ -90,6 +99,7 @@ class RankAndFiledAPIConnector(BaseAPIConnector):
             self.logger.exception('Error in get_tickers: ' + str(e))
             return None
 
+    @single_flight
     def get_industries(self,
                        no_cache: bool=False,
                        cache_expiry_delta: timedelta=timedelta(days=1)) -> MultiIndex:
@@ -115,8 +125,12 @@ class RankAndFiledAPIConnector(BaseAPIConnector):
                 
             # get industries data
             self.logger.info('Loading get_industries from cloud.')
-            response = requests.get(self.api_domain + 'sic_naics.csv')
-            response.raise_for_status()          
+            url = self.api_domain + 'sic_naics.csv'
+            response, multi_index = self._conditional_get('get_industries', url, no_cache=no_cache,
+                                                          expiry_delta=cache_expiry_delta)
+            if multi_index is not None:
+                self.logger.info('Reviving get_industries from cache (not modified).')
+                return multi_index
             content = str(response.content.decode('utf-8'))
 
             # parse csv data
@@ -124,16 +138,15 @@ class RankAndFiledAPIConnector(BaseAPIConnector):
             data = [line.split('|') for line in lines]
             data = data[1:]
             
-            # build multi-index
-            indices = ['sic']
-            multi_index = MultiIndex(indices, default_index_key='sic', safe_mode=True)
+            # parse records
+            records = []
             for row in data:
                 try:
 
                     sic = row[0]
                     if len(sic) == 0: continue
                     else:
-                        multi_index.insert({
+                        records.append({
                             'sic': to_string(row[0]),
                             'sic_classification': to_string(row[1]),
                             'naics': to_string(row[2]),
@@ -142,11 +155,17 @@ class RankAndFiledAPIConnector(BaseAPIConnector):
 
                 except Exception:
                     continue
-        
+
+            # build multi-index
+            indices = ['sic']
+            multi_index, skipped = MultiIndex.from_records(records, indices, default_index_key='sic', safe_mode=True,
+                                                           on_conflict='first', return_skipped=True)
+            self.logger.info('Skipped {} conflicting get_industries rows.'.format(len(skipped)))
+
             # cache item
             if not no_cache:
-                self._add_cache('get_industries', 'all', multi_index, 
-                                expiry_delta=cache_expiry_delta)
+                self._add_conditional_cache('get_industries', url, response, multi_index,
+                                            expiry_delta=cache_expiry_delta)
 
             return multi_index
 
@@ -154,6 +173,7 @@ class RankAndFiledAPIConnector(BaseAPIConnector):
             self.logger.exception('Error in get_industries: ' + str(e))
             return None
 
+    @single_flight
     def get_cusips(self,
                    no_cache: bool=False,
                    cache_expiry_delta: timedelta=timedelta(days=1)) -> MultiIndex:
@@ -179,8 +199,12 @@ class RankAndFiledAPIConnector(BaseAPIConnector):
                 
             # get cusips data
             self.logger.info('Loading get_cusips from cloud.')
-            response = requests.get(self.api_domain + 'cusip_ticker.csv')
-            response.raise_for_status()          
+            url = self.api_domain + 'cusip_ticker.csv'
+            response, multi_index = self._conditional_get('get_cusips', url, no_cache=no_cache,
+                                                          expiry_delta=cache_expiry_delta)
+            if multi_index is not None:
+                self.logger.info('Reviving get_cusips from cache (not modified).')
+                return multi_index
             content = str(response.content.decode('utf-8'))
 
             # parse csv data
@@ -188,9 +212,8 @@ class RankAndFiledAPIConnector(BaseAPIConnector):
             data = [line.split('|') for line in lines]
             data = data[1:-1]
             
-            # build multi-index
-            indices = ['ticker']
-            multi_index = MultiIndex(indices, default_index_key='ticker', safe_mode=True)
+            # parse records
+            records = []
             for row in data:
                 try:
 
@@ -203,7 +226,7 @@ class RankAndFiledAPIConnector(BaseAPIConnector):
                     elif len(issuer) == 0: continue
                     elif len(cusip) == 0: continue
                     else:
-                        multi_index.insert({
+                        records.append({
                             'cik': parse_cik(to_string(row[3])),
                             'ticker': to_string(row[1]),
                             'issuer': to_string(row[0]),
@@ -212,11 +235,17 @@ class RankAndFiledAPIConnector(BaseAPIConnector):
 
                 except Exception:
                     continue
-            
+
+            # build multi-index
+            indices = ['ticker']
+            multi_index, skipped = MultiIndex.from_records(records, indices, default_index_key='ticker', safe_mode=True,
+                                                           on_conflict='first', return_skipped=True)
+            self.logger.info('Skipped {} conflicting get_cusips rows.'.format(len(skipped)))
+
             # cache item
             if not no_cache:
-                self._add_cache('get_cusips', 'all', multi_index, 
-                                expiry_delta=cache_expiry_delta)
+                self._add_conditional_cache('get_cusips', url, response, multi_index,
+                                            expiry_delta=cache_expiry_delta)
 
             return multi_index
 
@@ -224,6 +253,7 @@ class RankAndFiledAPIConnector(BaseAPIConnector):
             self.logger.exception('Error in get_cusips: ' + str(e))
             return None
     
+    @single_flight
     def get_leis(self,
                  no_cache: bool=False,
                  cache_expiry_delta: timedelta=timedelta(days=1)) -> MultiIndex:
@@ -249,8 +279,12 @@ class RankAndFiledAPIConnector(BaseAPIConnector):
             
             # get leis data
             self.logger.info('Loading get_leis from cloud.')
-            response = requests.get(self.api_domain + 'cik_lei.csv')
-            response.raise_for_status()          
+            url = self.api_domain + 'cik_lei.csv'
+            response, multi_index = self._conditional_get('get_leis', url, no_cache=no_cache,
+                                                          expiry_delta=cache_expiry_delta)
+            if multi_index is not None:
+                self.logger.info('Reviving get_leis from cache (not modified).')
+                return multi_index
             content = str(response.content.decode('utf-8'))
 
             # parse csv data
@@ -258,9 +292,8 @@ class RankAndFiledAPIConnector(BaseAPIConnector):
             data = [line.split('|') for line in lines]
             data = data[1:]
             
-            # build multi-index
-            indices = ['cik']
-            multi_index = MultiIndex(indices, default_index_key='cik', safe_mode=True)
+            # parse records
+            records = []
             for row in data:
                 try:
 
@@ -271,7 +304,7 @@ class RankAndFiledAPIConnector(BaseAPIConnector):
                     elif len(name) == 0: continue
                     elif len(lei) == 0: continue
                     else:
-                        multi_index.insert({
+                        records.append({
                             'cik': parse_cik(to_string(row[0])),
                             'name': to_string(row[1]),
                             'lei': to_string(row[2]),
@@ -280,11 +313,17 @@ class RankAndFiledAPIConnector(BaseAPIConnector):
 
                 except Exception:
                     continue
-                    
+
+            # build multi-index
+            indices = ['cik']
+            multi_index, skipped = MultiIndex.from_records(records, indices, default_index_key='cik', safe_mode=True,
+                                                           on_conflict='first', return_skipped=True)
+            self.logger.info('Skipped {} conflicting get_leis rows.'.format(len(skipped)))
+
             # cache item
             if not no_cache:
-                self._add_cache('get_leis', 'all', multi_index, 
-                                expiry_delta=cache_expiry_delta)
+                self._add_conditional_cache('get_leis', url, response, multi_index,
+                                            expiry_delta=cache_expiry_delta)
 
             return multi_index
 
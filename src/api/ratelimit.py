@@ -0,0 +1,195 @@
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+import threading
+import logging
+import time
+import json
+import redis
+
+
+# refill, then take a token or return the wait (ms) until one is due;
+# each granted token raises the rate additively towards its maximum
+_ACQUIRE_SCRIPT = """
+local max_rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local increase = tonumber(ARGV[3])
+local now = tonumber(ARGV[4])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts', 'rate', 'blocked_until')
+local tokens = tonumber(bucket[1]) or burst
+local ts = tonumber(bucket[2]) or now
+local rate = tonumber(bucket[3]) or max_rate
+local blocked_until = tonumber(bucket[4]) or 0
+if now < blocked_until then
+    return blocked_until - now
+end
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate / 1000)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    rate = math.min(max_rate, rate + increase)
+else
+    wait = math.ceil((1 - tokens) * 1000 / rate)
+end
+redis.call('HMSET', KEYS[1], 'tokens', tokens, 'ts', now, 'rate', rate)
+redis.call('PEXPIRE', KEYS[1], ARGV[5])
+return wait
+"""
+
+# cut the rate multiplicatively, empty the bucket and block until the
+# server's retry time
+_THROTTLE_SCRIPT = """
+local max_rate = tonumber(ARGV[1])
+local min_rate = tonumber(ARGV[2])
+local backoff = tonumber(ARGV[3])
+local now = tonumber(ARGV[4])
+local blocked_until = now + tonumber(ARGV[5])
+local bucket = redis.call('HMGET', KEYS[1], 'rate', 'blocked_until')
+local rate = math.max(min_rate, (tonumber(bucket[1]) or max_rate) * backoff)
+blocked_until = math.max(blocked_until, tonumber(bucket[2]) or 0)
+redis.call('HMSET', KEYS[1], 'tokens', 0, 'ts', now, 'rate', rate, 'blocked_until', blocked_until)
+redis.call('PEXPIRE', KEYS[1], ARGV[6])
+return tostring(rate)
+"""
+
+
+class ThrottledError(Exception):
+    """
+        Raised when a host still throttles a request after every retry.
+    """
+
+    def __init__(self, host: str, attempts: int):
+        super().__init__('throttled by {} after {} attempts'.format(host, attempts))
+        self.host = host
+        self.attempts = attempts
+
+
+class TokenBucketRateLimiter(object):
+    """
+        Per-host token buckets kept in Redis, so every process sharing
+        the server draws from the same request budget. Each host has a
+        maximum rate and burst; a throttled response cuts the host's rate
+        (down to a floor) and blocks it for the server's Retry-After, and
+        every granted request raises the rate back additively. Hosts
+        without a configured limit are not limited. If Redis is
+        unreachable the buckets fall back to this process.
+    """
+
+    def __init__(self, rate_limits: dict, redis_credentials_file_path: str=None,
+                 key_prefix: str='rate-limit',
+                 logger: logging.Logger=None):
+
+        self.rate_limits = rate_limits
+        self.key_prefix = key_prefix
+        self.logger = logger if logger is not None else logging.getLogger(self.__class__.__name__)
+        self.local_buckets = {}
+        self.local_lock = threading.Lock()
+
+        # connect to redis
+        self.redis = None
+        if redis_credentials_file_path is not None:
+            f = open(redis_credentials_file_path, 'r')
+            credentials = json.load(f)
+            f.close()
+            self.redis = redis.Redis(host=credentials['host'], port=credentials['port'], db=0, socket_keepalive=True)
+            self.acquire_script = self.redis.register_script(_ACQUIRE_SCRIPT)
+            self.throttle_script = self.redis.register_script(_THROTTLE_SCRIPT)
+
+    def acquire(self, host: str) -> float:
+        """
+            Blocks until a request to the host is allowed and returns the
+            seconds waited.
+        """
+
+        limit = self.rate_limits.get(host)
+        if limit is None:
+            return 0.0
+
+        waited = 0.0
+        while True:
+            wait_ms = self._acquire(host, limit)
+            if wait_ms <= 0: return waited
+            time.sleep(wait_ms / 1000)
+            waited += wait_ms / 1000
+
+    def throttle(self, host: str, retry_after_secs: float=None) -> float:
+        """
+            Records a throttled response from the host and returns its
+            reduced rate (requests per second).
+        """
+
+        limit = self.rate_limits.get(host)
+        if limit is None:
+            return None
+        elif retry_after_secs is None:
+            retry_after_secs = limit.get('default-retry-after-secs', 1)
+        return self._throttle(host, limit, retry_after_secs)
+
+    @staticmethod
+    def parse_retry_after(value: str) -> float:
+        """
+            Parses a Retry-After header given either as seconds or as an
+            HTTP date.
+        """
+
+        if value is None:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            retry_dt = parsedate_to_datetime(value)
+            return max(0.0, (retry_dt - datetime.now(tz=timezone.utc)).total_seconds())
+        except (TypeError, ValueError):
+            return None
+
+    def _acquire(self, host: str, limit: dict) -> int:
+        args = [limit['rate-per-sec'], limit.get('burst', limit['rate-per-sec']),
+                limit['rate-per-sec'] * limit.get('increase-ratio', 0.01), self._now_ms(), 60000]
+        if self.redis is not None:
+            try:
+                return int(self.acquire_script(keys=[self._bucket_key(host)], args=args))
+            except redis.exceptions.RedisError as e:
+                self.logger.warning('Rate limiter falling back to local buckets: {}.'.format(e))
+                self.redis = None
+
+        # local bucket
+        max_rate, burst, increase, now = args[:4]
+        with self.local_lock:
+            bucket = self.local_buckets.setdefault(host, {'tokens': burst, 'ts': now, 'rate': max_rate, 'blocked_until': 0})
+            if now < bucket['blocked_until']:
+                return bucket['blocked_until'] - now
+            bucket['tokens'] = min(burst, bucket['tokens'] + max(0, now - bucket['ts']) * bucket['rate'] / 1000)
+            bucket['ts'] = now
+            if bucket['tokens'] >= 1:
+                bucket['tokens'] -= 1
+                bucket['rate'] = min(max_rate, bucket['rate'] + increase)
+                return 0
+            else:
+                return int(-(-(1 - bucket['tokens']) * 1000 // bucket['rate']))
+
+    def _throttle(self, host: str, limit: dict, retry_after_secs: float) -> float:
+        args = [limit['rate-per-sec'], limit.get('min-rate-per-sec', limit['rate-per-sec'] / 20),
+                limit.get('backoff-ratio', 0.5), self._now_ms(), int(retry_after_secs * 1000), 60000]
+        if self.redis is not None:
+            try:
+                return float(self.throttle_script(keys=[self._bucket_key(host)], args=args))
+            except redis.exceptions.RedisError as e:
+                self.logger.warning('Rate limiter falling back to local buckets: {}.'.format(e))
+                self.redis = None
+
+        # local bucket
+        max_rate, min_rate, backoff, now, retry_after_ms = args[:5]
+        with self.local_lock:
+            bucket = self.local_buckets.setdefault(host, {'tokens': 0, 'ts': now, 'rate': max_rate, 'blocked_until': 0})
+            bucket['rate'] = max(min_rate, bucket['rate'] * backoff)
+            bucket['tokens'], bucket['ts'] = 0, now
+            bucket['blocked_until'] = max(bucket['blocked_until'], now + retry_after_ms)
+            return bucket['rate']
+
+    def _bucket_key(self, host: str) -> str:
+        return '{}:{}'.format(self.key_prefix, host)
+
+    @staticmethod
+    def _now_ms() -> int:
+        return int(time.time() * 1000)
@@ -1,10 +1,8 @@
 from datetime import datetime, timezone
-from requests_html import HTMLSession
 from typing import Tuple, Callable, Any
 from bs4 import BeautifulSoup, Tag
 from dateutil import parser
 from tqdm import tqdm
-import requests
 import uuid
 import time
 
@@ -176,7 +174,7 @@ class SECAPIConnector(BaseAPIConnector):
 
     def _query_filings_endpoint(self, json_body: dict) -> dict: 
         try:
-            response = requests.post(
+            response = self._http_post(
                 url=self.api_domain,
                 params={'token': self.api_key},
                 json=json_body
@@ -193,8 +191,7 @@ class SECAPIConnector(BaseAPIConnector):
     def _fetch_form_4_xml_data(self, xml_url: str, tickers: MultiIndex) -> dict:
 
         # query xml form
-        session = HTMLSession()
-        r = session.get(xml_url)
+        r = self._http_get(xml_url, headers={'User-Agent': 'Market Views'})
         r.raise_for_status()
 
         # parse xml
@@ -1,11 +1,10 @@
 from datetime import timedelta, date
 from io import BytesIO
-import requests
 import zipfile
 
 from src.utils.functional.identifiers import parse_cik, check_ticker, to_string
-from src.api.base import BaseAPIConnector
-from src.utils.mindex import MultiIndex
+from src.api.base import BaseAPIConnector, single_flight
+from src.utils.mindex import MultiIndex, ColumnarMultiIndex
 
 
 class SECGovAPIConnector(BaseAPIConnector):
@@ -13,6 +12,7 @@ class SECGovAPIConnector(BaseAPIConnector):
     def __init__(self, credentials_file_path: str):
         super().__init__(self.__class__.__name__, credentials_file_path)
 
+    @single_flight
     def get_ciks(self,
                  no_cache: bool=False,
                  cache_expiry_delta: timedelta=timedelta(days=1)) -> MultiIndex:
@@ -37,13 +37,16 @@ class SECGovAPIConnector(BaseAPIConnector):
             
             # get ciks data
             self.logger.info('Loading get_ciks from cloud.')
-            response = requests.get(self.api_domain + 'company_tickers.json')
-            response.raise_for_status()
+            url = self.api_domain + 'company_tickers.json'
+            response, multi_index = self._conditional_get('get_ciks', url, no_cache=no_cache,
+                                                          expiry_delta=cache_expiry_delta)
+            if multi_index is not None:
+                self.logger.info('Reviving get_ciks from cache (not modified).')
+                return multi_index
             data = response.json()
             
-            # build multi-index
-            indices = ['ticker']
-            multi_index = MultiIndex(indices, default_index_key='ticker', safe_mode=True)
+            # parse records
+            records = []
             for _, v in data.items():
                 try:
 
@@ -51,8 +54,8 @@ class SECGovAPIConnector(BaseAPIConnector):
                     if not check_ticker(v['ticker']):
                         continue
 
-                    # insert ticker
-                    multi_index.insert({
+                    # add ticker
+                    records.append({
                         'ticker': to_string(v['ticker']),
                         'cik': parse_cik(to_string(v['cik_str'])),
                         'name': to_string(v['title'])
@@ -60,11 +63,17 @@ class SECGovAPIConnector(BaseAPIConnector):
 
                 except Exception:
                     continue
-            
+
+            # build multi-index
+            indices = ['ticker']
+            multi_index, skipped = MultiIndex.from_records(records, indices, default_index_key='ticker', safe_mode=True,
+                                                           on_conflict='first', return_skipped=True)
+            self.logger.info('Skipped {} conflicting get_ciks rows.'.format(len(skipped)))
+
             # cache item
             if not no_cache:
-                self._add_cache('get_ciks', 'all', multi_index, 
-                                expiry_delta=cache_expiry_delta)
+                self._add_conditional_cache('get_ciks', url, response, multi_index,
+                                            expiry_delta=cache_expiry_delta)
 
             return multi_index
 
@@ -72,6 +81,7 @@ class SECGovAPIConnector(BaseAPIConnector):
             self.logger.exception('Error in get_ciks: ' + str(e))
             return None
 
+    @single_flight
     def get_all_ciks(self,
                      no_cache: bool=False,
                      cache_expiry_delta: timedelta=timedelta(days=1)) -> MultiIndex:
@@ -95,13 +105,12 @@ class SECGovAPIConnector(BaseAPIConnector):
             
             # get all ciks data
             self.logger.info('Loading get_all_ciks from cloud.')
-            response = requests.get(
-                url=self.api_credentials['api-domain-archives'] + 'cik-lookup-data.txt',
-                headers={
-                    'User-Agent': 'Market Views'
-                }
-            )
-            response.raise_for_status()
+            url = self.api_credentials['api-domain-archives'] + 'cik-lookup-data.txt'
+            response, multi_index = self._conditional_get('get_all_ciks', url, headers={'User-Agent': 'Market Views'}, no_cache=no_cache,
+                                                          expiry_delta=cache_expiry_delta)
+            if multi_index is not None:
+                self.logger.info('Reviving get_all_ciks from cache (not modified).')
+                return multi_index
             
             # parse cik data
             all_ciks = {}
@@ -116,19 +125,19 @@ class SECGovAPIConnector(BaseAPIConnector):
                 if cik in all_ciks: all_ciks[cik].append(company_name)
                 else: all_ciks[cik] = [company_name]
 
-            # insert ciks
+            # parse records
+            records = [{'cik': k, 'company_names': v} for k, v in all_ciks.items()]
+
+            # build multi-index
             indices = ['cik']
-            multi_index = MultiIndex(indices, default_index_key='cik', safe_mode=True)
-            for k, v in all_ciks.items():
-                multi_index.insert({
-                    'cik': k,
-                    'company_names': v
-                })
+            multi_index, skipped = ColumnarMultiIndex.from_records(records, indices, default_index_key='cik', safe_mode=True,
+                                                                   on_conflict='first', return_skipped=True)
+            self.logger.info('Skipped {} conflicting get_all_ciks rows.'.format(len(skipped)))
 
             # cache item
             if not no_cache:
-                self._add_cache('get_all_ciks', 'all', multi_index, 
-                                expiry_delta=cache_expiry_delta)
+                self._add_conditional_cache('get_all_ciks', url, response, multi_index,
+                                            expiry_delta=cache_expiry_delta)
 
             return multi_index
 
@@ -136,6 +145,7 @@ class SECGovAPIConnector(BaseAPIConnector):
             self.logger.exception('Error in get_all_ciks: ' + str(e))
             return None
 
+    @single_flight
     def get_cusips(self,
                    no_cache: bool=False,
                    cache_expiry_delta: timedelta=timedelta(days=1)) -> MultiIndex:
@@ -165,7 +175,7 @@ class SECGovAPIConnector(BaseAPIConnector):
 
             # get cusips data
             self.logger.info('Loading get_cusips from cloud.')
-            response = requests.get(self.api_domain + query_code)
+            response = self._http_get(self.api_domain + query_code)
             response.raise_for_status()   
             
             # parse ZIP file
@@ -177,9 +187,8 @@ class SECGovAPIConnector(BaseAPIConnector):
             data = data[1:-2]
             zip_fp.close()
             
-            # build multi-index
-            indices = ['ticker']
-            multi_index = MultiIndex(indices, default_index_key='ticker', safe_mode=True)
+            # parse records
+            records = []
             for row in data:
                 try:
 
@@ -187,8 +196,8 @@ class SECGovAPIConnector(BaseAPIConnector):
                     if not check_ticker(row[2]):
                         continue
 
-                    # insert ticker
-                    multi_index.insert({
+                    # add ticker
+                    records.append({
                         'ticker': to_string(row[2]),
                         'cusip': to_string(row[1]),
                         'name': to_string(row[4])
@@ -196,7 +205,13 @@ class SECGovAPIConnector(BaseAPIConnector):
                     
                 except Exception:
                     continue
-            
+
+            # build multi-index
+            indices = ['ticker']
+            multi_index, skipped = MultiIndex.from_records(records, indices, default_index_key='ticker', safe_mode=True,
+                                                           on_conflict='first', return_skipped=True)
+            self.logger.info('Skipped {} conflicting get_cusips rows.'.format(len(skipped)))
+
             # cache item
             if not no_cache:
                 self._add_cache('get_cusips', 'all', multi_index, 
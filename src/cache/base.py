@@ -0,0 +1,66 @@
+from datetime import datetime
+from abc import ABC, abstractmethod
+from typing import Any, Iterator
+
+
+class CacheEntry(object):
+
+    def __init__(self, value: Any, expiry_dt: datetime=None, size: int=0):
+        self.value = value
+        self.expiry_dt = expiry_dt
+        self.size = size
+
+    def is_expired(self, current_dt: datetime) -> bool:
+        return self.expiry_dt is not None and current_dt >= self.expiry_dt
+
+
+class RevalidatedValue(object):
+    """
+        Cached value that turns stale (but stays servable) before its
+        entry expires, for stale-while-revalidate cache ids.
+    """
+
+    def __init__(self, value: Any, stale_dt: datetime):
+        self.value = value
+        self.stale_dt = stale_dt
+
+    def is_stale(self, current_dt: datetime) -> bool:
+        return current_dt >= self.stale_dt
+
+
+class BaseCacheTier(ABC):
+
+    # write-through tiers receive every added entry and keep entries
+    # promoted from them
+    write_through = False
+
+    @abstractmethod
+    def __len__(self) -> int:
+        raise NotImplemented
+
+    @abstractmethod
+    def get(self, key: tuple) -> CacheEntry:
+        raise NotImplemented
+
+    @abstractmethod
+    def set(self, key: tuple, entry: CacheEntry) -> list:
+        """
+            Stores an entry and returns the (key, entry) pairs evicted
+            to make room for it.
+        """
+
+        raise NotImplemented
+
+    @abstractmethod
+    def pop(self, key: tuple) -> CacheEntry:
+        raise NotImplemented
+
+    @abstractmethod
+    def items(self) -> Iterator[tuple]:
+        raise NotImplemented
+
+    def sweep(self, current_dt: datetime) -> int:
+        expired_keys = [key for key, entry in self.items() if entry.is_expired(current_dt)]
+        for key in expired_keys:
+            self.pop(key)
+        return len(expired_keys)
@@ -0,0 +1,95 @@
+from collections import OrderedDict
+from typing import Iterator
+from pathlib import Path
+import hashlib
+import pickle
+import os
+
+from src.cache.base import BaseCacheTier, CacheEntry
+
+
+class DiskCacheTier(BaseCacheTier):
+    """
+        Spill tier storing one pickle file per entry, bounded by total
+        file bytes with LRU eviction. Each file holds a (key, expiry)
+        header pickle followed by the value pickle, so the tier can
+        re-index its directory without loading values; pop and items
+        return entries without their values for the same reason.
+    """
+
+    def __init__(self, directory: str, max_bytes: int=None,
+                 load: bool=True):
+
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+        # define lru index (key -> (path, expiry, size))
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+
+        # index existing entry files
+        Path(directory).mkdir(parents=True, exist_ok=True)
+        for path in sorted(Path(directory).glob('*.pkl'), key=lambda p: p.stat().st_mtime):
+            if not load:
+                path.unlink()
+                continue
+            try:
+                f = open(path, 'rb')
+                key, expiry_dt = pickle.load(f)
+                f.close()
+                self.entries[key] = (str(path), expiry_dt, path.stat().st_size)
+                self.total_bytes += path.stat().st_size
+            except Exception:
+                path.unlink()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: tuple) -> CacheEntry:
+        if key not in self.entries:
+            return None
+        path, expiry_dt, size = self.entries[key]
+        self.entries.move_to_end(key)
+
+        # load value
+        f = open(path, 'rb')
+        pickle.load(f)
+        value = pickle.load(f)
+        f.close()
+        return CacheEntry(value, expiry_dt, size)
+
+    def set(self, key: tuple, entry: CacheEntry) -> list:
+        self.pop(key)
+
+        # write entry file atomically
+        path = os.path.join(self.directory, hashlib.sha1(pickle.dumps(key)).hexdigest() + '.pkl')
+        tmp_path = path + '.tmp'
+        f = open(tmp_path, 'wb')
+        pickle.dump((key, entry.expiry_dt), f)
+        pickle.dump(entry.value, f)
+        f.close()
+        os.replace(tmp_path, path)
+        size = os.path.getsize(path)
+        if self.max_bytes is not None and size > self.max_bytes:
+            os.remove(path)
+            return [(key, entry)]
+        self.entries[key] = (path, entry.expiry_dt, size)
+        self.total_bytes += size
+
+        # evict least recently used entries
+        evicted = []
+        while len(self.entries) > 0 and self.max_bytes is not None and self.total_bytes > self.max_bytes:
+            evicted_key = next(iter(self.entries))
+            evicted.append((evicted_key, self.pop(evicted_key)))
+        return evicted
+
+    def pop(self, key: tuple) -> CacheEntry:
+        if key not in self.entries:
+            return None
+        path, expiry_dt, size = self.entries.pop(key)
+        self.total_bytes -= size
+        if os.path.exists(path): os.remove(path)
+        return CacheEntry(None, expiry_dt, size)
+
+    def items(self) -> Iterator[tuple]:
+        return ((key, CacheEntry(None, expiry_dt, size)) for key, (_, expiry_dt, size) in list(self.entries.items()))
@@ -0,0 +1,64 @@
+from collections import OrderedDict
+import pickle
+from typing import Iterator
+
+from src.cache.base import BaseCacheTier, CacheEntry
+
+
+class MemoryCacheTier(BaseCacheTier):
+    """
+        In-memory LRU tier bounded by entry count and approximate total
+        bytes, taking entry sizes as their pickled lengths. Entries are
+        only pickled for sizing when a byte bound is set and no lower
+        tier has sized them already. An entry larger than the byte bound
+        is passed straight through as evicted.
+    """
+
+    def __init__(self, max_entries: int=None, max_bytes: int=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        # define lru table
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: tuple) -> CacheEntry:
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+        return entry
+
+    def set(self, key: tuple, entry: CacheEntry) -> list:
+        self.pop(key)
+        if self.max_bytes is not None:
+            if entry.size is None:
+                entry.size = len(pickle.dumps(entry.value, protocol=pickle.HIGHEST_PROTOCOL))
+            if entry.size > self.max_bytes:
+                return [(key, entry)]
+        self.entries[key] = entry
+        self.total_bytes += entry.size or 0
+
+        # evict least recently used entries
+        evicted = []
+        while len(self.entries) > 0 and self._over_bounds():
+            evicted_key, evicted_entry = self.entries.popitem(last=False)
+            self.total_bytes -= evicted_entry.size or 0
+            evicted.append((evicted_key, evicted_entry))
+        return evicted
+
+    def pop(self, key: tuple) -> CacheEntry:
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.total_bytes -= entry.size or 0
+        return entry
+
+    def items(self) -> Iterator[tuple]:
+        return iter(list(self.entries.items()))
+
+    def _over_bounds(self) -> bool:
+        if self.max_entries is not None and len(self.entries) > self.max_entries: return True
+        elif self.max_bytes is not None and self.total_bytes > self.max_bytes: return True
+        else: return False
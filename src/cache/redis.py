@@ -0,0 +1,216 @@
+from datetime import datetime, timezone, timedelta
+from typing import Iterator
+import logging
+import pickle
+import time
+import json
+import redis
+
+from src.cache.base import BaseCacheTier, CacheEntry
+
+
+# largest value redis accepts (proto-max-bulk-len)
+REDIS_MAX_VALUE_BYTES = 512 * 1024 * 1024
+
+# set an entry, account its size and touch it, then evict least recently
+# used entries (across namespaces) while the cache is over its bound
+_SET_SCRIPT = """
+local size = string.len(ARGV[1])
+local old_size = tonumber(redis.call('HGET', KEYS[3], KEYS[1])) or 0
+if tonumber(ARGV[2]) > 0 then
+    redis.call('SET', KEYS[1], ARGV[1], 'PX', ARGV[2])
+else
+    redis.call('SET', KEYS[1], ARGV[1])
+end
+redis.call('HSET', KEYS[3], KEYS[1], size)
+redis.call('ZADD', KEYS[2], ARGV[3], KEYS[1])
+local total = redis.call('INCRBY', KEYS[4], size - old_size)
+local max_bytes = tonumber(ARGV[4])
+local evicted = 0
+while max_bytes > 0 and total > max_bytes do
+    local oldest = redis.call('ZRANGE', KEYS[2], 0, 0)
+    if #oldest == 0 or oldest[1] == KEYS[1] then break end
+    local oldest_size = tonumber(redis.call('HGET', KEYS[3], oldest[1])) or 0
+    redis.call('DEL', oldest[1])
+    redis.call('HDEL', KEYS[3], oldest[1])
+    redis.call('ZREM', KEYS[2], oldest[1])
+    total = redis.call('DECRBY', KEYS[4], oldest_size)
+    evicted = evicted + 1
+end
+return evicted
+"""
+
+# delete an entry and its accounting, returning {deleted, size, ttl}
+_DELETE_SCRIPT = """
+local size = tonumber(redis.call('HGET', KEYS[3], KEYS[1])) or 0
+local ttl = redis.call('PTTL', KEYS[1])
+local deleted = redis.call('DEL', KEYS[1])
+redis.call('HDEL', KEYS[3], KEYS[1])
+redis.call('ZREM', KEYS[2], KEYS[1])
+redis.call('DECRBY', KEYS[4], size)
+return {deleted, size, ttl}
+"""
+
+
+class RedisCacheTier(BaseCacheTier):
+    """
+        Shared tier storing one Redis key per entry, so every process
+        (and node) using the same Redis server sees the same entries.
+        It should use its own Redis instance, apart from the served
+        datasets. Entry expiries map to Redis key expiries, and entry
+        sizes are accounted across namespaces so that writes past
+        max_bytes evict the least recently used entries; values larger
+        than the bound (or than Redis accepts) are not written. Entries are
+        shared, so they are never cleared on start. Redis errors are
+        logged and treated as misses, so an unavailable server only
+        costs upstream requests.
+    """
+
+    write_through = True
+
+    def __init__(self, credentials_file_path: str, namespace: str,
+                 key_prefix: str='api-cache',
+                 db: int=0,
+                 max_bytes: int=None,
+                 logger: logging.Logger=None):
+
+        self.namespace = namespace
+        self.key_prefix = '{}:{}:'.format(key_prefix, namespace).encode('utf-8')
+        self.max_bytes = max_bytes
+        self.logger = logger if logger is not None else logging.getLogger(self.__class__.__name__)
+
+        # shared accounting keys
+        self.lru_key = '{}:__lru__'.format(key_prefix)
+        self.sizes_key = '{}:__sizes__'.format(key_prefix)
+        self.total_key = '{}:__total__'.format(key_prefix)
+
+        # connect to redis
+        f = open(credentials_file_path, 'r')
+        credentials = json.load(f)
+        f.close()
+        self.redis = redis.Redis(
+            host=credentials['host'],
+            port=credentials['port'],
+            db=db,
+            socket_keepalive=True
+        )
+        self.redis.ping()
+        self.set_script = self.redis.register_script(_SET_SCRIPT)
+        self.delete_script = self.redis.register_script(_DELETE_SCRIPT)
+
+    def __len__(self) -> int:
+        try:
+            return sum(1 for _ in self._scan_keys())
+        except redis.exceptions.RedisError as e:
+            self.logger.warning('Redis cache unavailable in __len__: {}.'.format(e))
+            return 0
+
+    def get(self, key: tuple) -> CacheEntry:
+        redis_key = self._encode_key(key)
+        try:
+            pipeline = self.redis.pipeline(transaction=True)
+            pipeline.get(redis_key)
+            pipeline.pttl(redis_key)
+            pipeline.zadd(self.lru_key, {redis_key: self._now_ms()}, xx=True)
+            value_blob, ttl, _ = pipeline.execute()
+        except redis.exceptions.RedisError as e:
+            self.logger.warning('Redis cache unavailable in get: {}.'.format(e))
+            return None
+
+        if value_blob is None:
+            return None
+        return CacheEntry(pickle.loads(value_blob), self._to_dt(ttl), len(value_blob))
+
+    def set(self, key: tuple, entry: CacheEntry) -> list:
+        redis_key = self._encode_key(key)
+
+        # map expiry to a key ttl
+        if entry.expiry_dt is not None:
+            ttl = int((entry.expiry_dt - datetime.now(tz=timezone.utc)).total_seconds() * 1000)
+            if ttl <= 0:
+                self.pop(key)
+                return []
+        else:
+            ttl = 0
+
+        try:
+            value_blob = pickle.dumps(entry.value, protocol=pickle.HIGHEST_PROTOCOL)
+            entry.size = len(value_blob)
+            if entry.size > min(REDIS_MAX_VALUE_BYTES, self.max_bytes or REDIS_MAX_VALUE_BYTES):
+                self.logger.warning('Skipping {} byte value too large for the redis cache.'.format(entry.size))
+                self.pop(key)
+                return [(key, entry)]
+            evicted = self.set_script(keys=[redis_key, self.lru_key, self.sizes_key, self.total_key],
+                                      args=[value_blob, ttl, self._now_ms(), self.max_bytes or 0])
+            if evicted > 0: self.logger.info('Evicted {} redis cache entries over the byte bound.'.format(evicted))
+        except redis.exceptions.RedisError as e:
+            self.logger.warning('Redis cache unavailable in set: {}.'.format(e))
+        return []
+
+    def pop(self, key: tuple) -> CacheEntry:
+        redis_key = self._encode_key(key)
+        try:
+            deleted, size, ttl = self.delete_script(keys=[redis_key, self.lru_key, self.sizes_key, self.total_key])
+        except redis.exceptions.RedisError as e:
+            self.logger.warning('Redis cache unavailable in pop: {}.'.format(e))
+            return None
+
+        if deleted == 0:
+            return None
+        return CacheEntry(None, self._to_dt(ttl), size)
+
+    def items(self) -> Iterator[tuple]:
+        try:
+            redis_keys = list(self._scan_keys())
+            pipeline = self.redis.pipeline(transaction=False)
+            for redis_key in redis_keys:
+                pipeline.strlen(redis_key)
+                pipeline.pttl(redis_key)
+            results = pipeline.execute()
+        except redis.exceptions.RedisError as e:
+            self.logger.warning('Redis cache unavailable in items: {}.'.format(e))
+            return iter([])
+
+        # skip keys expired since the scan
+        items = []
+        for i, redis_key in enumerate(redis_keys):
+            size, ttl = results[2 * i], results[2 * i + 1]
+            if ttl == -2: continue
+            items.append((self._decode_key(redis_key), CacheEntry(None, self._to_dt(ttl), size)))
+        return iter(items)
+
+    def sweep(self, current_dt: datetime) -> int:
+
+        # redis expires keys itself; drop accounting for expired keys
+        try:
+            redis_keys = self.redis.zrange(self.lru_key, 0, -1)
+            pipeline = self.redis.pipeline(transaction=False)
+            for redis_key in redis_keys:
+                pipeline.exists(redis_key)
+            expired_keys = [k for k, exists in zip(redis_keys, pipeline.execute()) if not exists]
+            for redis_key in expired_keys:
+                self.delete_script(keys=[redis_key, self.lru_key, self.sizes_key, self.total_key])
+        except redis.exceptions.RedisError as e:
+            self.logger.warning('Redis cache unavailable in sweep: {}.'.format(e))
+        return 0
+
+    def close(self) -> None:
+        self.redis.close()
+
+    def _encode_key(self, key: tuple) -> bytes:
+        return self.key_prefix + pickle.dumps(key, protocol=4)
+
+    def _decode_key(self, redis_key: bytes) -> tuple:
+        return pickle.loads(redis_key[len(self.key_prefix):])
+
+    def _scan_keys(self) -> Iterator[bytes]:
+        return self.redis.scan_iter(match=self.key_prefix + b'*', count=1000)
+
+    @staticmethod
+    def _now_ms() -> int:
+        return int(time.time() * 1000)
+
+    @staticmethod
+    def _to_dt(ttl: int) -> datetime:
+        if ttl is None or ttl < 0: return None
+        return datetime.now(tz=timezone.utc) + timedelta(milliseconds=ttl)
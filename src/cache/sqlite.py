@@ -0,0 +1,130 @@
+from datetime import datetime, timezone
+from typing import Iterator
+from pathlib import Path
+from time import time
+import threading
+import sqlite3
+import pickle
+
+from src.cache.base import BaseCacheTier, CacheEntry
+
+
+class SqliteCacheTier(BaseCacheTier):
+    """
+        Persistent tier storing one sqlite row per entry. Entries are
+        written through on add, each in its own transaction, and read
+        lazily by key, so opening the cache does not depend on its size
+        and a crash loses at most the entry being written. Least
+        recently read entries are evicted past the byte bound.
+    """
+
+    write_through = True
+
+    def __init__(self, path: str, max_bytes: int=None,
+                 load: bool=True):
+
+        self.path = path
+        self.max_bytes = max_bytes
+        self.total_bytes = None
+        self.lock = threading.Lock()
+
+        # open database
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS entries ('
+            'key BLOB PRIMARY KEY, expiry REAL, size INTEGER, accessed REAL, value BLOB)'
+        )
+        self.conn.execute('CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)')
+        if not load:
+            self.conn.execute('DELETE FROM entries')
+
+    def __len__(self) -> int:
+        with self.lock:
+            return self.conn.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+
+    def get(self, key: tuple) -> CacheEntry:
+        key_blob = pickle.dumps(key)
+        with self.lock:
+            row = self.conn.execute('SELECT expiry, size, value FROM entries WHERE key = ?', (key_blob,)).fetchone()
+            if row is None:
+                return None
+            self.conn.execute('UPDATE entries SET accessed = ? WHERE key = ?', (time(), key_blob))
+
+        expiry, size, value_blob = row
+        return CacheEntry(pickle.loads(value_blob), self._to_dt(expiry), size)
+
+    def set(self, key: tuple, entry: CacheEntry) -> list:
+        key_blob = pickle.dumps(key)
+        value_blob = pickle.dumps(entry.value, protocol=pickle.HIGHEST_PROTOCOL)
+        entry.size = len(value_blob)
+        expiry = entry.expiry_dt.timestamp() if entry.expiry_dt is not None else None
+        if self.max_bytes is not None and len(value_blob) > self.max_bytes:
+            self.pop(key)
+            return [(key, entry)]
+
+        with self.lock:
+
+            # replace entry atomically
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                old_row = self.conn.execute('SELECT size FROM entries WHERE key = ?', (key_blob,)).fetchone()
+                self.conn.execute(
+                    'INSERT OR REPLACE INTO entries (key, expiry, size, accessed, value) VALUES (?, ?, ?, ?, ?)',
+                    (key_blob, expiry, len(value_blob), time(), value_blob)
+                )
+                self.conn.execute('COMMIT')
+            except Exception:
+                self.conn.execute('ROLLBACK')
+                raise
+
+            if self.total_bytes is not None:
+                self.total_bytes += len(value_blob) - (old_row[0] if old_row is not None else 0)
+            return self._evict()
+
+    def pop(self, key: tuple) -> CacheEntry:
+        key_blob = pickle.dumps(key)
+        with self.lock:
+            row = self.conn.execute('SELECT expiry, size FROM entries WHERE key = ?', (key_blob,)).fetchone()
+            if row is None:
+                return None
+            self.conn.execute('DELETE FROM entries WHERE key = ?', (key_blob,))
+            if self.total_bytes is not None: self.total_bytes -= row[1]
+        return CacheEntry(None, self._to_dt(row[0]), row[1])
+
+    def items(self) -> Iterator[tuple]:
+        with self.lock:
+            rows = self.conn.execute('SELECT key, expiry, size FROM entries').fetchall()
+        return ((pickle.loads(key_blob), CacheEntry(None, self._to_dt(expiry), size)) for key_blob, expiry, size in rows)
+
+    def sweep(self, current_dt: datetime) -> int:
+        with self.lock:
+            deleted = self.conn.execute('DELETE FROM entries WHERE expiry <= ?', (current_dt.timestamp(),)).rowcount
+            if deleted > 0: self.total_bytes = None
+            return deleted
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def _evict(self) -> list:
+        if self.max_bytes is None:
+            return []
+
+        # total bytes are summed lazily on the first bounded write
+        if self.total_bytes is None:
+            self.total_bytes = self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+
+        evicted = []
+        while self.total_bytes > self.max_bytes:
+            row = self.conn.execute('SELECT key, expiry, size FROM entries ORDER BY accessed LIMIT 1').fetchone()
+            if row is None: break
+            self.conn.execute('DELETE FROM entries WHERE key = ?', (row[0],))
+            self.total_bytes -= row[2]
+            evicted.append((pickle.loads(row[0]), CacheEntry(None, self._to_dt(row[1]), row[2])))
+        return evicted
+
+    @staticmethod
+    def _to_dt(expiry: float) -> datetime:
+        return datetime.fromtimestamp(expiry, tz=timezone.utc) if expiry is not None else None
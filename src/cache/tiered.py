@@ -0,0 +1,161 @@
+from datetime import datetime, timezone, timedelta
+from typing import Any
+import threading
+import logging
+import json
+import redis
+
+from src.cache.base import CacheEntry
+from src.cache.memory import MemoryCacheTier
+from src.cache.disk import DiskCacheTier
+from src.cache.sqlite import SqliteCacheTier
+from src.cache.redis import RedisCacheTier
+
+
+class TieredCache(object):
+    """
+        Cache over an ordered list of tiers, fastest first. New entries
+        enter the first tier, evictions spill down to the next tier and
+        out of the last one, and hits in lower tiers are promoted back
+        to the first. Write-through tiers also receive every new entry
+        and keep the entries promoted from them. Expired entries are
+        dropped on read and swept from every tier at most once per sweep
+        interval. Operations are serialized, so background refreshes can
+        share the cache.
+    """
+
+    def __init__(self, tiers: list, sweep_interval: timedelta=None):
+        self.tiers = tiers
+        self.sweep_interval = sweep_interval
+        self.last_sweep_dt = datetime.now(tz=timezone.utc)
+        self.lock = threading.RLock()
+
+    @staticmethod
+    def load_config(config_file_path: str, name: str) -> dict:
+        """
+            Returns the "default" settings of a cache config file,
+            overridden by any settings under the given name.
+        """
+
+        f = open(config_file_path, 'r')
+        cache_config = json.load(f)
+        f.close()
+        config = dict(cache_config.get('default', {}))
+        config.update(cache_config.get(name, {}))
+        return config
+
+    @staticmethod
+    def from_config(config_file_path: str, name: str, load: bool=True,
+                    logger: logging.Logger=None) -> 'TieredCache':
+        """
+            Builds a cache from the settings of a cache config file. An
+            unreachable Redis server falls back to the sqlite tier. Load
+            only applies to the local disk and sqlite tiers, since Redis
+            entries are shared with other processes.
+        """
+
+        config = TieredCache.load_config(config_file_path, name)
+
+        # build tiers
+        tiers = [MemoryCacheTier(config.get('memory-max-entries'), config.get('memory-max-bytes'))]
+        if config.get('disk-enabled', False):
+            directory = config.get('disk-directory', 'cache/disk') + '/' + name
+            tiers.append(DiskCacheTier(directory, config.get('disk-max-bytes'), load=load))
+        sqlite_enabled = config.get('sqlite-enabled', False)
+        if config.get('redis-enabled', False):
+            try:
+                tiers.append(RedisCacheTier(config.get('redis-credentials-file', 'config/redis-cache.json'), name,
+                                            key_prefix=config.get('redis-key-prefix', 'api-cache'),
+                                            db=config.get('redis-db', 0),
+                                            max_bytes=config.get('redis-max-bytes'),
+                                            logger=logger))
+            except redis.exceptions.RedisError as e:
+                if logger is not None: logger.warning('Redis cache unavailable, using sqlite cache: {}.'.format(e))
+                sqlite_enabled = True
+        if sqlite_enabled:
+            path = config.get('sqlite-directory', 'cache/sqlite') + '/' + name + '.sqlite'
+            tiers.append(SqliteCacheTier(path, config.get('sqlite-max-bytes'), load=load))
+
+        sweep_interval_secs = config.get('sweep-interval-secs')
+        sweep_interval = timedelta(seconds=sweep_interval_secs) if sweep_interval_secs is not None else None
+        return TieredCache(tiers, sweep_interval)
+
+    def __len__(self) -> int:
+        return sum(len(tier) for tier in self.tiers)
+
+    def add(self, key: tuple, value: Any, expiry_dt: datetime=None) -> CacheEntry:
+        """
+            Adds an entry and returns it (or None when it was already
+            expired). Its size is only set when a tier measured it.
+        """
+
+        entry = CacheEntry(value, expiry_dt, None)
+        with self.lock:
+            current_dt = self._maybe_sweep()
+            if entry.is_expired(current_dt):
+                self.pop(key)
+                return None
+
+            # write through persistent tiers (which size entries as they pickle them)
+            for tier in self.tiers[1:]:
+                if tier.write_through: tier.set(key, entry)
+                else: tier.pop(key)
+            self._set(0, key, entry)
+            return entry
+
+    def get(self, key: tuple) -> Any:
+        return self.lookup(key)[0]
+
+    def lookup(self, key: tuple) -> tuple:
+        """
+            Returns the (value, status) of a key, where the status is
+            "hit", "miss" or "expired" (an expired entry was dropped).
+        """
+
+        with self.lock:
+            current_dt = self._maybe_sweep()
+            for tier_idx, tier in enumerate(self.tiers):
+                entry = tier.get(key)
+                if entry is None:
+                    continue
+                elif entry.is_expired(current_dt):
+                    tier.pop(key)
+                    return None, 'expired'
+                else:
+                    if tier_idx > 0:
+                        if not tier.write_through: tier.pop(key)
+                        self._set(0, key, entry)
+                    return entry.value, 'hit'
+            return None, 'miss'
+
+    def pop(self, key: tuple) -> None:
+        with self.lock:
+            for tier in self.tiers:
+                tier.pop(key)
+
+    def sweep(self) -> int:
+        with self.lock:
+            current_dt = datetime.now(tz=timezone.utc)
+            self.last_sweep_dt = current_dt
+            return sum(tier.sweep(current_dt) for tier in self.tiers)
+
+    def is_persistent(self) -> bool:
+        return any(tier.write_through for tier in self.tiers)
+
+    def memory_items(self) -> list:
+        with self.lock:
+            return list(self.tiers[0].items())
+
+    def _set(self, tier_idx: int, key: tuple, entry: CacheEntry) -> None:
+        evicted = self.tiers[tier_idx].set(key, entry)
+
+        # spill evictions (write-through tiers already hold every entry)
+        if tier_idx + 1 < len(self.tiers) and not self.tiers[tier_idx + 1].write_through:
+            for evicted_key, evicted_entry in evicted:
+                self._set(tier_idx + 1, evicted_key, evicted_entry)
+
+    def _maybe_sweep(self) -> datetime:
+        current_dt = datetime.now(tz=timezone.utc)
+        if self.sweep_interval is not None and current_dt - self.last_sweep_dt >= self.sweep_interval:
+            self.sweep()
+        return current_dt
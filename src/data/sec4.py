@@ -4,6 +4,7 @@ from dateutil import parser
 from src.utils.mindex import MultiIndex
 from src.storage.s3 import S3StorageConnector
 from src.api.sec import SECAPIConnector
+from src.api.base import reports_cache
 from src.data.base import BaseDataLoaderModule
 
 
@@ -23,6 +24,7 @@ class SEC4DataLoader(BaseDataLoaderModule):
         self.delay_time_secs = delay_time_secs
         self.fetch_from_override_dt = fetch_from_override_dt
 
+    @reports_cache
     def update(self) -> bool:
         try:
             self.logger.info('Starting update routine.')
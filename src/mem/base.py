@@ -1,8 +1,11 @@
 from typing import Any
 from abc import abstractmethod
+from pathlib import Path
 
 from src.utils.logger import BaseModuleWithLogging
 from src.storage.redis import RedisStorageConnector
+from src.utils.mindex import MultiIndex
+from src.utils.msnapshot import MultiIndexSnapshot
 
 
 class BaseMemLoaderModule(BaseModuleWithLogging):
@@ -15,5 +18,16 @@ class BaseMemLoaderModule(BaseModuleWithLogging):
     def update(self) -> bool:
         raise NotImplemented
 
-    def _save_data(self, data_name: str, data: Any) -> bool:
-        return self.redis_connector.set(data_name, data)
\ No newline at end of file
+    def _save_data(self, data_name: str, data: Any, snapshot: bool=False) -> bool:
+        if snapshot and isinstance(data, MultiIndex):
+            self._save_snapshot(data_name, data)
+        return self.redis_connector.set(data_name, data)
+
+    def _save_snapshot(self, data_name: str, data: MultiIndex) -> bool:
+        try:
+            Path('snapshots').mkdir(parents=True, exist_ok=True)
+            MultiIndexSnapshot.write(data, 'snapshots/' + data_name + '.mvi')
+            return True
+        except Exception as e:
+            self.logger.exception('Error in _save_snapshot: ' + str(e))
+            return False
\ No newline at end of file
@@ -1,4 +1,5 @@
 from src.api.secgov import SECGovAPIConnector
+from src.api.base import reports_cache
 from src.mem.base import BaseMemLoaderModule
 from src.storage.redis import RedisStorageConnector
 
@@ -11,6 +12,7 @@ class CIKLookupMemLoader(BaseMemLoaderModule):
         super().__init__(self.__class__.__name__, redis_connector)
         self.sec_gov_connector = sec_gov_connector
 
+    @reports_cache
     def update(self) -> bool:
         try:
             self.logger.info('Starting update routine.')
@@ -20,7 +22,7 @@ class CIKLookupMemLoader(BaseMemLoaderModule):
 
             # save ticker data
             self.logger.info('Saving new CIK lookup data.')
-            save_result = self._save_data('cik_lookup', multi_index)
+            save_result = self._save_data('cik_lookup', multi_index, snapshot=True)
             if not save_result:
                 self.logger.error('Failed to save CIK lookup data.')
                 return False
@@ -1,4 +1,5 @@
 from src.api.polygon import PolygonAPIConnector
+from src.api.base import reports_cache
 from src.mem.base import BaseMemLoaderModule
 from src.storage.redis import RedisStorageConnector
 
@@ -11,6 +12,7 @@ class TickerFinancialsMemLoader(BaseMemLoaderModule):
         super().__init__(self.__class__.__name__, redis_connector)
         self.polygon_connector = polygon_connector
 
+    @reports_cache
     def update(self) -> bool:
         try:
             self.logger.info('Starting update routine.')
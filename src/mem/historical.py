@@ -1,16 +1,21 @@
 from src.api.polygon import PolygonAPIConnector
+from src.api.base import reports_cache
 from src.mem.base import BaseMemLoaderModule
 from src.storage.redis import RedisStorageConnector
+from src.storage.panel import PricePanel
 
 
 class TickerHistoricalPricesMemLoader(BaseMemLoaderModule):
 
     def __init__(self, redis_connector: RedisStorageConnector,
-                 polygon_connector: PolygonAPIConnector):
+                 polygon_connector: PolygonAPIConnector,
+                 price_panel_directory: str='panels/prices'):
 
         super().__init__(self.__class__.__name__, redis_connector)
         self.polygon_connector = polygon_connector
+        self.price_panel = PricePanel(price_panel_directory)
 
+    @reports_cache
     def update(self) -> bool:
         try:
             self.logger.info('Starting update routine.')
@@ -29,6 +34,11 @@ class TickerHistoricalPricesMemLoader(BaseMemLoaderModule):
                 self.logger.error('Failed to save ticker historical prices data.')
                 return False
 
+            # align prices into the shared panel
+            self.logger.info('Updating price panel.')
+            panel_count = self.price_panel.update_from_historical_quotes(multi_index)
+            self.logger.info('Updated price panel for {} tickers.'.format(panel_count))
+
             self.logger.info('Finishing update routine.')
             return True
 
@@ -1,11 +1,12 @@
 import luhn
 
 from src.utils.functional.identifiers import nn, convert_letters_to_string_numbers
-from src.utils.mindex import MultiIndex, MultiIndexException
+from src.utils.mindex import MultiIndex
 from src.api.polygon import PolygonAPIConnector
 from src.api.raf import RankAndFiledAPIConnector
 from src.api.secgov import SECGovAPIConnector
 from src.api.gleif import GLEIFAPIConnector
+from src.api.base import reports_cache
 from src.mem.base import BaseMemLoaderModule
 from src.storage.redis import RedisStorageConnector
 
@@ -24,6 +25,7 @@ class TickersMemLoader(BaseMemLoaderModule):
         self.sec_gov_connector = sec_gov_connector
         self.gleif_connector = gleif_connector
 
+    @reports_cache
     def update(self) -> bool:
         try:
             self.logger.info('Starting update routine.')
@@ -83,129 +85,152 @@ class TickersMemLoader(BaseMemLoaderModule):
             if gleif_lei_data is None:
                 raise Exception('missing GEIF lei data')
 
-            # build multi-index
+            # join ticker keyed data
             self.logger.info('Building ticker mapping.')
+            ticker_rows = ticker_data.join(exchange_data, 'exchange_mic', 'mic')
+            tickers = [ticker_data_obj['ticker'] for ticker_data_obj, _ in ticker_rows]
+            cusip_data_objs = cusip_data.get_many('ticker', tickers)
+            cik_data_objs = cik_data.get_many('ticker', tickers)
+            raf_ticker_data_objs = raf_ticker_data.get_many('ticker', tickers)
+            ticker_details_data_objs = ticker_details_data.get_many('ticker', tickers)
+            dividend_data_objs = dividend_data.get_many('ticker', tickers)
+
+            # resolve derived identifiers
+            cusips, ciks, isins, sics = [], [], [], []
+            for (ticker_data_obj, _), cusip_data_obj, cik_data_obj, raf_ticker_data_obj, ticker_details_data_obj in zip(
+                ticker_rows, cusip_data_objs, cik_data_objs, raf_ticker_data_objs, ticker_details_data_objs):
+
+                # get cusip
+                if nn(cusip_data_obj): cusip = cusip_data_obj['cusip']
+                else: cusip = None
+
+                # get cik
+                if nn(cik_data_obj): cik = cik_data_obj['cik']
+                elif nn(ticker_details_data_obj) and nn(ticker_details_data_obj['cik']): cik = ticker_details_data_obj['cik']
+                elif nn(raf_ticker_data_obj): cik = raf_ticker_data_obj['cik']
+                else: cik = None
+
+                # get isin
+                if cusip is not None:
+                    country_code = ticker_data_obj['locale'].upper()
+                    isin_checksum_value = convert_letters_to_string_numbers(country_code + cusip)
+                    isin_checksum_digit = str(luhn.generate(isin_checksum_value))
+                    isin = country_code + cusip + isin_checksum_digit
+                else:
+                    isin = None
+
+                # get sic
+                if nn(ticker_details_data_obj) and nn(ticker_details_data_obj['sic']): sic = ticker_details_data_obj['sic']
+                elif nn(raf_ticker_data_obj): sic = raf_ticker_data_obj['sic']
+                else: sic = None
+
+                cusips.append(cusip)
+                ciks.append(cik)
+                isins.append(isin)
+                sics.append(sic)
+
+            # join derived identifier data
+            raf_lei_data_objs = raf_lei_data.get_many('cik', ciks)
+            gleif_lei_data_objs = gleif_lei_data.get_many('isin', isins)
+            industry_data_objs = industry_data.get_many('sic', sics)
+
+            # build ticker mappings
+            records = []
+            for i, (ticker_data_obj, exchange_data_obj) in enumerate(ticker_rows):
+                ticker_details_data_obj = ticker_details_data_objs[i]
+                raf_ticker_data_obj = raf_ticker_data_objs[i]
+                cusip, cik, isin = cusips[i], ciks[i], isins[i]
+
+                # get figi
+                if nn(ticker_data_obj['figi']): figi = ticker_data_obj['figi']
+                elif nn(ticker_details_data_obj) and nn(ticker_details_data_obj['figi']): figi = ticker_details_data_obj['figi']
+                else: figi = None
+
+                # get lei
+                raf_lei_data_obj = raf_lei_data_objs[i]
+                gleif_lei_data_obj = gleif_lei_data_objs[i]
+                if nn(gleif_lei_data_obj): lei = gleif_lei_data_obj['lei']
+                elif nn(ticker_details_data_obj) and nn(ticker_details_data_obj['lei']): lei = ticker_details_data_obj['lei']
+                elif nn(raf_lei_data_obj): lei = raf_lei_data_obj['lei']
+                else: lei = None
+
+                # get bloomberg global id
+                if nn(ticker_details_data_obj) and nn(ticker_details_data_obj['bloomberg']): bloomberg_gid = ticker_details_data_obj['bloomberg']
+                else: bloomberg_gid = None
+
+                # get IRS number
+                if nn(raf_ticker_data_obj): irs_number = raf_ticker_data_obj['irs_number']
+                else: irs_number = None
+
+                # build index
+                ticker_mapping = {}
+                ticker_mapping['ticker'] = ticker_data_obj['ticker']
+                ticker_mapping['name'] = ticker_data_obj['name']
+                if nn(cusip): ticker_mapping['cusip'] = cusip
+                if nn(cik): ticker_mapping['cik'] = cik
+                if nn(figi): ticker_mapping['figi'] = figi
+                if nn(isin): ticker_mapping['isin'] = isin
+                if nn(lei): ticker_mapping['lei'] = lei
+                if nn(bloomberg_gid): ticker_mapping['bloomberg_gid'] = bloomberg_gid
+                if nn(irs_number): ticker_mapping['irs_number'] = irs_number
+
+                # insert ticker data
+                ticker_mapping['locale'] = ticker_data_obj['locale']
+                ticker_mapping['asset_class'] = ticker_data_obj['asset_class']
+                ticker_mapping['currency_code'] = ticker_data_obj['currency_code']
+                ticker_mapping['last_updated'] = ticker_data_obj['last_updated']
+
+                # insert ticker details data
+                if nn(ticker_details_data_obj):
+                    ticker_mapping['details'] = {}
+                    ticker_mapping['details']['sector'] = ticker_details_data_obj['sector']
+                    ticker_mapping['details']['list_date'] = ticker_details_data_obj['list_date']
+                    ticker_mapping['details']['ceo'] = ticker_details_data_obj['ceo']
+                    ticker_mapping['details']['phone'] = ticker_details_data_obj['phone']
+                    ticker_mapping['details']['employees'] = ticker_details_data_obj['employees']
+                    ticker_mapping['details']['url'] = ticker_details_data_obj['url']
+                    ticker_mapping['details']['description'] = ticker_details_data_obj['description']
+                    ticker_mapping['details']['address'] = ticker_details_data_obj['hq_address']
+                    ticker_mapping['details']['state'] = ticker_details_data_obj['hq_state']
+                    ticker_mapping['details']['country'] = ticker_details_data_obj['hq_country']
+                else:
+                    ticker_mapping['details'] = None
+
+                # insert exchange data
+                if nn(exchange_data_obj): ticker_mapping['exchange'] = exchange_data_obj
+                else: ticker_mapping['exchange'] = None
+
+                # insert industry data
+                industry_data_obj = industry_data_objs[i]
+                if nn(industry_data_obj): ticker_mapping['industry'] = industry_data_obj
+                else: ticker_mapping['industry'] = None
+
+                # insert dividend data
+                dividend_data_obj = dividend_data_objs[i]
+                if nn(dividend_data_obj):
+                    ticker_mapping['dividend'] = {
+                        'dividend_type': dividend_data_obj['dividend_type'],
+                        'rolling_annual_dividend': dividend_data_obj['rolling_annual_dividend'],
+                        'annual_dividend': dividend_data_obj['annual_dividend'],
+                        'dividend_yield': dividend_data_obj['dividend_yield'],
+                        'last_dividend': dividend_data_obj['last_dividend']
+                    }
+                else:
+                    ticker_mapping['dividend'] = None
+
+                records.append(ticker_mapping)
+
+            # build multi-index
             indices = ['ticker', 'name', 'cusip', 'cik', 'figi', 'isin', 'lei', 'bloomberg_gid', 'irs_number']
-            multi_index = MultiIndex(indices, default_index_key='ticker', safe_mode=True)
-            for ticker_data_obj in ticker_data:
-                try:
-                    ticker = ticker_data_obj['ticker']
-                    name = ticker_data_obj['name']
-
-                    # get cusip
-                    cusip_data_obj = cusip_data.get('ticker', ticker)
-                    if nn(cusip_data_obj): cusip = cusip_data_obj['cusip']
-                    else: cusip = None
-
-                    # get cik
-                    cik_data_obj = cik_data.get('ticker', ticker)
-                    raf_ticker_data_obj = raf_ticker_data.get('ticker', ticker)
-                    ticker_details_data_obj = ticker_details_data.get('ticker', ticker)
-                    if nn(cik_data_obj): cik = cik_data_obj['cik']
-                    elif nn(ticker_details_data_obj) and nn(ticker_details_data_obj['cik']): cik = ticker_details_data_obj['cik']
-                    elif nn(raf_ticker_data_obj): cik = raf_ticker_data_obj['cik']
-                    else: cik = None
-
-                    # get figi
-                    if nn(ticker_data_obj['figi']): figi = ticker_data_obj['figi']
-                    elif nn(ticker_details_data_obj) and nn(ticker_details_data_obj['figi']): figi = ticker_details_data_obj['figi']
-                    else: figi = None
-
-                    # get isin
-                    if cusip is not None:
-                        country_code = ticker_data_obj['locale'].upper()
-                        isin_checksum_value = convert_letters_to_string_numbers(country_code + cusip)
-                        isin_checksum_digit = str(luhn.generate(isin_checksum_value))
-                        isin = country_code + cusip + isin_checksum_digit
-                    else:
-                        isin = None
-
-                    # get lei
-                    raf_lei_data_obj = raf_lei_data.get('cik', cik)
-                    gleif_lei_data_obj = gleif_lei_data.get('isin', isin)
-                    if nn(gleif_lei_data_obj): lei = gleif_lei_data_obj['lei']
-                    elif nn(ticker_details_data_obj) and nn(ticker_details_data_obj['lei']): lei = ticker_details_data_obj['lei']
-                    elif nn(raf_lei_data_obj): lei = raf_lei_data_obj['lei']
-                    else: lei = None
-
-                    # get bloomberg global id
-                    if nn(ticker_details_data_obj) and nn(ticker_details_data_obj['bloomberg']): bloomberg_gid = ticker_details_data_obj['bloomberg']
-                    else: bloomberg_gid = None
-
-                    # get IRS number
-                    if nn(raf_ticker_data_obj): irs_number = raf_ticker_data_obj['irs_number']
-                    else: irs_number = None
-
-                    # build index
-                    ticker_mapping = {}
-                    ticker_mapping['ticker'] = ticker
-                    ticker_mapping['name'] = name
-                    if nn(cusip): ticker_mapping['cusip'] = cusip
-                    if nn(cik): ticker_mapping['cik'] = cik
-                    if nn(figi): ticker_mapping['figi'] = figi
-                    if nn(isin): ticker_mapping['isin'] = isin
-                    if nn(lei): ticker_mapping['lei'] = lei
-                    if nn(bloomberg_gid): ticker_mapping['bloomberg_gid'] = bloomberg_gid
-                    if nn(irs_number): ticker_mapping['irs_number'] = irs_number
-
-                    # insert ticker data
-                    ticker_mapping['locale'] = ticker_data_obj['locale']
-                    ticker_mapping['asset_class'] = ticker_data_obj['asset_class']
-                    ticker_mapping['currency_code'] = ticker_data_obj['currency_code']
-                    ticker_mapping['last_updated'] = ticker_data_obj['last_updated']
-
-                    # insert ticker details data
-                    if nn(ticker_details_data_obj):
-                        ticker_mapping['details'] = {}
-                        ticker_mapping['details']['sector'] = ticker_details_data_obj['sector']
-                        ticker_mapping['details']['list_date'] = ticker_details_data_obj['list_date']
-                        ticker_mapping['details']['ceo'] = ticker_details_data_obj['ceo']
-                        ticker_mapping['details']['phone'] = ticker_details_data_obj['phone']
-                        ticker_mapping['details']['employees'] = ticker_details_data_obj['employees']
-                        ticker_mapping['details']['url'] = ticker_details_data_obj['url']
-                        ticker_mapping['details']['description'] = ticker_details_data_obj['description']
-                        ticker_mapping['details']['address'] = ticker_details_data_obj['hq_address']
-                        ticker_mapping['details']['state'] = ticker_details_data_obj['hq_state']
-                        ticker_mapping['details']['country'] = ticker_details_data_obj['hq_country']
-                    else:
-                        ticker_mapping['details'] = None
-                    
-                    # get exchange data
-                    mic = ticker_data_obj['exchange_mic']
-                    exchange_data_obj = exchange_data.get('mic', mic)
-                    if nn(exchange_data_obj): ticker_mapping['exchange'] = exchange_data_obj
-                    else: ticker_mapping['exchange'] = None
-
-                    # get industry data
-                    if nn(ticker_details_data_obj) and nn(ticker_details_data_obj['sic']): sic = ticker_details_data_obj['sic']
-                    elif nn(raf_ticker_data_obj): sic = raf_ticker_data_obj['sic']
-                    else: sic = None
-                    industry_data_obj = industry_data.get('sic', sic)
-                    if nn(industry_data_obj): ticker_mapping['industry'] = industry_data_obj
-                    else: ticker_mapping['industry'] = None
-
-                    # get dividend data
-                    dividend_data_obj = dividend_data.get('ticker', ticker)
-                    if nn(dividend_data_obj): 
-                        ticker_mapping['dividend'] = {
-                            'dividend_type': dividend_data_obj['dividend_type'],
-                            'rolling_annual_dividend': dividend_data_obj['rolling_annual_dividend'],
-                            'annual_dividend': dividend_data_obj['annual_dividend'],
-                            'dividend_yield': dividend_data_obj['dividend_yield'],
-                            'last_dividend': dividend_data_obj['last_dividend']
-                        }
-                    else: 
-                        ticker_mapping['dividend'] = None
-
-                    # insert mapping
-                    multi_index.insert(ticker_mapping)
-                    
-                except MultiIndexException:
-                    continue
+            multi_index, skipped = MultiIndex.from_records(records, indices, default_index_key='ticker', safe_mode=True,
+                                                           secondary_index_keys=['locale', 'exchange.mic', 'industry.sic'],
+                                                           sorted_index_keys=['dividend.dividend_yield'],
+                                                           on_conflict='first', return_skipped=True)
+            self.logger.info('Skipped {} conflicting ticker mappings.'.format(len(skipped)))
 
             # save ticker data
             self.logger.info('Saving new tickers data.')
-            save_result = self._save_data('tickers', multi_index)
+            save_result = self._save_data('tickers', multi_index, snapshot=True)
             if not save_result:
                 self.logger.error('Failed to save tickers data.')
                 return False
@@ -0,0 +1,208 @@
+from urllib.parse import quote, unquote
+from datetime import date
+from pathlib import Path
+import pandas as pd
+import numpy as np
+import threading
+import json
+import os
+
+from src.utils.functional.prices import merge_bars
+from src.utils.logger import BaseModuleWithLogging
+
+
+# bar columns in (name, dtype) order; dates are days since the epoch
+BAR_COLUMNS = [
+    ('date', '<i8'),
+    ('open', '<f8'),
+    ('high', '<f8'),
+    ('low', '<f8'),
+    ('close', '<f8'),
+    ('vwap', '<f8'),
+    ('volume', '<f8'),
+    ('transactions', '<i8')
+]
+BAR_STORE_VERSION = 1
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def to_epoch_days(d: date) -> int:
+    return d.toordinal() - _EPOCH_ORDINAL
+
+
+def from_epoch_days(days: int) -> date:
+    return date.fromordinal(int(days) + _EPOCH_ORDINAL)
+
+
+class BarStore(BaseModuleWithLogging):
+    """
+        Columnar on-disk store of daily bars. Each ticker has one raw
+        little-endian .bin file per column, sorted by date, which can be
+        memory-mapped for reads. Refreshes write only new rows, over any
+        overlapping tail. The date column's length is the committed row
+        count: an overlapping tail is cut from it before the data columns
+        are rewritten, and dates are written last, so a torn append leaves
+        the committed rows aligned and is overwritten by the next one.
+    """
+
+    def __init__(self, directory: str):
+        super().__init__(self.__class__.__name__)
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.ticker_locks = {}
+
+        # check store metadata
+        Path(directory).mkdir(parents=True, exist_ok=True)
+        meta_path = os.path.join(directory, 'meta.json')
+        meta = {'version': BAR_STORE_VERSION, 'columns': BAR_COLUMNS}
+        if os.path.exists(meta_path):
+            f = open(meta_path, 'r')
+            stored_meta = json.load(f)
+            f.close()
+            if stored_meta['version'] != BAR_STORE_VERSION or [tuple(c) for c in stored_meta['columns']] != BAR_COLUMNS:
+                raise Exception('incompatible bar store: {}'.format(directory))
+        else:
+            f = open(meta_path, 'w')
+            json.dump(meta, f, indent=4)
+            f.close()
+
+    @staticmethod
+    def frame_to_bars(df: pd.DataFrame) -> dict:
+        """
+            Converts a historical quotes DataFrame (indexed by date) into
+            bar arrays.
+        """
+
+        bars = {'date': np.array([to_epoch_days(d) for d in df.index], dtype='int64')}
+        for name, dtype in BAR_COLUMNS[1:]:
+            bars[name] = df[name].to_numpy(dtype=dtype)
+        return bars
+
+    def get_tickers(self) -> list:
+        return sorted(unquote(p.name) for p in Path(self.directory).iterdir() if p.is_dir())
+
+    def get_row_count(self, ticker: str) -> int:
+        date_path = self._column_path(ticker, 'date')
+        if not os.path.exists(date_path): return 0
+        else: return os.path.getsize(date_path) // 8
+
+    def get_last_date(self, ticker: str) -> date:
+        dates = self.read(ticker, ['date'])['date']
+        if len(dates) == 0: return None
+        else: return from_epoch_days(dates[-1])
+
+    def read(self, ticker: str, columns: list=None) -> dict:
+        """
+            Returns read-only arrays (memory-mapped, or empty when the
+            ticker has no bars) for the given columns, all columns by
+            default.
+        """
+
+        row_count = self.get_row_count(ticker)
+        arrays = {}
+        for name, dtype in BAR_COLUMNS:
+            if columns is not None and name not in columns: continue
+            elif row_count == 0: arrays[name] = np.empty(0, dtype=dtype)
+            else: arrays[name] = np.memmap(self._column_path(ticker, name), dtype=dtype, mode='r', shape=(row_count,))
+        return arrays
+
+    def read_frame(self, ticker: str) -> pd.DataFrame:
+        """
+            Returns the bars of a ticker as a DataFrame indexed by date,
+            in the historical quotes layout.
+        """
+
+        arrays = self.read(ticker)
+        dates = arrays['date'].astype('datetime64[D]').astype(object)
+        df = pd.DataFrame({name: np.array(arrays[name]) for name in ['volume', 'vwap', 'open', 'close', 'high', 'low', 'transactions']},
+                          index=pd.Index(dates, name='date'))
+        return df
+
+    def append(self, ticker: str, bars: dict) -> int:
+        """
+            Appends bars (arrays keyed by column, dates as days since the
+            epoch) sorted by date. Stored bars from the first new date on
+            are merged with the new ones, which win on shared dates.
+            Returns the number of rows written.
+        """
+
+        new_dates = np.asarray(bars['date'], dtype='int64')
+        if len(new_dates) == 0:
+            return 0
+        elif len(new_dates) > 1 and np.any(new_dates[1:] <= new_dates[:-1]):
+            raise Exception('bars must be sorted by unique date')
+
+        with self._get_ticker_lock(ticker):
+            Path(self._ticker_directory(ticker)).mkdir(parents=True, exist_ok=True)
+
+            # find the first stored row to rewrite
+            row_count = self.get_row_count(ticker)
+            keep_count = row_count
+            if row_count > 0:
+                stored_dates = self.read(ticker, ['date'])['date']
+                keep_count = int(np.searchsorted(stored_dates, new_dates[0], side='left'))
+                del stored_dates
+
+            # merge the stored tail into the new bars
+            bars = {name: np.asarray(bars[name]).astype(dtype) for name, dtype in BAR_COLUMNS}
+            if any(len(values) != len(new_dates) for values in bars.values()):
+                raise Exception('bar column length mismatch')
+            if keep_count < row_count:
+                stored_bars = self.read(ticker)
+                tail_bars = {name: np.array(values[keep_count:]) for name, values in stored_bars.items()}
+                del stored_bars
+                bars = merge_bars(tail_bars, bars)
+
+            # uncommit the stored tail, write data columns over it, then dates last
+            if keep_count < row_count:
+                self._truncate(ticker, 'date', keep_count)
+            for name, _ in BAR_COLUMNS[1:] + BAR_COLUMNS[:1]:
+                self._write_rows(ticker, name, keep_count, bars[name])
+            return len(bars['date'])
+
+    def write(self, ticker: str, bars: dict) -> int:
+        """
+            Replaces all bars of a ticker.
+        """
+
+        with self._get_ticker_lock(ticker):
+            if self.get_row_count(ticker) > 0: self._truncate(ticker, 'date', 0)
+            return self.append(ticker, bars)
+
+    def delete(self, ticker: str) -> bool:
+        with self._get_ticker_lock(ticker):
+            ticker_directory = Path(self._ticker_directory(ticker))
+            if not ticker_directory.exists(): return False
+            for name, _ in BAR_COLUMNS:
+                path = Path(self._column_path(ticker, name))
+                if path.exists(): path.unlink()
+            ticker_directory.rmdir()
+            return True
+
+    def _write_rows(self, ticker: str, name: str, offset: int, values: np.ndarray) -> None:
+        path = self._column_path(ticker, name)
+        f = open(path, 'r+b' if os.path.exists(path) else 'w+b')
+        f.seek(offset * values.itemsize)
+        f.write(values.tobytes())
+        f.truncate()
+        f.close()
+
+    def _truncate(self, ticker: str, name: str, row_count: int) -> None:
+        path = self._column_path(ticker, name)
+        size = row_count * np.dtype(dict(BAR_COLUMNS)[name]).itemsize
+        if not os.path.exists(path):
+            open(path, 'wb').close()
+        elif os.path.getsize(path) != size:
+            os.truncate(path, size)
+
+    def _get_ticker_lock(self, ticker: str) -> threading.RLock:
+        with self.lock:
+            if ticker not in self.ticker_locks: self.ticker_locks[ticker] = threading.RLock()
+            return self.ticker_locks[ticker]
+
+    def _ticker_directory(self, ticker: str) -> str:
+        return os.path.join(self.directory, quote(ticker, safe=''))
+
+    def _column_path(self, ticker: str, name: str) -> str:
+        return os.path.join(self._ticker_directory(ticker), name + '.bin')
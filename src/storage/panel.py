@@ -0,0 +1,244 @@
+from contextlib import contextmanager
+from pathlib import Path
+import pandas as pd
+import numpy as np
+import fcntl
+import json
+import os
+
+from src.utils.mindex import MultiIndex
+from src.storage.bars import to_epoch_days, from_epoch_days
+from src.utils.logger import BaseModuleWithLogging
+
+
+# panel fields, each a float32 (date x ticker) matrix
+PANEL_FIELDS = ['close', 'vwap', 'volume']
+PANEL_DTYPE = '<f4'
+PRICE_PANEL_VERSION = 1
+
+
+class PricePanel(BaseModuleWithLogging):
+    """
+        Dense date x ticker matrices of daily close, vwap and volume
+        (float32, NaN where a ticker has no bar). Rows follow a shared
+        trading-day calendar, every date any ticker has a bar, and each
+        ticker owns a column. Each field is a raw row-major file that
+        readers memory-map, so processes share one page-cached copy.
+        Files keep spare rows and columns, so new days and listings are
+        written in place; anything else rebuilds the matrices into a new
+        file generation. meta.json holds the committed calendar and
+        columns and is replaced last, and a file lock serializes writers
+        across processes.
+    """
+
+    def __init__(self, directory: str,
+                 spare_dates: int=260,
+                 spare_tickers: int=1024):
+
+        super().__init__(self.__class__.__name__)
+        self.directory = directory
+        self.spare_dates = spare_dates
+        self.spare_tickers = spare_tickers
+        self.meta = None
+        self.meta_stat = None
+        self.dates = np.empty(0, dtype='int64')
+        self.columns = {}
+        self.matrices = {}
+
+        Path(directory).mkdir(parents=True, exist_ok=True)
+        self.refresh()
+
+    def refresh(self) -> bool:
+        """
+            Reloads the committed calendar, columns and matrices if a
+            writer changed them. Returns whether anything changed.
+        """
+
+        # check meta file identity
+        meta_path = os.path.join(self.directory, 'meta.json')
+        if not os.path.exists(meta_path):
+            if self.meta is None: self._set_meta(self._empty_meta(), None)
+            return False
+        stat = os.stat(meta_path)
+        meta_stat = (stat.st_ino, stat.st_mtime_ns)
+        if meta_stat == self.meta_stat:
+            return False
+
+        # load meta
+        f = open(meta_path, 'r')
+        meta = json.load(f)
+        f.close()
+        if meta['version'] != PRICE_PANEL_VERSION or meta['fields'] != PANEL_FIELDS or meta['dtype'] != PANEL_DTYPE:
+            raise Exception('incompatible price panel: {}'.format(self.directory))
+        try:
+            self._set_meta(meta, meta_stat)
+        except FileNotFoundError:
+
+            # generation replaced since the meta was read
+            return self.refresh()
+        return True
+
+    def get_dates(self) -> list:
+        return [from_epoch_days(d) for d in self.dates]
+
+    def get_tickers(self) -> list:
+        return list(self.meta['tickers'])
+
+    def get_column(self, ticker: str) -> int:
+        return self.columns.get(ticker)
+
+    def read(self, field: str) -> np.ndarray:
+        """
+            Returns the read-only (dates x tickers) matrix of a field.
+        """
+
+        if field not in PANEL_FIELDS:
+            raise Exception('invalid panel field: {}'.format(field))
+        elif len(self.dates) == 0 or len(self.columns) == 0:
+            return np.empty((len(self.dates), len(self.columns)), dtype=PANEL_DTYPE)
+        else:
+            return self.matrices[field][:len(self.dates), :len(self.columns)]
+
+    def read_frame(self, field: str) -> pd.DataFrame:
+        """
+            Returns a field as a DataFrame indexed by date with a column
+            per ticker, backed by the memory-mapped matrix.
+        """
+
+        return pd.DataFrame(self.read(field), index=pd.Index(self.get_dates(), name='date'),
+                            columns=self.get_tickers(), copy=False)
+
+    def update(self, ticker_bars: dict) -> int:
+        """
+            Writes bars (arrays keyed by column, dates as days since the
+            epoch) for each ticker, extending the calendar and columns as
+            needed. Returns the number of tickers written.
+        """
+
+        ticker_bars = {ticker: bars for ticker, bars in ticker_bars.items() if len(bars['date']) > 0}
+        if len(ticker_bars) == 0:
+            return 0
+
+        with self._writer_lock():
+            self.refresh()
+            old_meta, old_dates = self.meta, self.dates
+            date_count, ticker_count = len(old_dates), len(old_meta['tickers'])
+
+            # extend calendar and columns
+            bar_dates = {ticker: np.asarray(bars['date'], dtype='int64') for ticker, bars in ticker_bars.items()}
+            dates = np.union1d(old_dates, np.concatenate(list(bar_dates.values())))
+            tickers = old_meta['tickers'] + [ticker for ticker in ticker_bars if ticker not in self.columns]
+            meta = dict(old_meta, dates=dates.tolist(), tickers=tickers)
+
+            # write in place if new dates follow the calendar and fit
+            appended = date_count == 0 or np.array_equal(dates[:date_count], old_dates)
+            if appended and len(dates) <= old_meta['date_capacity'] and len(tickers) <= old_meta['ticker_capacity']:
+                matrices = self._open_matrices(meta, 'r+')
+                for matrix in matrices.values():
+                    matrix[date_count:len(dates), :len(tickers)] = np.nan
+                    matrix[:date_count, ticker_count:len(tickers)] = np.nan
+            else:
+                meta['generation'] = old_meta['generation'] + 1
+                meta['date_capacity'] = len(dates) + self.spare_dates
+                meta['ticker_capacity'] = len(tickers) + self.spare_tickers
+                self.logger.info('Rebuilding price panel for {} dates x {} tickers.'.format(len(dates), len(tickers)))
+                matrices = self._rebuild(old_meta, meta)
+
+            # write bars from the first touched row on
+            columns = {ticker: i for i, ticker in enumerate(tickers)}
+            rows = {ticker: np.searchsorted(dates, ticker_dates) for ticker, ticker_dates in bar_dates.items()}
+            first_row = min(int(ticker_rows.min()) for ticker_rows in rows.values())
+            for field, matrix in matrices.items():
+                block = np.array(matrix[first_row:len(dates), :len(tickers)])
+                for ticker, bars in ticker_bars.items():
+                    block[rows[ticker] - first_row, columns[ticker]] = np.asarray(bars[field], dtype=PANEL_DTYPE)
+                matrix[first_row:len(dates), :len(tickers)] = block
+                matrix.flush()
+            del matrices
+
+            # commit meta, then drop a replaced generation
+            self._write_meta(meta)
+            if meta['generation'] != old_meta['generation']:
+                self._delete_generation(old_meta['generation'])
+            self.refresh()
+            return len(ticker_bars)
+
+    def update_from_historical_quotes(self, historical_quotes: MultiIndex) -> int:
+        """
+            Writes the historical quotes of each ticker in a multi-index
+            returned by get_internal_historical_quotes.
+        """
+
+        ticker_bars = {}
+        for record in historical_quotes:
+            df = record['historical_quotes']
+            bars = {'date': np.fromiter(map(to_epoch_days, df.index), dtype='int64', count=len(df))}
+            for field in PANEL_FIELDS:
+                bars[field] = df[field].to_numpy(dtype=PANEL_DTYPE)
+            ticker_bars[record['ticker']] = bars
+        return self.update(ticker_bars)
+
+    def _set_meta(self, meta: dict, meta_stat: tuple) -> None:
+        self.matrices = self._open_matrices(meta, 'r') if meta['date_capacity'] > 0 else {}
+        self.meta = meta
+        self.meta_stat = meta_stat
+        self.dates = np.array(meta['dates'], dtype='int64')
+        self.columns = {ticker: i for i, ticker in enumerate(meta['tickers'])}
+
+    def _empty_meta(self) -> dict:
+        return {
+            'version': PRICE_PANEL_VERSION,
+            'fields': PANEL_FIELDS,
+            'dtype': PANEL_DTYPE,
+            'generation': 0,
+            'date_capacity': 0,
+            'ticker_capacity': 0,
+            'dates': [],
+            'tickers': []
+        }
+
+    def _open_matrices(self, meta: dict, mode: str) -> dict:
+        shape = (meta['date_capacity'], meta['ticker_capacity'])
+        return {field: np.memmap(self._matrix_path(field, meta['generation']), dtype=PANEL_DTYPE, mode=mode, shape=shape)
+                for field in PANEL_FIELDS}
+
+    def _rebuild(self, old_meta: dict, meta: dict) -> dict:
+
+        # map stored rows into the new calendar
+        old_dates = np.array(old_meta['dates'], dtype='int64')
+        rows = np.searchsorted(meta['dates'], old_dates)
+        ticker_count = len(old_meta['tickers'])
+
+        # copy stored values into NaN-filled matrices
+        matrices = self._open_matrices(meta, 'w+')
+        old_matrices = self._open_matrices(old_meta, 'r') if old_meta['date_capacity'] > 0 else {}
+        for field, matrix in matrices.items():
+            matrix[:] = np.nan
+            if len(old_dates) > 0 and ticker_count > 0:
+                matrix[rows, :ticker_count] = old_matrices[field][:len(old_dates), :ticker_count]
+        return matrices
+
+    def _write_meta(self, meta: dict) -> None:
+        meta_path = os.path.join(self.directory, 'meta.json')
+        f = open(meta_path + '.tmp', 'w')
+        json.dump(meta, f)
+        f.close()
+        os.replace(meta_path + '.tmp', meta_path)
+
+    def _delete_generation(self, generation: int) -> None:
+        for field in PANEL_FIELDS:
+            path = Path(self._matrix_path(field, generation))
+            if path.exists(): path.unlink()
+
+    @contextmanager
+    def _writer_lock(self):
+        f = open(os.path.join(self.directory, 'lock'), 'w')
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+            f.close()
+
+    def _matrix_path(self, field: str, generation: int) -> str:
+        return os.path.join(self.directory, '{}.{}.bin'.format(field, generation))
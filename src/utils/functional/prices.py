@@ -1,7 +1,68 @@
+import numpy as np
+
+
+# aggregate bar result fields as (bar column, result key, dtype, missing value)
+AGGREGATE_BAR_FIELDS = [
+    ('open', 'o', 'float64', np.nan),
+    ('high', 'h', 'float64', np.nan),
+    ('low', 'l', 'float64', np.nan),
+    ('close', 'c', 'float64', np.nan),
+    ('vwap', 'vw', 'float64', np.nan),
+    ('volume', 'v', 'float64', np.nan),
+    ('transactions', 'n', 'int64', 0)
+]
+MS_PER_DAY = 86400000
 
 
 def parse_price(price: float) -> float:
     assert price > 0, 'invalid price'
     price = float(price)
     price = round(price, 4)
-    return price
\ No newline at end of file
+    return price
+
+
+def parse_aggregate_bars(results: list) -> dict:
+    """
+        Parses aggregate bar results (dicts with a millisecond "t"
+        timestamp) into typed arrays keyed by bar column, with dates as
+        days since the epoch, sorted by date and keeping the first bar of
+        each date.
+    """
+
+    count = len(results)
+    bars = {'date': np.fromiter((result['t'] for result in results), dtype='int64', count=count) // MS_PER_DAY}
+    for name, key, dtype, missing in AGGREGATE_BAR_FIELDS:
+        bars[name] = np.fromiter((result.get(key, missing) for result in results), dtype=dtype, count=count)
+
+    # sort by date, keeping the first bar per date
+    dates = bars['date']
+    if count < 2 or np.all(dates[1:] > dates[:-1]):
+        return bars
+    order = np.argsort(dates, kind='stable')
+    sorted_dates = dates[order]
+    order = order[np.concatenate(([True], sorted_dates[1:] != sorted_dates[:-1]))]
+    return {name: values[order] for name, values in bars.items()}
+
+
+def merge_bars(old_bars: dict, new_bars: dict) -> dict:
+    """
+        Merges two date-sorted bar array sets, keeping the new bar where
+        both have a date.
+    """
+
+    old_dates, new_dates = old_bars['date'], new_bars['date']
+    if len(old_dates) == 0: return new_bars
+    elif len(new_dates) == 0: return old_bars
+
+    # append when strictly newer
+    elif new_dates[0] > old_dates[-1]:
+        return {name: np.concatenate((old_bars[name], new_bars[name])) for name in new_bars}
+
+    # keep old bars on dates missing from the new ones
+    keep = np.ones(len(old_dates), dtype=bool)
+    positions = np.searchsorted(new_dates, old_dates)
+    in_range = positions < len(new_dates)
+    keep[in_range] = new_dates[positions[in_range]] != old_dates[in_range]
+    dates = np.concatenate((old_dates[keep], new_dates))
+    order = np.argsort(dates, kind='stable')
+    return {name: np.concatenate((old_bars[name][keep], new_bars[name]))[order] for name in new_bars}
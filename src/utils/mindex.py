@@ -1,7 +1,11 @@
-import re
-from typing import Any
+from typing import Any, Iterable, Iterator, Tuple
+from collections import Counter
+from contextlib import contextmanager
+import threading
+import bisect
 import pickle
-import uuid
+import math
+import sys
 
 
 class MultiIndexException(Exception):
@@ -12,15 +16,81 @@ class MultiIndexException(Exception):
         return self.message
 
 
+class _Missing(object):
+    def __reduce__(self):
+        return '_MISSING'
+
+    def __repr__(self):
+        return '<missing>'
+
+
+_MISSING = _Missing()
+
+
+def _deep_sizeof(obj: Any) -> int:
+    size, seen, stack = 0, set(), [obj]
+    while len(stack) > 0:
+        obj = stack.pop()
+        if id(obj) in seen: continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        elif hasattr(obj, '__dict__'):
+            stack.append(obj.__dict__)
+    return size
+
+
+def _resolve_path(obj: dict, path: str) -> Any:
+    for key in path.split('.'):
+        if not isinstance(obj, dict) or key not in obj:
+            return _MISSING
+        obj = obj[key]
+    return obj
+
+
+def _records_equal(a: Any, b: Any) -> bool:
+    try:
+        if a == b: return True
+    except (ValueError, TypeError):
+        pass
+
+    # compare structurally for dataframes and NaN values
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(_records_equal(v, b[k]) for k, v in a.items())
+    elif isinstance(a, (list, tuple)) and isinstance(b, (list, tuple)):
+        return type(a) is type(b) and len(a) == len(b) and all(map(_records_equal, a, b))
+    elif isinstance(a, float) and isinstance(b, float):
+        return math.isnan(a) and math.isnan(b)
+    elif type(a) is type(b) and hasattr(a, 'equals'):
+        return bool(a.equals(b))
+    else:
+        return False
+
+
+def _is_sortable(value: Any) -> bool:
+    if isinstance(value, bool): return False
+    elif isinstance(value, int): return True
+    elif isinstance(value, float): return not math.isnan(value)
+    else: return False
+
+
 class MultiIndex(object):
 
     def __init__(self, index_keys: list,
                  default_index_key: str=None,
-                 safe_mode: bool=False):
+                 safe_mode: bool=False,
+                 secondary_index_keys: list=None,
+                 sorted_index_keys: list=None):
 
         self.index_keys = index_keys
         self.default_index_key = default_index_key
         self.safe_mode = safe_mode
+        self.secondary_index_keys = [] if secondary_index_keys is None else secondary_index_keys
+        self.sorted_index_keys = [] if sorted_index_keys is None else sorted_index_keys
         if len(self.index_keys) == 0:
             raise MultiIndexException('must specify at least on index key')
         if self.default_index_key is not None and self.default_index_key not in self.index_keys:
@@ -38,25 +108,35 @@ class MultiIndex(object):
         for index_key in self.index_keys:
             self.lookup_tables[index_key] = dict()
 
-        # define hash table
-        self.hash_table = {}
-        self.iteration = 0
+        # define secondary tables (field path -> value -> row ids)
+        self.secondary_tables = {}
+        for index_key in self.secondary_index_keys:
+            self.secondary_tables[index_key] = dict()
+
+        # define sorted tables (field path -> sorted (value, row id) pairs)
+        self.sorted_tables = {}
+        self.unsorted_keys = set()
+        for index_key in self.sorted_index_keys:
+            self.sorted_tables[index_key] = []
+
+        # define indexed values (field path -> row id -> value), so
+        # removal does not depend on records being left unmodified
+        self.indexed_values = {}
+        for index_key in self.secondary_index_keys + self.sorted_index_keys:
+            self.indexed_values[index_key] = dict()
+
+        # define record storage
+        self.records = []
+        self.removed_count = 0
+
+        # define read-only flag (set on published snapshots)
+        self.read_only = False
 
     def __len__(self) -> int:
-        return len(self.hash_table)
+        return self._row_count() - self.removed_count
     
-    def __iter__(self) -> 'MultiIndex':
-        return self
-
-    def __next__(self) -> dict:
-        objs = self.get_all()
-        if self.iteration >= len(objs):
-            self.reset()
-            raise StopIteration
-        else:
-            obj = objs[self.iteration]
-            self.iteration += 1
-            return obj
+    def __iter__(self) -> Iterator[dict]:
+        return self._iter_records()
 
     def __getitem__(self, item):
         if isinstance(item, str):
@@ -65,20 +145,172 @@ class MultiIndex(object):
             else:
                 return self.get(self.default_index_key, item)
         elif isinstance(item, int):
-            objs = self.get_all()
-            return objs[item]
+            self._compact()
+            return self._fetch_record(range(len(self))[item])
         elif isinstance(item, slice):
-            objs = self.get_all()
-            return objs[item]
+            self._compact()
+            return [self._fetch_record(row_id) for row_id in range(len(self))[item]]
         else:
             raise MultiIndexException('invalid index type')
-            
-    def reset(self) -> None:
-        self.iteration = 0
-    
-    def is_finished(self) -> None:
-        objs = self.get_all()
-        return self.iteration >= len(objs)
+
+    def __setstate__(self, state: dict) -> None:
+
+        # migrate legacy hash table pickles
+        if 'hash_table' in state:
+            hash_table = state.pop('hash_table')
+            state.pop('iteration', None)
+            row_ids = {hash_key: row_id for row_id, hash_key in enumerate(hash_table.keys())}
+            for index_key, lookup_table in state['lookup_tables'].items():
+                state['lookup_tables'][index_key] = {v: row_ids[h] for v, h in lookup_table.items()}
+            state['records'] = list(hash_table.values())
+            state['removed_count'] = 0
+
+        # default tables missing from older pickles
+        state.setdefault('secondary_index_keys', [])
+        state.setdefault('secondary_tables', {})
+        state.setdefault('sorted_index_keys', [])
+        state.setdefault('sorted_tables', {})
+        state.setdefault('unsorted_keys', set())
+        state['read_only'] = False
+        if 'indexed_values' not in state:
+            state['indexed_values'] = {k: {r: v for v, rs in secondary_table.items() for r in rs}
+                                       for k, secondary_table in state['secondary_tables'].items()}
+            for k, sorted_table in state['sorted_tables'].items():
+                state['indexed_values'].setdefault(k, {}).update((r, v) for v, r in sorted_table)
+        self.__dict__.update(state)
+
+    @classmethod
+    def from_records(cls, records: Iterable, index_keys: list,
+                     default_index_key: str=None,
+                     safe_mode: bool=False,
+                     secondary_index_keys: list=None,
+                     sorted_index_keys: list=None,
+                     on_conflict: str='skip',
+                     return_skipped: bool=False) -> Any:
+        """
+            Builds a multi-index from an iterable of records in a single
+            validation pass. Index key collisions are resolved with the
+            on_conflict policy:
+
+            - skip: drop every record sharing a colliding index value
+            - first: keep the first record seen for each index value
+            - last: keep the last record seen for each index value
+            - raise: raise a MultiIndexException on the first collision
+
+            Records missing required index keys are always skipped (or 
+            raised under the raise policy). With return_skipped, returns 
+            a (multi_index, skipped) tuple where skipped lists 
+            (position, record, reason) tuples in input order.
+        """
+
+        if on_conflict not in ['skip', 'first', 'last', 'raise']:
+            raise MultiIndexException('invalid conflict policy: {}'.format(on_conflict))
+        multi_index = cls(index_keys, default_index_key, safe_mode, 
+                          secondary_index_keys, sorted_index_keys)
+
+        # deduplicate single-key records with bulk dict operations
+        if len(index_keys) == 1:
+            rows, lookup_table, skipped = cls._dedupe_single_key(list(records), index_keys[0], on_conflict)
+            multi_index._load_records(rows, {index_keys[0]: lookup_table})
+            if return_skipped: return multi_index, skipped
+            else: return multi_index
+
+        # validate and deduplicate records in place
+        rows, skipped = list(records), []
+        owners = {index_key: {} for index_key in index_keys}
+        conflicted = {index_key: set() for index_key in index_keys}
+        key_tables = [(k, owners[k], not safe_mode or k == default_index_key) for k in index_keys]
+        for position, obj in enumerate(rows):
+            collision, missing = None, False
+            for k, owner_table, required in key_tables:
+                v = obj.get(k, _MISSING)
+                if v is _MISSING: missing = missing or required
+                elif collision is None and v in owner_table: collision = k
+
+            # skip invalid records
+            if missing:
+                if on_conflict == 'raise': raise MultiIndexException('not all index keys specified')
+                skipped.append((position, obj, 'missing index key'))
+                rows[position] = None
+                continue
+
+            # resolve colliding records
+            if collision is not None:
+                reason = 'collision on index key: \"{}:{}\"'.format(collision, obj[collision])
+                if on_conflict == 'raise':
+                    raise MultiIndexException(reason)
+                elif on_conflict == 'first' or on_conflict == 'skip':
+                    skipped.append((position, obj, reason))
+                    for k in index_keys:
+                        if k in obj and obj[k] in owners[k]: conflicted[k].add(obj[k])
+                    rows[position] = None
+                    continue
+                else:
+                    for k in index_keys:
+                        replaced_position = owners[k].get(obj[k]) if k in obj else None
+                        if replaced_position is None: continue
+                        cls._release_row(rows, replaced_position, owners)
+                        skipped.append((replaced_position, rows[replaced_position], 'replaced by record {}'.format(position)))
+                        rows[replaced_position] = None
+
+            # claim index values
+            for k, owner_table, _ in key_tables:
+                if k in obj: owner_table[obj[k]] = position
+
+        # drop first claimants of conflicted values
+        if on_conflict == 'skip':
+            for k, values in conflicted.items():
+                for v in values:
+                    dropped_position = owners[k].get(v)
+                    if dropped_position is None: continue
+                    cls._release_row(rows, dropped_position, owners)
+                    skipped.append((dropped_position, rows[dropped_position], 'collision on index key: \"{}:{}\"'.format(k, v)))
+                    rows[dropped_position] = None
+
+        # build indices over kept rows
+        multi_index._load_records(rows, owners)
+
+        if return_skipped: return multi_index, sorted(skipped, key=lambda s: s[0])
+        else: return multi_index
+
+    @staticmethod
+    def _release_row(rows: list, position: int, owners: dict) -> None:
+        obj = rows[position]
+        for k, owner_table in owners.items():
+            if k in obj: owner_table.pop(obj[k], None)
+
+    @staticmethod
+    def _dedupe_single_key(objs: list, key: str, on_conflict: str) -> Tuple[list, dict, list]:
+        values = [obj.get(key, _MISSING) for obj in objs]
+
+        # map each value to its first (or last) position
+        if on_conflict == 'last': owners = dict(zip(values, range(len(values))))
+        else: owners = dict(zip(reversed(values), range(len(values) - 1, -1, -1)))
+        owners.pop(_MISSING, None)
+        if len(owners) == len(objs):
+            return objs, owners, []
+
+        # resolve conflicts
+        if on_conflict == 'raise':
+            if _MISSING in values: raise MultiIndexException('not all index keys specified')
+            counts = Counter(values)
+            v = next(v for v in values if counts[v] > 1)
+            raise MultiIndexException('collision on index key: \"{}:{}\"'.format(key, v))
+        elif on_conflict == 'skip':
+            counts = Counter(values)
+            owners = {v: row_id for v, row_id in owners.items() if counts[v] == 1}
+
+        # drop and report skipped records
+        rows, skipped = objs.copy(), []
+        for row_id in sorted(set(range(len(objs))).difference(owners.values())):
+            v = values[row_id]
+            if v is _MISSING: reason = 'missing index key'
+            elif on_conflict == 'last': reason = 'replaced by record {}'.format(owners[v])
+            else: reason = 'collision on index key: \"{}:{}\"'.format(key, v)
+            skipped.append((row_id, objs[row_id], reason))
+            rows[row_id] = None
+
+        return rows, owners, skipped
 
     @staticmethod
     def load(path: str) -> Any:
@@ -92,43 +324,151 @@ class MultiIndex(object):
         pickle.dump(self, f)
         f.close()
 
-    def insert(self, obj: dict):
-        index_keys_copy = self.index_keys.copy()
+    def copy(self) -> 'MultiIndex':
+        """
+            Returns an independent copy of the index structures. Records
+            themselves are shared, so they should be treated as immutable.
+        """
 
-        # verify object integrity
-        for k, v in obj.items():
-            if k in index_keys_copy: 
-                index_keys_copy.remove(k)
-                if v in self.index_tables[k]:
-                    raise MultiIndexException('collision on index key: \"{}:{}\"'.format(k, v))
-        if not self.safe_mode and len(index_keys_copy) > 0:
-            raise MultiIndexException('not all index keys specified')
-        elif self.safe_mode and self.default_index_key in index_keys_copy:
-            raise MultiIndexException('default index key must be specified in safe mode')
+        multi_index = object.__new__(type(self))
+        multi_index.__dict__.update(self.__dict__)
+        if self.index_tables is not None:
+            multi_index.index_tables = {k: set(index_table) for k, index_table in self.index_tables.items()}
+        multi_index.lookup_tables = {k: dict(lookup_table) for k, lookup_table in self.lookup_tables.items()}
+        multi_index.secondary_tables = {k: {v: set(rs) for v, rs in secondary_table.items()} 
+                                        for k, secondary_table in self.secondary_tables.items()}
+        multi_index.sorted_tables = {k: list(sorted_table) for k, sorted_table in self.sorted_tables.items()}
+        multi_index.unsorted_keys = set(self.unsorted_keys)
+        multi_index.indexed_values = {k: dict(values) for k, values in self.indexed_values.items()}
+        multi_index.read_only = False
+        multi_index._copy_records()
+        return multi_index
 
-        # insert object indices
-        hash_key = str(uuid.uuid4())
-        for k, v in obj.items():
-            if k in self.index_keys:
-                self.index_tables[k].add(v)
-                self.lookup_tables[k][v] = hash_key
+    @staticmethod
+    def diff(old: 'MultiIndex', new: 'MultiIndex') -> dict:
+        """
+            Returns the delta between two versions of a multi-index as
+            added, removed and changed (new) records, each keyed by the
+            shared default index key.
+        """
+
+        key = new.default_index_key
+        if key is None or old.default_index_key != key:
+            raise MultiIndexException('multi-indices must share a default index key')
+
+        # match records by default key
+        old_objs = {obj[key]: obj for obj in old}
+        added, changed = {}, {}
+        for obj in new:
+            old_obj = old_objs.pop(obj[key], _MISSING)
+            if old_obj is _MISSING: added[obj[key]] = obj
+            elif not _records_equal(old_obj, obj): changed[obj[key]] = obj
+        return {'key': key, 'added': added, 'removed': old_objs, 'changed': changed}
+
+    def apply_delta(self, delta: dict) -> 'MultiIndex':
+        """
+            Patches the multi-index in place with a delta from diff.
+            Changed records keep their position and added records are
+            appended, in the order of the newer version.
+        """
+
+        self._check_writable()
+        key = self.default_index_key
+        if key is None or delta['key'] != key:
+            raise MultiIndexException('delta key does not match default index key')
+
+        # remove records
+        for value in delta['removed'].keys():
+            self.remove(key, value)
+
+        # unindex changed records
+        changed_rows = []
+        for value, obj in delta['changed'].items():
+            if value is None or not self._contains(key, value):
+                raise MultiIndexException('index key value not found: \"{}:{}\"'.format(key, value))
+            row_id = self.lookup_tables[key][value]
+            old_obj = self._fetch_record(row_id)
+            for k in self.index_keys:
+                if k in old_obj: self._remove_index_value(k, old_obj[k])
+            self._remove_secondary_values(row_id)
+            changed_rows.append((row_id, obj))
+
+        # reindex changed records in place
+        for row_id, obj in changed_rows:
+            self._verify_record(obj)
+            self._replace_record(row_id, obj)
+            self._index_record(obj, row_id)
+
+        # insert added records
+        for obj in delta['added'].values():
+            self.insert(obj)
+        return self
+
+    def insert(self, obj: dict):
+        self._check_writable()
+        self._verify_record(obj)
 
         # insert object
-        self.hash_table[hash_key] = obj
+        row_id = self._store_record(obj)
+        self._index_record(obj, row_id)
     
     def get(self, key: str, value: Any) -> dict:
         if value is None:
             return None
         elif key not in self.index_keys:
             raise MultiIndexException('invalid index key; {}'.format(key))
-        elif value not in self.index_tables[key]:
+        elif not self._contains(key, value):
             if self.safe_mode: return None
             else: raise MultiIndexException('index key value not found: \"{}:{}\"'.format(key, value))
         else:
-            hash_key = self.lookup_tables[key][value]
-            return self.hash_table[hash_key]
+            row_id = self.lookup_tables[key][value]
+            return self._fetch_record(row_id)
+
+    def get_many(self, key: str, values: Iterable) -> list:
+        """
+            Batched get: returns the record for each value in order, with
+            None for None values and (in safe mode) values not found.
+        """
+
+        if key not in self.index_keys:
+            raise MultiIndexException('invalid index key; {}'.format(key))
+
+        values = list(values)
+        records = self._fetch_many(key, values)
+        if not self.safe_mode:
+            for value, obj in zip(values, records):
+                if obj is None and value is not None:
+                    raise MultiIndexException('index key value not found: \"{}:{}\"'.format(key, value))
+        return records
+
+    def join(self, other: 'MultiIndex', left_key: str, right_key: str,
+             how: str='left') -> list:
+        """
+            Pairs each record, in insertion order, with the record of the
+            other multi-index whose unique right_key equals its left_key
+            field (a dotted path). Left joins pair unmatched records with
+            None, inner joins drop them.
+        """
+
+        if how not in ['left', 'inner']:
+            raise MultiIndexException('invalid join type: {}'.format(how))
+        elif right_key not in other.index_keys:
+            raise MultiIndexException('invalid index key; {}'.format(right_key))
+
+        # resolve join column in a single batch
+        left_objs = list(self)
+        if '.' in left_key:
+            left_values = [_resolve_path(obj, left_key) for obj in left_objs]
+            left_values = [None if v is _MISSING else v for v in left_values]
+        else:
+            left_values = [obj.get(left_key) for obj in left_objs]
+        right_objs = other._fetch_many(right_key, left_values)
+
+        if how == 'left': return list(zip(left_objs, right_objs))
+        else: return [(l, r) for l, r in zip(left_objs, right_objs) if r is not None]
 
     def remove(self, key: str, value: Any) -> None:
+        self._check_writable()
 
         # get object
         obj = self.get(key, value)
@@ -136,29 +476,481 @@ class MultiIndex(object):
             raise MultiIndexException('index key value not found: \"{}:{}\"'.format(key, value))
 
         # remove object indices
-        hash_key = None
+        row_id = None
         for k in self.index_keys:
             if k in obj:
-                hash_key = self.lookup_tables[k][obj[k]]
-                self.index_tables[k].remove(obj[k])
-                self.lookup_tables[k].pop(obj[k])
+                row_id = self.lookup_tables[k][obj[k]]
+                self._remove_index_value(k, obj[k])
             
         # remove object
-        if hash_key is None:
-            raise MultiIndexException('failed to locate hash key')
+        if row_id is None:
+            raise MultiIndexException('failed to locate row id')
         else:
-            self.hash_table.pop(hash_key)
+            self._remove_secondary_values(row_id)
+            self._drop_record(row_id)
+            self.removed_count += 1
+
+        # compact mostly-empty storage
+        if self.removed_count > (len(self) + self.removed_count) // 2:
+            self._compact()
 
     def get_all(self) -> list:
-        return list(self.hash_table.values())
+        return list(self)
+
+    def get_group(self, key: str, value: Any) -> list:
+        """
+            Returns all records whose secondary index field equals the
+            given value, in insertion order.
+        """
+
+        row_ids = self._group_row_ids(key, value)
+        return [self._fetch_record(row_id) for row_id in sorted(row_ids)]
+
+    def get_matching(self, conditions: dict) -> list:
+        """
+            Returns all records matching every field/value equality pair,
+            resolved against unique and secondary indices, in insertion
+            order.
+        """
+
+        if len(conditions) == 0:
+            raise MultiIndexException('must specify at least one condition')
+
+        # intersect from the most selective condition
+        row_id_sets = sorted([self._group_row_ids(k, v) for k, v in conditions.items()], key=len)
+        row_ids = set(row_id_sets[0])
+        for row_id_set in row_id_sets[1:]:
+            row_ids.intersection_update(row_id_set)
+        return [self._fetch_record(row_id) for row_id in sorted(row_ids)]
+
+    def get_range(self, key: str,
+                  min_value: Any=None,
+                  max_value: Any=None) -> list:
+        """
+            Returns all records whose sorted index field is within the
+            inclusive [min_value, max_value] range (open-ended if None), 
+            ordered by that field.
+        """
+
+        row_ids = self._range_row_ids(key, min_value, max_value)
+        return [self._fetch_record(row_id) for row_id in row_ids]
+
+    def where(self, path: str, op: str, value: Any=None):
+        """
+            Starts a chainable query over this multi-index; see
+            MultiIndexQuery for the supported ops.
+        """
+
+        from src.utils.mquery import MultiIndexQuery
+        return MultiIndexQuery(self).where(path, op, value)
 
     def get_indices(self) -> list:
         return self.index_keys
 
     def get_all_key_values(self, key: str) -> list:
         if key in self.index_keys:
-            values = list(self.hash_table.values())
-            key_values = [obj[key] for obj in values]
+            key_values = [obj[key] for obj in self]
+            return key_values
+        else:
+            raise MultiIndexException('invalid index key')
+
+    def memory_usage(self) -> int:
+        """
+            Returns the approximate deep size in bytes of the records
+            and index structures.
+        """
+
+        return _deep_sizeof(self.__dict__)
+
+    def _compact(self) -> None:
+        if self.removed_count == 0:
+            return
+
+        # drop removed records
+        row_ids = self._compact_records()
+
+        # remap lookup tables
+        for index_key, lookup_table in self.lookup_tables.items():
+            self.lookup_tables[index_key] = {v: row_ids[r] for v, r in lookup_table.items()}
+
+        # remap secondary and sorted tables
+        for index_key, secondary_table in self.secondary_tables.items():
+            self.secondary_tables[index_key] = {v: {row_ids[r] for r in rs} for v, rs in secondary_table.items()}
+        for index_key, sorted_table in self.sorted_tables.items():
+            self.sorted_tables[index_key] = [(v, row_ids[r]) for v, r in sorted_table]
+        for index_key, values in self.indexed_values.items():
+            self.indexed_values[index_key] = {row_ids[r]: v for r, v in values.items()}
+
+        self.removed_count = 0
+
+    def _check_writable(self) -> None:
+        if self.read_only:
+            raise MultiIndexException('multi-index is read-only')
+
+    def _verify_record(self, obj: dict) -> None:
+        index_keys_copy = self.index_keys.copy()
+
+        # verify object integrity
+        for k, v in obj.items():
+            if k in index_keys_copy: 
+                index_keys_copy.remove(k)
+                if self._contains(k, v):
+                    raise MultiIndexException('collision on index key: \"{}:{}\"'.format(k, v))
+        if not self.safe_mode and len(index_keys_copy) > 0:
+            raise MultiIndexException('not all index keys specified')
+        elif self.safe_mode and self.default_index_key in index_keys_copy:
+            raise MultiIndexException('default index key must be specified in safe mode')
+
+    def _index_record(self, obj: dict, row_id: int) -> None:
+        for k, v in obj.items():
+            if k in self.index_keys:
+                self._add_index_value(k, v, row_id)
+        self._add_secondary_values(obj, row_id)
+
+    def _field_values(self, path: str) -> list:
+        return [_resolve_path(obj, path) for obj in self]
+
+    def _fetch_many(self, key: str, values: list) -> list:
+        lookup_table, fetch = self.lookup_tables[key], self._fetch_record
+        row_ids = [None if v is None else lookup_table.get(v) for v in values]
+        return [None if row_id is None else fetch(row_id) for row_id in row_ids]
+
+    def _group_row_ids(self, key: str, value: Any) -> set:
+        if key in self.secondary_tables:
+            return self.secondary_tables[key].get(value, set())
+        elif key in self.index_keys:
+            if value is None or not self._contains(key, value): return set()
+            else: return {self.lookup_tables[key][value]}
+        else:
+            raise MultiIndexException('invalid secondary index key: {}'.format(key))
+
+    def _range_row_ids(self, key: str, min_value: Any, max_value: Any) -> list:
+        if key not in self.sorted_tables:
+            raise MultiIndexException('invalid sorted index key: {}'.format(key))
+        sorted_table = self._get_sorted_table(key)
+
+        # bisect range bounds
+        if min_value is None: start = 0
+        else: start = bisect.bisect_left(sorted_table, (min_value,))
+        if max_value is None: end = len(sorted_table)
+        else: end = bisect.bisect_right(sorted_table, (max_value, math.inf))
+        return [row_id for _, row_id in sorted_table[start:end]]
+
+    def _load_secondary_values(self, rows: list) -> None:
+        if len(self.secondary_tables) == 0 and len(self.sorted_tables) == 0:
+            return
+        for row_id, obj in enumerate(rows):
+            if obj is not None: self._add_secondary_values(obj, row_id)
+
+    def _get_sorted_table(self, key: str) -> list:
+        if key in self.unsorted_keys:
+            self.sorted_tables[key].sort()
+            self.unsorted_keys.discard(key)
+        return self.sorted_tables[key]
+
+    def _add_secondary_values(self, obj: dict, row_id: int) -> None:
+        for index_key, secondary_table in self.secondary_tables.items():
+            value = _resolve_path(obj, index_key)
+            if value is _MISSING or value is None: continue
+            elif value in secondary_table: secondary_table[value].add(row_id)
+            else: secondary_table[value] = {row_id}
+            self.indexed_values[index_key][row_id] = value
+
+        # defer sorting until the next range query
+        for index_key, sorted_table in self.sorted_tables.items():
+            value = _resolve_path(obj, index_key)
+            if not _is_sortable(value): continue
+            elif len(sorted_table) > 0 and (value, row_id) < sorted_table[-1]: self.unsorted_keys.add(index_key)
+            sorted_table.append((value, row_id))
+            self.indexed_values[index_key][row_id] = value
+
+    def _remove_secondary_values(self, row_id: int) -> None:
+
+        # remove the values indexed on insert, even if the record changed since
+        for index_key, secondary_table in self.secondary_tables.items():
+            value = self.indexed_values[index_key].get(row_id, _MISSING)
+            if value is _MISSING: continue
+            secondary_table[value].discard(row_id)
+            if len(secondary_table[value]) == 0: secondary_table.pop(value)
+
+        for index_key in self.sorted_tables.keys():
+            value = self.indexed_values[index_key].get(row_id, _MISSING)
+            if not _is_sortable(value): continue
+            sorted_table = self._get_sorted_table(index_key)
+            idx = bisect.bisect_left(sorted_table, (value, row_id))
+            if idx < len(sorted_table) and sorted_table[idx] == (value, row_id): 
+                sorted_table.pop(idx)
+
+        for values in self.indexed_values.values():
+            values.pop(row_id, None)
+
+    def _contains(self, key: str, value: Any) -> bool:
+        return value in self.index_tables[key]
+
+    def _add_index_value(self, key: str, value: Any, row_id: int) -> None:
+        self.index_tables[key].add(value)
+        self.lookup_tables[key][value] = row_id
+
+    def _remove_index_value(self, key: str, value: Any) -> None:
+        self.index_tables[key].remove(value)
+        self.lookup_tables[key].pop(value)
+
+    def _row_count(self) -> int:
+        return len(self.records)
+
+    def _store_record(self, obj: dict) -> int:
+        self.records.append(obj)
+        return len(self.records) - 1
+
+    def _fetch_record(self, row_id: int) -> dict:
+        return self.records[row_id]
+
+    def _load_records(self, rows: list, lookup_tables: dict) -> None:
+        self.records = rows
+        self.removed_count = rows.count(None)
+        self.lookup_tables = lookup_tables
+        self.index_tables = {k: set(lookup_table) for k, lookup_table in lookup_tables.items()}
+        self._load_secondary_values(rows)
+
+    def _replace_record(self, row_id: int, obj: dict) -> None:
+        self.records[row_id] = obj
+
+    def _copy_records(self) -> None:
+        self.records = list(self.records)
+
+    def _drop_record(self, row_id: int) -> None:
+        self.records[row_id] = None
+
+    def _iter_records(self) -> Iterator[dict]:
+        return (obj for obj in self.records if obj is not None)
+
+    def _compact_records(self) -> dict:
+        row_ids = {}
+        records = []
+        for row_id, obj in enumerate(self.records):
+            if obj is not None:
+                row_ids[row_id] = len(records)
+                records.append(obj)
+
+        self.records = records
+        return row_ids
+
+
+class ColumnarMultiIndex(MultiIndex):
+    """
+        Multi-index with array-backed storage for large reference tables:
+        records are stored as one list per field under integer row ids,
+        string values are interned and each index key keeps a single
+        value-to-row dict. Records are materialized into new dicts on
+        access, so mutating a returned record does not update the index.
+    """
+
+    def __init__(self, index_keys: list,
+                 default_index_key: str=None,
+                 safe_mode: bool=False,
+                 secondary_index_keys: list=None,
+                 sorted_index_keys: list=None):
+
+        super().__init__(index_keys, default_index_key, safe_mode, 
+                         secondary_index_keys, sorted_index_keys)
+        self.index_tables = None
+        self.records = None
+
+        # define column storage
+        self.columns = {}
+        self.live = bytearray()
+
+    def get_all_key_values(self, key: str) -> list:
+        if key in self.index_keys:
+            column = self.columns.get(key, [])
+            key_values = []
+            for row_id, live in enumerate(self.live):
+                if not live: continue
+                elif column[row_id] is _MISSING: raise KeyError(key)
+                else: key_values.append(column[row_id])
             return key_values
         else:
-            raise MultiIndexException('invalid index key')
\ No newline at end of file
+            raise MultiIndexException('invalid index key')
+
+    def _field_values(self, path: str) -> list:
+        if '.' in path or path not in self.columns:
+            return super()._field_values(path)
+        else:
+            column = self.columns[path]
+            return [column[row_id] for row_id, live in enumerate(self.live) if live]
+
+    def _contains(self, key: str, value: Any) -> bool:
+        return value in self.lookup_tables[key]
+
+    def _add_index_value(self, key: str, value: Any, row_id: int) -> None:
+        self.lookup_tables[key][self._intern(value)] = row_id
+
+    def _remove_index_value(self, key: str, value: Any) -> None:
+        self.lookup_tables[key].pop(value)
+
+    def _row_count(self) -> int:
+        return len(self.live)
+
+    def _store_record(self, obj: dict) -> int:
+        row_id = len(self.live)
+
+        # add new field columns
+        for k in obj.keys():
+            if k not in self.columns:
+                self.columns[k] = [_MISSING] * row_id
+
+        # append row cells
+        for k, column in self.columns.items():
+            column.append(self._intern(obj.get(k, _MISSING)))
+        self.live.append(1)
+        return row_id
+
+    def _load_records(self, rows: list, lookup_tables: dict) -> None:
+        
+        # collect fields in first-seen order
+        fields = {}
+        for obj in rows:
+            if obj is None: continue
+            for k in obj.keys():
+                if k not in fields: fields[k] = None
+
+        # build columns and interned lookup tables
+        intern = self._intern
+        self.columns = {k: [_MISSING if obj is None else intern(obj.get(k, _MISSING)) for obj in rows] for k in fields}
+        self.lookup_tables = {k: {intern(v): r for v, r in lookup_table.items()} for k, lookup_table in lookup_tables.items()}
+        self.live = bytearray(0 if obj is None else 1 for obj in rows)
+        self.removed_count = rows.count(None)
+        self._load_secondary_values(rows)
+
+    def _fetch_record(self, row_id: int) -> dict:
+        obj = {}
+        for k, column in self.columns.items():
+            value = column[row_id]
+            if value is not _MISSING: obj[k] = value
+        return obj
+
+    def _copy_records(self) -> None:
+        self.columns = {k: list(column) for k, column in self.columns.items()}
+        self.live = bytearray(self.live)
+
+    def _replace_record(self, row_id: int, obj: dict) -> None:
+        for k in obj.keys():
+            if k not in self.columns:
+                self.columns[k] = [_MISSING] * len(self.live)
+        for k, column in self.columns.items():
+            column[row_id] = self._intern(obj.get(k, _MISSING))
+
+    def _drop_record(self, row_id: int) -> None:
+        self.live[row_id] = 0
+        for column in self.columns.values():
+            column[row_id] = _MISSING
+
+    def _iter_records(self) -> Iterator[dict]:
+        return (self._fetch_record(row_id) for row_id, live in enumerate(self.live) if live)
+
+    def _compact_records(self) -> dict:
+        live_row_ids = [row_id for row_id, live in enumerate(self.live) if live]
+        for k, column in self.columns.items():
+            self.columns[k] = [column[row_id] for row_id in live_row_ids]
+
+        self.live = bytearray([1] * len(live_row_ids))
+        return {row_id: new_row_id for new_row_id, row_id in enumerate(live_row_ids)}
+
+    @staticmethod
+    def _intern(value: Any) -> Any:
+        if type(value) is str: return sys.intern(value)
+        else: return value
+
+
+class ConcurrentMultiIndex(object):
+    """
+        Thread-safe multi-index using copy-on-write. Writers apply their
+        changes inside batch() to a private copy under a lock, which is
+        then published with a single reference swap. Readers never lock:
+        snapshot() returns the current point-in-time version, which is
+        read-only (copy() it to write), and the read methods below each
+        use one snapshot. Every batch copies the index tables and record
+        storage, so a write costs O(n) in the index size; group writes
+        into one batch where possible. Reads scale with threads only as
+        far as the GIL allows.
+    """
+
+    def __init__(self, multi_index: MultiIndex):
+        self.lock = threading.Lock()
+        self.current = self._freeze(multi_index.copy())
+
+    def __len__(self) -> int:
+        return len(self.current)
+
+    def __iter__(self) -> Iterator[dict]:
+        return iter(self.current)
+
+    def __getitem__(self, item):
+        return self.current[item]
+
+    def snapshot(self) -> MultiIndex:
+        return self.current
+
+    @contextmanager
+    def batch(self) -> Iterator[MultiIndex]:
+        """
+            Yields a private copy of the current version for writing and
+            publishes it on exit; an exception discards the whole batch.
+        """
+
+        with self.lock:
+            multi_index = self.current.copy()
+            yield multi_index
+            self.current = self._freeze(multi_index)
+
+    def insert(self, obj: dict) -> None:
+        with self.batch() as multi_index:
+            multi_index.insert(obj)
+
+    def remove(self, key: str, value: Any) -> None:
+        with self.batch() as multi_index:
+            multi_index.remove(key, value)
+
+    def apply_delta(self, delta: dict) -> 'ConcurrentMultiIndex':
+        with self.batch() as multi_index:
+            multi_index.apply_delta(delta)
+        return self
+
+    def get(self, key: str, value: Any) -> dict:
+        return self.current.get(key, value)
+
+    def get_many(self, key: str, values: Iterable) -> list:
+        return self.current.get_many(key, values)
+
+    def get_all(self) -> list:
+        return self.current.get_all()
+
+    def get_group(self, key: str, value: Any) -> list:
+        return self.current.get_group(key, value)
+
+    def get_matching(self, conditions: dict) -> list:
+        return self.current.get_matching(conditions)
+
+    def get_range(self, key: str,
+                  min_value: Any=None,
+                  max_value: Any=None) -> list:
+        return self.current.get_range(key, min_value, max_value)
+
+    def where(self, path: str, op: str, value: Any=None):
+        return self.current.where(path, op, value)
+
+    def get_indices(self) -> list:
+        return self.current.get_indices()
+
+    def get_all_key_values(self, key: str) -> list:
+        return self.current.get_all_key_values(key)
+
+    @staticmethod
+    def _freeze(multi_index: MultiIndex) -> MultiIndex:
+
+        # settle lazy compaction and sorting so reads never mutate
+        multi_index._compact()
+        for index_key in list(multi_index.unsorted_keys):
+            multi_index._get_sorted_table(index_key)
+        multi_index.read_only = True
+        return multi_index
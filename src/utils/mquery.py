@@ -0,0 +1,201 @@
+from typing import Any, Iterator
+import bisect
+import math
+
+from src.utils.mindex import MultiIndex, MultiIndexException, _resolve_path, _is_sortable, _MISSING
+
+
+_COMPARISON_OPS = ['==', '!=', '<', '<=', '>', '>=']
+_OPS = _COMPARISON_OPS + ['in', 'not in', 'exists']
+
+
+class MultiIndexQuery(object):
+    """
+        Chainable conjunctive query over a multi-index. Each where() adds
+        a (field path, op, value) condition. At execution, conditions on
+        a unique, secondary or sorted index select candidate rows,
+        intersected from the most selective; the rest are checked by a
+        predicate compiled into one function. Missing or None fields
+        never match, booleans never equal or compare with numbers (as in
+        sorted indexes), and results keep insertion order.
+    """
+
+    def __init__(self, multi_index: MultiIndex,
+                 conditions: tuple=(),
+                 fields: list=None,
+                 max_results: int=None):
+
+        self.multi_index = multi_index
+        self.conditions = conditions
+        self.fields = fields
+        self.max_results = max_results
+
+    def __iter__(self) -> Iterator[dict]:
+        return iter(self.all())
+
+    def where(self, path: str, op: str, value: Any=None) -> 'MultiIndexQuery':
+        if op not in _OPS:
+            raise MultiIndexException('invalid query op: {}'.format(op))
+        elif op in _COMPARISON_OPS and value is None:
+            raise MultiIndexException('cannot compare with None; use exists')
+        elif op in ['in', 'not in']:
+            value = frozenset(value)
+        return MultiIndexQuery(self.multi_index, self.conditions + ((path, op, value),), self.fields, self.max_results)
+
+    def select(self, fields: list) -> 'MultiIndexQuery':
+        return MultiIndexQuery(self.multi_index, self.conditions, list(fields), self.max_results)
+
+    def limit(self, max_results: int) -> 'MultiIndexQuery':
+        return MultiIndexQuery(self.multi_index, self.conditions, self.fields, max_results)
+
+    def all(self) -> list:
+        plan = self._plan()
+        records = self._execute(plan)
+        if self.fields is not None:
+            records = [{path: self._project(obj, path) for path in self.fields} for obj in records]
+        return records
+
+    def first(self) -> dict:
+        records = self.limit(1).all()
+        return records[0] if len(records) > 0 else None
+
+    def count(self) -> int:
+        return len(self._execute(self._plan()))
+
+    def explain(self) -> str:
+        """
+            Describes how the query would execute: the indices intersected
+            with their candidate counts, or a full scan, plus the filter
+            applied.
+        """
+
+        index_plans, row_ids, filter_conditions = self._plan()
+        if row_ids is None:
+            lines = ['scan {} records'.format(len(self.multi_index))]
+        else:
+            lines = ['{} index on "{}" ({} candidates)'.format(kind, condition[0], count) for condition, kind, count in index_plans]
+            if len(index_plans) > 1: lines.append('intersection ({} candidates)'.format(len(row_ids)))
+        if len(filter_conditions) > 0:
+            lines.append('filter: ' + ' and '.join(self._describe(c) for c in filter_conditions))
+        if self.max_results is not None:
+            lines.append('limit: {}'.format(self.max_results))
+        return '\n'.join(lines)
+
+    def _plan(self) -> tuple:
+        multi_index = self.multi_index
+
+        # collect candidates for each indexable condition
+        candidates = []
+        for condition in self.conditions:
+            candidate = self._index_candidates(multi_index, condition)
+            if candidate is not None: candidates.append((condition,) + candidate)
+        if len(candidates) == 0:
+            return [], None, list(self.conditions)
+
+        # intersect from the most selective index
+        candidates.sort(key=lambda c: len(c[2]))
+        index_plans, filter_conditions = [], []
+        row_ids = set(candidates[0][2])
+        for condition, kind, condition_row_ids, exact in candidates:
+            if condition is not candidates[0][0]: row_ids.intersection_update(condition_row_ids)
+            index_plans.append((condition, kind, len(condition_row_ids)))
+        for condition in self.conditions:
+            if not any(condition is c[0] and c[3] for c in candidates): filter_conditions.append(condition)
+        return index_plans, row_ids, filter_conditions
+
+    def _execute(self, plan: tuple) -> list:
+        _, row_ids, filter_conditions = plan
+        match = _compile_predicate(filter_conditions)
+        multi_index = self.multi_index
+
+        # generate candidate records
+        if row_ids is None:
+            candidates = iter(multi_index)
+        else:
+            candidates = (multi_index._fetch_record(row_id) for row_id in sorted(row_ids))
+
+        # filter candidates
+        records = []
+        for obj in candidates:
+            if match(obj):
+                records.append(obj)
+                if len(records) == self.max_results: break
+        return records
+
+    @staticmethod
+    def _index_candidates(multi_index: MultiIndex, condition: tuple) -> tuple:
+        path, op, value = condition
+
+        # unique and secondary index equality (hash lookups match True
+        # with 1, so numeric values are filtered again)
+        if op in ['==', 'in'] and (path in multi_index.secondary_tables or path in multi_index.index_keys):
+            values = [value] if op == '==' else value
+            row_ids = set()
+            for v in values: row_ids.update(multi_index._group_row_ids(path, v))
+            kind = 'secondary' if path in multi_index.secondary_tables else 'unique'
+            return kind, row_ids, not any(_is_numeric(v) for v in values)
+
+        # sorted index ranges
+        elif op in ['==', '<', '<=', '>', '>='] and path in multi_index.sorted_tables and _is_sortable(value):
+            sorted_table = multi_index._get_sorted_table(path)
+            start, end = 0, len(sorted_table)
+            if op in ['==', '>', '>=']: start = bisect.bisect_left(sorted_table, (value,))
+            if op in ['==', '<', '<=']: end = bisect.bisect_right(sorted_table, (value, math.inf))
+            return 'sorted', [row_id for _, row_id in sorted_table[start:end]], op in ['==', '<=', '>=']
+
+        else:
+            return None
+
+    @staticmethod
+    def _project(obj: dict, path: str) -> Any:
+        value = _resolve_path(obj, path)
+        return None if value is _MISSING else value
+
+    @staticmethod
+    def _describe(condition: tuple) -> str:
+        path, op, value = condition
+        if op == 'exists': return '{} exists'.format(path)
+        elif op in ['in', 'not in']: return '{} {} {}'.format(path, op, sorted(value, key=repr))
+        else: return '{} {} {!r}'.format(path, op, value)
+
+
+def _is_numeric(value: Any) -> bool:
+    return isinstance(value, (int, float))
+
+
+def _compile_predicate(conditions: list):
+    if len(conditions) == 0:
+        return lambda obj: True
+
+    # generate one conjunction over resolved field paths
+    namespace = {'_MISSING': _MISSING}
+    lines = ['def match(obj):', '    try:']
+    for i, (path, op, value) in enumerate(conditions):
+        namespace['c{}'.format(i)] = value
+        lines.append('        v = obj')
+        for key in path.split('.'):
+            lines.append('        v = v.get({!r}, _MISSING) if type(v) is dict else _MISSING'.format(key))
+        if op == 'exists':
+            lines.append('        if v is _MISSING or v is None: return False')
+
+        # keep booleans apart from numbers, like sorted index ranges
+        elif op in ['in', 'not in']:
+            namespace['b{}'.format(i)] = frozenset(x for x in value if type(x) is bool)
+            namespace['c{}'.format(i)] = frozenset(x for x in value if type(x) is not bool)
+            lines.append('        if v is _MISSING or v is None or {}((v in b{i}) if type(v) is bool else (v in c{i})): return False'.format(
+                '' if op == 'not in' else 'not ', i=i
+            ))
+        elif op == '!=' and _is_numeric(value):
+            lines.append('        if v is _MISSING or v is None or ((type(v) is bool) is {} and not (v != c{})): return False'.format(
+                type(value) is bool, i
+            ))
+        elif _is_numeric(value):
+            lines.append('        if v is _MISSING or v is None or (type(v) is bool) is not {} or not (v {} c{}): return False'.format(
+                type(value) is bool, op, i
+            ))
+        else:
+            lines.append('        if v is _MISSING or v is None or not (v {} c{}): return False'.format(op, i))
+    lines += ['        return True', '    except TypeError:', '        return False']
+
+    exec(compile('\n'.join(lines), '<multi-index query>', 'exec'), namespace)
+    return namespace['match']
@@ -0,0 +1,192 @@
+from typing import Iterator
+from collections import Counter
+import unicodedata
+import bisect
+import heapq
+import re
+
+from src.utils.mindex import MultiIndex, MultiIndexException, _MISSING
+
+
+_NON_ALNUM = re.compile('[^0-9a-z]+')
+
+# token match scores by kind
+_EXACT_SCORE = 1.0
+_PREFIX_SCORE = 0.9
+
+
+def normalize_name(name: str) -> str:
+    if not name.isascii():
+        name = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode('ascii')
+    name = name.lower().replace('&', ' and ').replace('\'', '')
+    return _NON_ALNUM.sub(' ', name).strip()
+
+
+def _trigrams(token: str) -> set:
+    token = '$' + token + '$'
+    return {token[i:i + 3] for i in range(len(token) - 2)}
+
+
+class NameSearchIndex(object):
+    """
+        Token-level search over a name field of a multi-index. Names are
+        normalized and tokenized; each token maps to the names containing
+        it. The token vocabulary is kept sorted, so the words sharing a
+        prefix form a contiguous range found with bisect (a flattened prefix
+        trie). A trigram table over the vocabulary handles misspellings.
+    """
+
+    def __init__(self, multi_index: MultiIndex, name_key: str,
+                 id_key: str=None,
+                 min_similarity: float=0.4):
+
+        self.multi_index = multi_index
+        self.name_key = name_key
+        self.id_key = id_key if id_key is not None else multi_index.default_index_key
+        self.min_similarity = min_similarity
+        if self.id_key not in multi_index.get_indices():
+            raise MultiIndexException('invalid index key; {}'.format(self.id_key))
+
+        # define name tables
+        self.doc_ids = []
+        self.doc_names = []
+        self.postings = {}
+
+        # tokenize names
+        postings, doc_ids, doc_names = self.postings, self.doc_ids, self.doc_names
+        for id_value, names in zip(multi_index._field_values(self.id_key), multi_index._field_values(name_key)):
+            if names is _MISSING or names is None: continue
+            elif isinstance(names, str): names = [names]
+            for name in names:
+                normalized_name = normalize_name(name)
+                if len(normalized_name) == 0: continue
+                doc_id = len(doc_names)
+                doc_ids.append(id_value)
+                doc_names.append(normalized_name)
+                for token in normalized_name.split(' '):
+                    posting = postings.get(token)
+                    if posting is None: postings[token] = [doc_id]
+                    elif posting[-1] != doc_id: posting.append(doc_id)
+
+        # build sorted vocabulary and trigram table
+        self.vocabulary = sorted(self.postings)
+        self.trigram_tables = {}
+        self.trigram_counts = []
+        for token_id, token in enumerate(self.vocabulary):
+            token_trigrams = _trigrams(token)
+            self.trigram_counts.append(len(token_trigrams))
+            for trigram in token_trigrams:
+                if trigram in self.trigram_tables: self.trigram_tables[trigram].append(token_id)
+                else: self.trigram_tables[trigram] = [token_id]
+
+    def __len__(self) -> int:
+        return len(self.doc_names)
+
+    def search(self, query: str, limit: int=10, fuzzy: bool=True) -> list:
+        """
+            Returns up to limit records whose names match every query
+            token, best first. The last token also matches as a prefix
+            (unless the query ends in whitespace) and, with fuzzy set,
+            unknown tokens match similarly spelled ones.
+        """
+
+        ids = [doc_id for doc_id, _ in self._search_ids(query, limit, fuzzy)]
+        return self.multi_index.get_many(self.id_key, ids)
+
+    def search_names(self, query: str, limit: int=10, fuzzy: bool=True) -> list:
+        """
+            Like search, but returns (id, normalized name, score) tuples
+            for the best matching name of each record.
+        """
+
+        return [(doc_id, self.doc_names[doc], score) for doc_id, (doc, score) in self._search_ids(query, limit, fuzzy)]
+
+    def prefix_tokens(self, prefix: str) -> Iterator[str]:
+        start = bisect.bisect_left(self.vocabulary, prefix)
+        end = bisect.bisect_left(self.vocabulary, prefix + '\x7f', start)
+        return iter(self.vocabulary[start:end])
+
+    def similar_tokens(self, token: str, limit: int=10) -> list:
+        """
+            Returns up to limit (token, similarity) pairs from the
+            vocabulary, by trigram jaccard similarity.
+        """
+
+        token_trigrams = _trigrams(token)
+        shared_counts = Counter()
+        for trigram in token_trigrams:
+            shared_counts.update(self.trigram_tables.get(trigram, ()))
+
+        # score candidates sharing any trigram
+        similar = []
+        for token_id, shared in shared_counts.items():
+            candidate = self.vocabulary[token_id]
+            similarity = shared / (len(token_trigrams) + self.trigram_counts[token_id] - shared)
+            if similarity >= self.min_similarity: similar.append((candidate, similarity))
+        return heapq.nlargest(limit, similar, key=lambda s: s[1])
+
+    def _search_ids(self, query: str, limit: int, fuzzy: bool) -> list:
+        tokens = normalize_name(query).split(' ')
+        if tokens == ['']: return []
+        prefix = None if query[-1:].isspace() else tokens.pop()
+
+        # match whole tokens, most selective first
+        token_scores = []
+        for token in tokens:
+            if token in self.postings:
+                token_scores.append({doc: _EXACT_SCORE for doc in self.postings[token]})
+            elif fuzzy:
+                scores = {}
+                for similar_token, similarity in self.similar_tokens(token):
+                    for doc in self.postings[similar_token]:
+                        if scores.get(doc, 0) < similarity: scores[doc] = similarity
+                token_scores.append(scores)
+            else:
+                return []
+        token_scores.sort(key=len)
+
+        # intersect candidate names
+        if len(token_scores) > 0:
+            doc_scores = token_scores[0]
+            for scores in token_scores[1:]:
+                doc_scores = {doc: score + scores[doc] for doc, score in doc_scores.items() if doc in scores}
+        else:
+            doc_scores = None
+
+        # match trailing prefix token
+        if prefix is not None:
+            if doc_scores is not None:
+                doc_scores = self._filter_prefix(doc_scores, prefix)
+            else:
+                doc_scores = self._match_prefix(prefix, limit)
+            if len(doc_scores) == 0 and fuzzy:
+                return self._search_ids(query + ' ', limit, fuzzy)
+
+        # rank names, keeping the best per record
+        ranked = sorted(doc_scores.items(), key=lambda d: (-d[1], len(self.doc_names[d[0]]), d[0]))
+        results = {}
+        for doc, score in ranked:
+            doc_id = self.doc_ids[doc]
+            if doc_id not in results: results[doc_id] = (doc, score)
+            if len(results) == limit: break
+        return list(results.items())
+
+    def _filter_prefix(self, doc_scores: dict, prefix: str) -> dict:
+        spaced_prefix = ' ' + prefix
+        filtered_scores = {}
+        for doc, score in doc_scores.items():
+            name = self.doc_names[doc]
+            if (' ' + name + ' ').find(spaced_prefix + ' ') >= 0: filtered_scores[doc] = score + _EXACT_SCORE
+            elif name.startswith(prefix) or spaced_prefix in name: filtered_scores[doc] = score + _PREFIX_SCORE
+        return filtered_scores
+
+    def _match_prefix(self, prefix: str, limit: int) -> dict:
+        doc_scores = {doc: _EXACT_SCORE for doc in self.postings.get(prefix, ())}
+
+        # collect prefix range until enough candidates
+        for token in self.prefix_tokens(prefix):
+            if len(doc_scores) >= limit * 100: break
+            elif token == prefix: continue
+            for doc in self.postings[token]:
+                if doc not in doc_scores: doc_scores[doc] = _PREFIX_SCORE
+        return doc_scores
@@ -0,0 +1,321 @@
+from typing import Any, Iterator
+import hashlib
+import pickle
+import struct
+import json
+import mmap
+import os
+
+from src.utils.mindex import MultiIndex, ColumnarMultiIndex, MultiIndexException, _MISSING
+
+
+# snapshot file layout (version 2, little-endian, sections 8-byte aligned):
+#
+# - header: magic, version, flags, row count, metadata offset/length
+# - string table: u64 offsets (count + 1) followed by a utf-8 blob
+# - blob table: u32 length-prefixed pickles for non-scalar values
+# - columns: one fixed-width (tag, payload) cell per row for each field
+# - index tables: open-addressing (hash, row id + 1) slots per unique key
+# - metadata: json describing fields, sections and index declarations
+SNAPSHOT_MAGIC = b'MVMINDEX'
+SNAPSHOT_VERSION = 2
+
+_HEADER = struct.Struct('<8sIIQQQ')
+_CELL = struct.Struct('<Bq')
+_SLOT = struct.Struct('<QQ')
+_OFFSETS = struct.Struct('<QQ')
+_BLOB_LENGTH = struct.Struct('<I')
+_DOUBLE = struct.Struct('<d')
+
+_TAG_MISSING = 0
+_TAG_NONE = 1
+_TAG_STR = 2
+_TAG_INT = 3
+_TAG_FLOAT = 4
+_TAG_TRUE = 5
+_TAG_FALSE = 6
+_TAG_BLOB = 7
+
+_INT64_MIN, _INT64_MAX = -2 ** 63, 2 ** 63 - 1
+
+
+def _hash_value(value: Any) -> int:
+
+    # hash equal numbers alike (booleans included, though lookups only
+    # match booleans with booleans)
+    if isinstance(value, bool) or (isinstance(value, float) and value.is_integer()): value = int(value)
+    if isinstance(value, str): key_bytes = b's' + value.encode('utf-8')
+    elif isinstance(value, int): key_bytes = b'i' + str(value).encode('ascii')
+    else: key_bytes = b'p' + pickle.dumps(value, protocol=4)
+    return int.from_bytes(hashlib.blake2b(key_bytes, digest_size=8).digest(), 'little')
+
+
+def _same_key(cell_value: Any, value: Any) -> bool:
+    return cell_value == value and (type(cell_value) is bool) == (type(value) is bool)
+
+
+def _align(buffer: bytearray) -> None:
+    buffer.extend(b'\x00' * (-len(buffer) % 8))
+
+
+class MultiIndexSnapshot(object):
+    """
+        Read-only, memory-mapped view of a multi-index snapshot file.
+        Opening a snapshot only parses its metadata; lookups hash into the
+        on-disk index tables and decode just the records they touch.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+        # map snapshot file
+        self.file = open(path, 'rb')
+        self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        # parse header
+        magic, version, _, row_count, meta_offset, meta_length = _HEADER.unpack_from(self.mm, 0)
+        if magic != SNAPSHOT_MAGIC:
+            raise MultiIndexException('invalid snapshot file: {}'.format(path))
+        elif version != SNAPSHOT_VERSION:
+            raise MultiIndexException('unsupported snapshot version: {}'.format(version))
+        self.row_count = row_count
+
+        # parse metadata
+        self.meta = json.loads(bytes(self.mm[meta_offset:meta_offset + meta_length]).decode('utf-8'))
+        self.index_keys = self.meta['index_keys']
+        self.default_index_key = self.meta['default_index_key']
+        self.safe_mode = self.meta['safe_mode']
+        self.fields = self.meta['fields']
+        self.column_offsets = self.meta['columns']
+        self.index_tables = self.meta['indices']
+        self.strings_offset = self.meta['strings']['offset']
+        self.blobs_offset = self.meta['blobs']['offset']
+
+    def __enter__(self) -> 'MultiIndexSnapshot':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self.row_count
+
+    def __iter__(self) -> Iterator[dict]:
+        return (self._decode_record(row_id) for row_id in range(self.row_count))
+
+    def __getitem__(self, item):
+        if isinstance(item, str):
+            if self.default_index_key is None:
+                raise MultiIndexException('default key must be specified for string indexing')
+            else:
+                return self.get(self.default_index_key, item)
+        elif isinstance(item, int):
+            return self._decode_record(range(self.row_count)[item])
+        elif isinstance(item, slice):
+            return [self._decode_record(row_id) for row_id in range(self.row_count)[item]]
+        else:
+            raise MultiIndexException('invalid index type')
+
+    @staticmethod
+    def write(multi_index: MultiIndex, path: str) -> None:
+        """
+            Writes a multi-index to a snapshot file, replacing any existing
+            file atomically.
+        """
+
+        rows = list(multi_index)
+        strings, blobs = {}, bytearray()
+
+        # collect fields in first-seen order
+        fields = {}
+        for obj in rows:
+            for k in obj.keys():
+                if k not in fields: fields[k] = None
+        fields = list(fields)
+
+        # encode columns
+        columns = {}
+        for field in fields:
+            column = bytearray(_CELL.size * len(rows))
+            for row_id, obj in enumerate(rows):
+                value = obj.get(field, _MISSING)
+                if value is _MISSING: tag, payload = _TAG_MISSING, 0
+                elif value is None: tag, payload = _TAG_NONE, 0
+                elif value is True: tag, payload = _TAG_TRUE, 0
+                elif value is False: tag, payload = _TAG_FALSE, 0
+                elif type(value) is str: tag, payload = _TAG_STR, strings.setdefault(value, len(strings))
+                elif type(value) is int and _INT64_MIN <= value <= _INT64_MAX: tag, payload = _TAG_INT, value
+                elif type(value) is float: tag, payload = _TAG_FLOAT, struct.unpack('<q', _DOUBLE.pack(value))[0]
+                else:
+                    tag, payload = _TAG_BLOB, len(blobs)
+                    blob = pickle.dumps(value, protocol=4)
+                    blobs.extend(_BLOB_LENGTH.pack(len(blob)))
+                    blobs.extend(blob)
+                _CELL.pack_into(column, row_id * _CELL.size, tag, payload)
+            columns[field] = column
+
+        # encode unique index hash tables
+        index_tables = {}
+        for index_key in multi_index.get_indices():
+            capacity = 8
+            while capacity < 2 * len(rows): capacity *= 2
+            table = bytearray(_SLOT.size * capacity)
+            for row_id, obj in enumerate(rows):
+                if index_key not in obj: continue
+                key_hash = _hash_value(obj[index_key])
+                slot = key_hash & (capacity - 1)
+                while _SLOT.unpack_from(table, slot * _SLOT.size)[1] != 0:
+                    slot = (slot + 1) & (capacity - 1)
+                _SLOT.pack_into(table, slot * _SLOT.size, key_hash, row_id + 1)
+            index_tables[index_key] = (capacity, table)
+
+        # lay out sections
+        buffer = bytearray(_HEADER.size)
+        _align(buffer)
+        meta = {
+            'class': type(multi_index).__name__,
+            'index_keys': multi_index.index_keys,
+            'default_index_key': multi_index.default_index_key,
+            'safe_mode': multi_index.safe_mode,
+            'secondary_index_keys': multi_index.secondary_index_keys,
+            'sorted_index_keys': multi_index.sorted_index_keys,
+            'fields': fields,
+            'columns': {},
+            'indices': {}
+        }
+
+        # write string table
+        meta['strings'] = {'offset': len(buffer), 'count': len(strings)}
+        encoded_strings = [s.encode('utf-8') for s in strings.keys()]
+        string_offset = 0
+        for encoded_string in encoded_strings:
+            buffer.extend(struct.pack('<Q', string_offset))
+            string_offset += len(encoded_string)
+        buffer.extend(struct.pack('<Q', string_offset))
+        for encoded_string in encoded_strings:
+            buffer.extend(encoded_string)
+        _align(buffer)
+
+        # write blob table
+        meta['blobs'] = {'offset': len(buffer), 'length': len(blobs)}
+        buffer.extend(blobs)
+        _align(buffer)
+
+        # write columns
+        for field, column in columns.items():
+            meta['columns'][field] = len(buffer)
+            buffer.extend(column)
+            _align(buffer)
+
+        # write index tables
+        for index_key, (capacity, table) in index_tables.items():
+            meta['indices'][index_key] = {'offset': len(buffer), 'capacity': capacity}
+            buffer.extend(table)
+
+        # write metadata and header
+        meta_bytes = json.dumps(meta).encode('utf-8')
+        meta_offset = len(buffer)
+        buffer.extend(meta_bytes)
+        _HEADER.pack_into(buffer, 0, SNAPSHOT_MAGIC, SNAPSHOT_VERSION, 0, len(rows), meta_offset, len(meta_bytes))
+
+        # replace file atomically
+        tmp_path = path + '.tmp'
+        f = open(tmp_path, 'wb')
+        f.write(buffer)
+        f.flush()
+        os.fsync(f.fileno())
+        f.close()
+        os.replace(tmp_path, path)
+
+    def close(self) -> None:
+        self.mm.close()
+        self.file.close()
+
+    def get(self, key: str, value: Any) -> dict:
+        if value is None:
+            return None
+        elif key not in self.index_keys:
+            raise MultiIndexException('invalid index key; {}'.format(key))
+
+        row_id = self._lookup_row_id(key, value)
+        if row_id is None:
+            if self.safe_mode: return None
+            else: raise MultiIndexException('index key value not found: \"{}:{}\"'.format(key, value))
+        else:
+            return self._decode_record(row_id)
+
+    def get_all(self) -> list:
+        return list(self)
+
+    def get_indices(self) -> list:
+        return self.index_keys
+
+    def get_all_key_values(self, key: str) -> list:
+        if key in self.index_keys:
+            key_values = []
+            for row_id in range(self.row_count):
+                value = self._decode_cell(key, row_id)
+                if value is _MISSING: raise KeyError(key)
+                else: key_values.append(value)
+            return key_values
+        else:
+            raise MultiIndexException('invalid index key')
+
+    def to_multi_index(self) -> MultiIndex:
+        """
+            Fully deserializes the snapshot into an in-memory multi-index
+            of the original class, rebuilding any declared secondary and
+            sorted indices.
+        """
+
+        if self.meta['class'] == ColumnarMultiIndex.__name__: cls = ColumnarMultiIndex
+        else: cls = MultiIndex
+        return cls.from_records(self, self.index_keys,
+            default_index_key=self.default_index_key,
+            safe_mode=self.safe_mode,
+            secondary_index_keys=self.meta['secondary_index_keys'],
+            sorted_index_keys=self.meta['sorted_index_keys'],
+            on_conflict='raise'
+        )
+
+    def _lookup_row_id(self, key: str, value: Any) -> int:
+        index_table = self.index_tables[key]
+        offset, capacity = index_table['offset'], index_table['capacity']
+
+        # probe slots until an empty one
+        key_hash = _hash_value(value)
+        slot = key_hash & (capacity - 1)
+        while True:
+            slot_hash, slot_row = _SLOT.unpack_from(self.mm, offset + slot * _SLOT.size)
+            if slot_row == 0:
+                return None
+            elif slot_hash == key_hash and _same_key(self._decode_cell(key, slot_row - 1), value):
+                return slot_row - 1
+            slot = (slot + 1) & (capacity - 1)
+
+    def _decode_record(self, row_id: int) -> dict:
+        obj = {}
+        for field in self.fields:
+            value = self._decode_cell(field, row_id)
+            if value is not _MISSING: obj[field] = value
+        return obj
+
+    def _decode_cell(self, field: str, row_id: int) -> Any:
+        tag, payload = _CELL.unpack_from(self.mm, self.column_offsets[field] + row_id * _CELL.size)
+        if tag == _TAG_STR: return self._decode_string(payload)
+        elif tag == _TAG_INT: return payload
+        elif tag == _TAG_FLOAT: return _DOUBLE.unpack(struct.pack('<q', payload))[0]
+        elif tag == _TAG_NONE: return None
+        elif tag == _TAG_TRUE: return True
+        elif tag == _TAG_FALSE: return False
+        elif tag == _TAG_BLOB:
+            offset = self.blobs_offset + payload
+            length, = _BLOB_LENGTH.unpack_from(self.mm, offset)
+            return pickle.loads(self.mm[offset + _BLOB_LENGTH.size:offset + _BLOB_LENGTH.size + length])
+        else:
+            return _MISSING
+
+    def _decode_string(self, string_id: int) -> str:
+        start, end = _OFFSETS.unpack_from(self.mm, self.strings_offset + string_id * 8)
+        data_offset = self.strings_offset + (self.meta['strings']['count'] + 1) * 8
+        return self.mm[data_offset + start:data_offset + end].decode('utf-8')
@@ -0,0 +1,215 @@
+from datetime import datetime, timezone, timedelta
+from time import sleep
+import threading
+import asyncio
+import pytest
+import json
+
+from src.api.base import BaseAPIConnector, reports_cache
+from src.cache.base import RevalidatedValue
+
+
+def write_json(path, obj: dict) -> str:
+    f = open(path, 'w')
+    json.dump(obj, f)
+    f.close()
+    return str(path)
+
+
+def build_connector(tmp_path, monkeypatch, cache_config: dict=None, http_config: dict=None) -> BaseAPIConnector:
+    monkeypatch.chdir(tmp_path)
+    credentials_file_path = write_json(tmp_path / 'credentials.json', {'api-key': 'key', 'api-domain': 'https://api.test/'})
+    cache_config_file_path = write_json(tmp_path / 'cache.json', {
+        'default': {
+            'memory-max-entries': 16,
+            'sqlite-enabled': True,
+            'sqlite-directory': str(tmp_path / 'sqlite'),
+            'redis-enabled': False,
+            'single-flight-memo-secs': 60
+        },
+        'TestAPIConnector': cache_config or {}
+    })
+    http_config_file_path = write_json(tmp_path / 'http.json', {
+        'default': {'max-concurrency': 4, 'max-throttle-retries': 1, 'rate-limits': {}},
+        'TestAPIConnector': http_config or {}
+    })
+    return BaseAPIConnector('TestAPIConnector', credentials_file_path, load_cache=False,
+                            cache_config_file_path=cache_config_file_path,
+                            http_config_file_path=http_config_file_path)
+
+
+def test_configured_soft_ttl_overrides_caller_expiry(tmp_path, monkeypatch):
+    connector = build_connector(tmp_path, monkeypatch, cache_config={
+        'revalidate': {'details': {'soft-ttl-secs': 60, 'hard-ttl-secs': 3600}}
+    })
+    start_dt = datetime.now(tz=timezone.utc)
+    connector._add_cache('details', 'all', {'a': 1}, expiry_delta=timedelta(days=7))
+    connector._add_cache('other', 'all', {'b': 2}, expiry_delta=timedelta(days=7))
+
+    entries = dict(connector.api_cache.memory_items())
+    details_entry, other_entry = entries[('details', 'all')], entries[('other', 'all')]
+    assert isinstance(details_entry.value, RevalidatedValue)
+    assert timedelta(seconds=59) < details_entry.value.stale_dt - start_dt < timedelta(seconds=61)
+    assert timedelta(seconds=3599) < details_entry.expiry_dt - start_dt < timedelta(seconds=3601)
+    assert other_entry.value == {'b': 2}
+    assert timedelta(days=7) - timedelta(seconds=1) < other_entry.expiry_dt - start_dt <= timedelta(days=7) + timedelta(seconds=1)
+
+
+def test_pending_misses_are_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr('src.api.base.MAX_PENDING_MISSES', 4)
+    connector = build_connector(tmp_path, monkeypatch)
+    for i in range(10):
+        assert connector._get_cache('details', str(i)) is None
+    assert list(connector.cache_miss_times) == [('details', str(i)) for i in range(6, 10)]
+
+    connector._add_cache('details', '9', {'a': 1})
+    stats = connector.get_cache_stats()['details']
+    assert (stats['misses'], stats['adds']) == (10, 1)
+    assert stats['last_fetch_secs'] is not None
+    assert stats['last_entry_bytes'] > 0
+    assert ('details', '9') not in connector.cache_miss_times
+
+
+class FakeResponse:
+
+    def __init__(self, status_code: int, content: bytes=b'', headers: dict=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+    def raise_for_status(self) -> None:
+        pass
+
+
+def test_conditional_get_counts_not_modified_from_threads(tmp_path, monkeypatch):
+    connector = build_connector(tmp_path, monkeypatch)
+    url = 'https://data.test/tickers.json'
+    connector._add_conditional_cache('tickers', url, FakeResponse(200, b'x' * 10, {'ETag': '"v1"'}), {'a': 1},
+                                     expiry_delta=timedelta(days=1))
+    sent_headers = []
+
+    def http_get(request_url, headers=None):
+        sent_headers.append(headers)
+        return FakeResponse(304)
+
+    connector._http_get = http_get
+    threads = [threading.Thread(target=connector._conditional_get, args=('tickers', url),
+                                kwargs={'expiry_delta': timedelta(days=1)}) for _ in range(8)]
+    for thread in threads: thread.start()
+    for thread in threads: thread.join()
+
+    assert all(headers['If-None-Match'] == '"v1"' for headers in sent_headers)
+    assert connector.get_conditional_stats()['tickers'] == {'requests': 8, 'not_modified': 8, 'bytes_saved': 80}
+    assert connector._conditional_get('tickers', url, expiry_delta=timedelta(days=1))[1] == {'a': 1}
+
+
+def run_joined_flights(connector: BaseAPIConnector, call, joiners: int=4) -> list:
+    outcomes = []
+
+    def join_flight():
+        try:
+            outcomes.append(connector._single_flight(('details',), call))
+        except Exception as e:
+            outcomes.append(e)
+
+    threads = [threading.Thread(target=join_flight) for _ in range(joiners)]
+    for thread in threads: thread.start()
+    for thread in threads: thread.join()
+    return outcomes
+
+
+def test_single_flight_shares_leader_exception(tmp_path, monkeypatch):
+    connector = build_connector(tmp_path, monkeypatch)
+    calls = []
+
+    def fail():
+        calls.append(1)
+        sleep(0.1)
+        raise ValueError('fetch failed')
+
+    outcomes = run_joined_flights(connector, fail)
+    assert len(calls) == 1
+    assert all(isinstance(outcome, ValueError) for outcome in outcomes)
+    assert connector._single_flight(('details',), lambda: {'a': 1}) == {'a': 1}
+
+
+def test_single_flight_joiners_get_copies(tmp_path, monkeypatch):
+    connector = build_connector(tmp_path, monkeypatch)
+
+    def fetch():
+        sleep(0.1)
+        return {'a': 1}
+
+    outcomes = run_joined_flights(connector, fetch)
+    outcomes[0]['b'] = 2
+    assert all(outcome == {'a': 1} for outcome in outcomes[1:])
+    assert connector._single_flight(('details',), fetch) == {'a': 1}
+
+
+def test_map_concurrently_keeps_order_inside_running_loop(tmp_path, monkeypatch):
+    connector = build_connector(tmp_path, monkeypatch)
+
+    def fetch(item):
+        sleep(0.01 * (5 - item))
+        return item * 2
+
+    async def map_in_loop():
+        return connector._map_concurrently(fetch, list(range(5)))
+
+    assert connector.max_concurrency == 4
+    assert asyncio.run(map_in_loop()) == [0, 2, 4, 6, 8]
+
+
+class FakeLoader:
+
+    def __init__(self, connector: BaseAPIConnector):
+        self.name = 'FakeLoader'
+        self.logger = connector.logger
+        self.connector = connector
+
+    @reports_cache
+    def update(self) -> bool:
+        self.connector._get_cache('details', 'all')
+        raise ValueError('update failed')
+
+
+def test_reports_cache_saves_report_after_failed_update(tmp_path, monkeypatch):
+    loader = FakeLoader(build_connector(tmp_path, monkeypatch))
+    with pytest.raises(ValueError):
+        loader.update()
+
+    report_paths = list((tmp_path / 'reports' / 'cache').glob('FakeLoader_*.json'))
+    assert len(report_paths) == 1
+    report = json.loads(report_paths[0].read_text())
+    assert report['connectors']['TestAPIConnector']['cache']['details']['misses'] == 1
+
+
+def test_connectors_share_pooled_sessions_by_config(tmp_path, monkeypatch):
+    connector = build_connector(tmp_path, monkeypatch, http_config={'pool-maxsize': 48, 'read-timeout-secs': 30})
+    same_connector = build_connector(tmp_path, monkeypatch, http_config={'pool-maxsize': 48})
+    other_connector = build_connector(tmp_path, monkeypatch, http_config={'pool-maxsize': 8})
+
+    assert connector.http_session is same_connector.http_session
+    assert connector.http_session is not other_connector.http_session
+    adapter = connector.http_session.get_adapter('https://api.test/')
+    assert adapter is connector.http_session.get_adapter('http://api.test/')
+    assert adapter._pool_maxsize == 48
+    assert other_connector.http_session.get_adapter('https://api.test/')._pool_maxsize == 8
+    assert connector.http_timeout == (None, 30)
+
+
+def test_http_requests_use_the_session_timeout(tmp_path, monkeypatch):
+    connector = build_connector(tmp_path, monkeypatch, http_config={'connect-timeout-secs': 5, 'read-timeout-secs': 60})
+    requests_sent = []
+
+    def request(method, url, **kwargs):
+        requests_sent.append((method, url, kwargs))
+        return FakeResponse(200)
+
+    monkeypatch.setattr(connector.http_session, 'request', request)
+    connector._http_get('https://api.test/a', params={'page': 1})
+    connector._http_post('https://api.test/b', timeout=1)
+    assert requests_sent == [
+        ('GET', 'https://api.test/a', {'params': {'page': 1}, 'timeout': (5, 60)}),
+        ('POST', 'https://api.test/b', {'timeout': 1})
+    ]
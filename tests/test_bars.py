@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from src.storage.bars import BarStore, BAR_COLUMNS, to_epoch_days
+
+
+def build_bars(dates: list, close: float) -> dict:
+    bars = {'date': np.array(dates, dtype='int64')}
+    for name, dtype in BAR_COLUMNS[1:]:
+        bars[name] = np.full(len(dates), close, dtype=dtype)
+    bars['close'] = np.array([close + d for d in dates], dtype='float64')
+    return bars
+
+
+def read_closes(bar_store: BarStore, ticker: str) -> dict:
+    arrays = bar_store.read(ticker, ['date', 'close'])
+    assert all(len(values) == len(arrays['date']) for values in arrays.values())
+    return dict(zip(arrays['date'].tolist(), arrays['close'].tolist()))
+
+
+def test_append_strictly_newer_bars(tmp_path):
+    bar_store = BarStore(str(tmp_path))
+    assert bar_store.append('A', build_bars([1, 2, 3], 100)) == 3
+    assert bar_store.append('A', build_bars([4, 5], 200)) == 2
+
+    assert read_closes(bar_store, 'A') == {1: 101, 2: 102, 3: 103, 4: 204, 5: 205}
+    assert bar_store.get_row_count('A') == 5
+    assert list(bar_store.read_frame('A')['close']) == [101, 102, 103, 204, 205]
+
+
+def test_append_merges_overlapping_tail(tmp_path):
+    bar_store = BarStore(str(tmp_path))
+    bar_store.append('A', build_bars([1, 2, 4, 6], 100))
+
+    # new bars replace shared dates, fill gaps and keep stored dates they miss
+    assert bar_store.append('A', build_bars([2, 3, 6, 7], 200)) == 5
+    assert read_closes(bar_store, 'A') == {1: 101, 2: 202, 3: 203, 4: 104, 6: 206, 7: 207}
+    assert [to_epoch_days(d) for d in bar_store.read_frame('A').index] == [1, 2, 3, 4, 6, 7]
+
+    with pytest.raises(Exception):
+        bar_store.append('A', build_bars([9, 8], 300))
+
+
+def test_torn_append_keeps_committed_rows_aligned(tmp_path, monkeypatch):
+    bar_store = BarStore(str(tmp_path))
+    bar_store.append('A', build_bars([1, 2, 3, 4], 100))
+
+    # fail after rewriting some data columns of the overlapping tail
+    write_rows = bar_store._write_rows
+    def failing_write_rows(ticker, name, offset, values):
+        if name == 'volume': raise IOError('disk full')
+        write_rows(ticker, name, offset, values)
+    monkeypatch.setattr(bar_store, '_write_rows', failing_write_rows)
+    with pytest.raises(IOError):
+        bar_store.append('A', build_bars([2, 5], 200))
+
+    assert read_closes(bar_store, 'A') == {1: 101}
+    monkeypatch.setattr(bar_store, '_write_rows', write_rows)
+    bar_store.append('A', build_bars([2, 3, 4], 100))
+    assert read_closes(bar_store, 'A') == {1: 101, 2: 102, 3: 103, 4: 104}
@@ -0,0 +1,86 @@
+from datetime import datetime, timezone, timedelta
+from time import sleep
+import pickle
+
+from src.cache.base import CacheEntry
+from src.cache.memory import MemoryCacheTier
+from src.cache.sqlite import SqliteCacheTier
+from src.cache.tiered import TieredCache
+
+
+def test_memory_only_tier_skips_sizing_without_byte_bound():
+    cache = TieredCache([MemoryCacheTier(max_entries=4)])
+    entry = cache.add(('details', 'a'), {'a': 1})
+    assert entry.size is None
+    assert cache.get(('details', 'a')) == {'a': 1}
+    cache.pop(('details', 'a'))
+    assert cache.tiers[0].total_bytes == 0
+
+
+def test_memory_tier_sizes_entries_against_byte_bound():
+    value = list(range(100))
+    cache = TieredCache([MemoryCacheTier(max_bytes=10 * len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)))])
+    entry = cache.add(('details', 'a'), value)
+    assert entry.size == len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    assert cache.tiers[0].total_bytes == entry.size
+    assert cache.add(('details', 'b'), list(range(10000))).size > cache.tiers[0].max_bytes
+    assert cache.get(('details', 'b')) is None
+
+
+def test_write_through_tier_size_is_reused(tmp_path):
+    cache = TieredCache([MemoryCacheTier(max_entries=4), SqliteCacheTier(str(tmp_path / 'cache.sqlite'))])
+    entry = cache.add(('details', 'a'), {'a': 1})
+    assert entry.size == len(pickle.dumps({'a': 1}, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def test_sqlite_tier_persists_entries_across_opens(tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    expiry_dt = datetime.now(tz=timezone.utc) + timedelta(days=1)
+    cache = TieredCache([MemoryCacheTier(max_entries=4), SqliteCacheTier(path)])
+    cache.add(('details', 'a'), {'a': 1}, expiry_dt)
+    cache.add(('details', 'b'), {'b': 2})
+    cache.tiers[1].close()
+
+    reopened_cache = TieredCache([MemoryCacheTier(max_entries=4), SqliteCacheTier(path)])
+    assert len(reopened_cache.tiers[0]) == 0
+    assert reopened_cache.lookup(('details', 'a')) == ({'a': 1}, 'hit')
+    assert len(reopened_cache.tiers[0]) == 1
+    assert abs((reopened_cache.tiers[1].get(('details', 'a')).expiry_dt - expiry_dt).total_seconds()) < 1e-3
+    reopened_cache.tiers[1].close()
+
+    cleared_tier = SqliteCacheTier(path, load=False)
+    assert len(cleared_tier) == 0
+    cleared_tier.close()
+
+
+def test_sqlite_tier_evicts_least_recently_read(tmp_path):
+    value_bytes = len(pickle.dumps('x' * 100, protocol=pickle.HIGHEST_PROTOCOL))
+    tier = SqliteCacheTier(str(tmp_path / 'cache.sqlite'), max_bytes=2 * value_bytes)
+    assert tier.set(('details', 'a'), CacheEntry('x' * 100)) == []
+    assert tier.set(('details', 'b'), CacheEntry('x' * 100)) == []
+    sleep(0.01)
+    tier.get(('details', 'a'))
+
+    evicted = tier.set(('details', 'c'), CacheEntry('x' * 100))
+    assert [key for key, _ in evicted] == [('details', 'b')]
+    assert tier.get(('details', 'a')).value == 'x' * 100
+
+    # oversized entries are passed straight through
+    oversized_entry = CacheEntry('x' * 1000)
+    assert tier.set(('details', 'd'), oversized_entry) == [(('details', 'd'), oversized_entry)]
+    assert tier.get(('details', 'd')) is None
+    tier.close()
+
+
+def test_sqlite_tier_sweeps_expired_entries(tmp_path):
+    tier = SqliteCacheTier(str(tmp_path / 'cache.sqlite'))
+    current_dt = datetime.now(tz=timezone.utc)
+    tier.set(('details', 'a'), CacheEntry(1, current_dt - timedelta(seconds=1)))
+    tier.set(('details', 'b'), CacheEntry(2, current_dt + timedelta(days=1)))
+    tier.set(('details', 'c'), CacheEntry(3))
+
+    assert tier.sweep(current_dt) == 1
+    assert sorted(key for key, _ in tier.items()) == [('details', 'b'), ('details', 'c')]
+    assert tier.pop(('details', 'b')).size == len(pickle.dumps(2, protocol=pickle.HIGHEST_PROTOCOL))
+    assert tier.pop(('details', 'b')) is None
+    tier.close()
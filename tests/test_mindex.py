@@ -0,0 +1,257 @@
+import threading
+import pickle
+import pytest
+
+from src.utils.mindex import MultiIndex, ColumnarMultiIndex, ConcurrentMultiIndex, MultiIndexException
+
+
+def build_index() -> MultiIndex:
+    multi_index = MultiIndex(['ticker'], default_index_key='ticker',
+                             secondary_index_keys=['sector'], sorted_index_keys=['dividend_yield'])
+    multi_index.insert({'ticker': 'A', 'sector': 'energy', 'dividend_yield': 0.03})
+    multi_index.insert({'ticker': 'B', 'sector': 'energy', 'dividend_yield': 0.01})
+    multi_index.insert({'ticker': 'C', 'sector': 'utilities', 'dividend_yield': 0.02})
+    return multi_index
+
+
+def test_remove_after_mutating_returned_record():
+    multi_index = build_index()
+    record = multi_index['A']
+    record['sector'] = 'utilities'
+    record['dividend_yield'] = None
+    multi_index.remove('ticker', 'A')
+
+    assert [r['ticker'] for r in multi_index.get_range('dividend_yield')] == ['B', 'C']
+    assert [r['ticker'] for r in multi_index.get_group('sector', 'energy')] == ['B']
+    assert [r['ticker'] for r in multi_index.get_group('sector', 'utilities')] == ['C']
+
+
+def test_legacy_pickle_rebuilds_indexed_values():
+    multi_index = build_index()
+    state = dict(multi_index.__dict__)
+    state.pop('indexed_values')
+    legacy_index = MultiIndex.__new__(MultiIndex)
+    legacy_index.__setstate__(pickle.loads(pickle.dumps(state)))
+    legacy_index['C']['dividend_yield'] = 0.05
+    legacy_index.remove('ticker', 'C')
+
+    assert [r['ticker'] for r in legacy_index.get_range('dividend_yield')] == ['B', 'A']
+
+
+def test_apply_delta_rebuilds_newer_version():
+    old_index, new_index = build_index(), build_index()
+    new_index.remove('ticker', 'B')
+    new_index.remove('ticker', 'C')
+    new_index.insert({'ticker': 'C', 'sector': 'energy', 'dividend_yield': 0.04})
+    new_index.insert({'ticker': 'D', 'sector': 'utilities', 'dividend_yield': 0.05})
+
+    delta = MultiIndex.diff(old_index, new_index)
+    assert sorted(delta['added']) == ['D']
+    assert sorted(delta['removed']) == ['B']
+    assert sorted(delta['changed']) == ['C']
+
+    old_index.apply_delta(delta)
+    assert [r['ticker'] for r in old_index] == ['A', 'C', 'D']
+    assert [r['ticker'] for r in old_index.get_group('sector', 'energy')] == ['A', 'C']
+    assert [r['ticker'] for r in old_index.get_range('dividend_yield')] == ['A', 'C', 'D']
+
+
+def test_concurrent_snapshot_is_read_only():
+    concurrent_index = ConcurrentMultiIndex(build_index())
+    snapshot = concurrent_index.snapshot()
+    with pytest.raises(MultiIndexException):
+        snapshot.insert({'ticker': 'D', 'sector': 'energy', 'dividend_yield': 0.04})
+    with pytest.raises(MultiIndexException):
+        snapshot.remove('ticker', 'A')
+
+    multi_index = snapshot.copy()
+    multi_index.insert({'ticker': 'D', 'sector': 'energy', 'dividend_yield': 0.04})
+    assert len(multi_index) == 4
+    assert len(concurrent_index) == 3
+
+
+def test_concurrent_readers_see_consistent_snapshots_during_writes():
+    concurrent_index = ConcurrentMultiIndex(build_index())
+    writing = threading.Event()
+    writing.set()
+    errors = []
+
+    def write():
+        for i in range(200):
+            with concurrent_index.batch() as multi_index:
+                multi_index.insert({'ticker': 'X{}'.format(i), 'sector': 'energy', 'dividend_yield': i / 1000})
+                if i % 2 == 0: multi_index.remove('ticker', 'X{}'.format(i))
+        writing.clear()
+
+    def read():
+        while writing.is_set():
+            snapshot = concurrent_index.snapshot()
+            tickers = sorted(r['ticker'] for r in snapshot.get_all())
+            if sorted(r['ticker'] for r in snapshot.get_range('dividend_yield')) != tickers:
+                errors.append('sorted index out of step')
+            group_count = len(snapshot.get_group('sector', 'energy')) + len(snapshot.get_group('sector', 'utilities'))
+            if len(snapshot) != len(tickers) or group_count != len(tickers):
+                errors.append('secondary index out of step')
+
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    writer = threading.Thread(target=write)
+    for thread in readers: thread.start()
+    writer.start()
+    writer.join()
+    for thread in readers: thread.join()
+
+    assert errors == []
+    assert len(concurrent_index) == 103
+    assert concurrent_index.get('ticker', 'X199')['dividend_yield'] == 0.199
+    with pytest.raises(MultiIndexException):
+        concurrent_index.get('ticker', 'X198')
+
+
+def test_iteration_is_reentrant_and_skips_removed_records():
+    multi_index = build_index()
+    pairs = [(a['ticker'], b['ticker']) for a in multi_index for b in multi_index]
+    assert len(pairs) == 9
+    assert pairs[:3] == [('A', 'A'), ('A', 'B'), ('A', 'C')]
+
+    multi_index.remove('ticker', 'B')
+    assert [r['ticker'] for r in multi_index] == ['A', 'C']
+    assert [r['ticker'] for r in multi_index] == ['A', 'C']
+
+
+def test_positional_access_follows_insertion_order():
+    multi_index = build_index()
+    multi_index.remove('ticker', 'A')
+    multi_index.insert({'ticker': 'D', 'sector': 'energy', 'dividend_yield': 0.04})
+
+    assert multi_index[0]['ticker'] == 'B'
+    assert multi_index[-1]['ticker'] == 'D'
+    assert [r['ticker'] for r in multi_index[1:]] == ['C', 'D']
+    assert [r['ticker'] for r in multi_index[::-1]] == ['D', 'C', 'B']
+    assert multi_index['C']['sector'] == 'utilities'
+    with pytest.raises(IndexError):
+        multi_index[3]
+    with pytest.raises(MultiIndexException):
+        multi_index[1.0]
+
+
+def build_records(count: int) -> list:
+    return [{'ticker': 'T{}'.format(i), 'cik': str(1000 + i), 'sector': ['energy', 'utilities'][i % 2],
+             'name': 'Company {}'.format(i)} for i in range(count)]
+
+
+def test_columnar_index_matches_dict_index():
+    dict_index = MultiIndex(['ticker', 'cik'], default_index_key='ticker', secondary_index_keys=['sector'])
+    columnar_index = ColumnarMultiIndex(['ticker', 'cik'], default_index_key='ticker', secondary_index_keys=['sector'])
+    for obj in build_records(6):
+        dict_index.insert(obj)
+        columnar_index.insert(obj)
+    dict_index.remove('cik', '1002')
+    columnar_index.remove('cik', '1002')
+    columnar_index.insert({'ticker': 'X', 'cik': '2000', 'exchange': 'XNYS'})
+
+    assert columnar_index.get('ticker', 'T3') == dict_index.get('ticker', 'T3')
+    assert columnar_index.get('cik', '1005') == dict_index.get('cik', '1005')
+    assert list(columnar_index)[:-1] == list(dict_index)
+    assert columnar_index['X'] == {'ticker': 'X', 'cik': '2000', 'exchange': 'XNYS'}
+    assert columnar_index.get_all_key_values('ticker') == dict_index.get_all_key_values('ticker') + ['X']
+    assert [r['ticker'] for r in columnar_index.get_group('sector', 'energy')] == ['T0', 'T4']
+    with pytest.raises(MultiIndexException):
+        columnar_index.get('ticker', 'T2')
+    with pytest.raises(MultiIndexException):
+        columnar_index.insert({'ticker': 'T1', 'cik': '3000'})
+
+
+def test_columnar_records_are_materialized_copies():
+    records = build_records(4)
+    for obj in records: obj['sector'] = ''.join(['ener', 'gy'])
+    columnar_index = ColumnarMultiIndex.from_records(records, ['ticker'], default_index_key='ticker')
+    record = columnar_index['T1']
+    record['name'] = 'Renamed'
+    assert columnar_index['T1']['name'] == 'Company 1'
+
+    # equal strings are stored once
+    assert records[0]['sector'] is not records[1]['sector']
+    assert columnar_index.columns['sector'][0] is columnar_index.columns['sector'][1]
+
+
+def test_columnar_index_uses_less_memory():
+    records = build_records(2000)
+    dict_index = MultiIndex.from_records(records, ['ticker', 'cik'], default_index_key='ticker')
+    columnar_index = ColumnarMultiIndex.from_records(records, ['ticker', 'cik'], default_index_key='ticker')
+    assert len(columnar_index) == len(dict_index) == 2000
+    assert columnar_index.memory_usage() < dict_index.memory_usage()
+
+
+CONFLICT_RECORDS = [
+    {'ticker': 'A', 'cik': '1', 'name': 'first A'},
+    {'ticker': 'B', 'cik': '2'},
+    {'ticker': 'A', 'cik': '3', 'name': 'second A'},
+    {'cik': '4'},
+    {'ticker': 'C', 'cik': '2'}
+]
+
+
+@pytest.mark.parametrize('index_keys', [['ticker'], ['ticker', 'cik']])
+def test_from_records_first_and_last_keep_one_record(index_keys):
+    first_index, first_skipped = MultiIndex.from_records(CONFLICT_RECORDS, index_keys, default_index_key='ticker',
+                                                         on_conflict='first', return_skipped=True)
+    last_index, last_skipped = MultiIndex.from_records(CONFLICT_RECORDS, index_keys, default_index_key='ticker',
+                                                       on_conflict='last', return_skipped=True)
+
+    assert first_index['A']['name'] == 'first A'
+    assert last_index['A']['name'] == 'second A'
+    assert [s[0] for s in first_skipped] == ([2, 3] if len(index_keys) == 1 else [2, 3, 4])
+    assert [s[0] for s in last_skipped] == ([0, 3] if len(index_keys) == 1 else [0, 1, 3])
+    assert all(s[1] is CONFLICT_RECORDS[s[0]] for s in first_skipped + last_skipped)
+    assert dict((s[0], s[2]) for s in first_skipped)[3] == 'missing index key'
+
+
+@pytest.mark.parametrize('index_keys', [['ticker'], ['ticker', 'cik']])
+def test_from_records_skip_drops_every_colliding_record(index_keys):
+    multi_index, skipped = MultiIndex.from_records(CONFLICT_RECORDS, index_keys, default_index_key='ticker',
+                                                   on_conflict='skip', return_skipped=True)
+
+    assert [r['ticker'] for r in multi_index] == (['B', 'C'] if len(index_keys) == 1 else [])
+    assert [s[0] for s in skipped] == ([0, 2, 3] if len(index_keys) == 1 else [0, 1, 2, 3, 4])
+
+
+@pytest.mark.parametrize('index_keys', [['ticker'], ['ticker', 'cik']])
+def test_from_records_raise_and_invalid_policy(index_keys):
+    with pytest.raises(MultiIndexException):
+        MultiIndex.from_records(CONFLICT_RECORDS, index_keys, on_conflict='raise')
+    with pytest.raises(MultiIndexException):
+        MultiIndex.from_records(CONFLICT_RECORDS, index_keys, on_conflict='merge')
+    multi_index = MultiIndex.from_records(CONFLICT_RECORDS[:2], index_keys, on_conflict='raise')
+    assert multi_index.get_all_key_values('ticker') == ['A', 'B']
+
+
+def test_get_many_returns_records_in_value_order():
+    multi_index = build_index()
+    assert [r['ticker'] for r in multi_index.get_many('ticker', ['C', 'A'])] == ['C', 'A']
+    assert multi_index.get_many('ticker', iter(['B', None])) == [multi_index['B'], None]
+    with pytest.raises(MultiIndexException):
+        multi_index.get_many('ticker', ['A', 'Z'])
+    with pytest.raises(MultiIndexException):
+        multi_index.get_many('sector', ['energy'])
+
+    safe_index = MultiIndex.from_records(list(build_index()), ['ticker'], default_index_key='ticker', safe_mode=True)
+    assert [r and r['ticker'] for r in safe_index.get_many('ticker', ['A', 'Z'])] == ['A', None]
+
+
+def test_join_pairs_records_by_nested_key():
+    companies = MultiIndex(['cik'], default_index_key='cik')
+    companies.insert({'cik': '1', 'name': 'Alpha'})
+    companies.insert({'cik': '3', 'name': 'Gamma'})
+    tickers = MultiIndex(['ticker'], default_index_key='ticker')
+    tickers.insert({'ticker': 'A', 'ids': {'cik': '1'}})
+    tickers.insert({'ticker': 'B', 'ids': {'cik': '2'}})
+    tickers.insert({'ticker': 'C', 'ids': {}})
+
+    left_pairs = tickers.join(companies, 'ids.cik', 'cik')
+    assert [(l['ticker'], r and r['name']) for l, r in left_pairs] == [('A', 'Alpha'), ('B', None), ('C', None)]
+    inner_pairs = tickers.join(companies, 'ids.cik', 'cik', how='inner')
+    assert [(l['ticker'], r['name']) for l, r in inner_pairs] == [('A', 'Alpha')]
+    with pytest.raises(MultiIndexException):
+        tickers.join(companies, 'ids.cik', 'cik', how='outer')
+    with pytest.raises(MultiIndexException):
+        tickers.join(companies, 'ids.cik', 'name')
@@ -0,0 +1,65 @@
+from src.utils.mindex import MultiIndex
+
+
+RECORDS = [
+    {'ticker': 'A', 'score': 1},
+    {'ticker': 'B', 'score': True},
+    {'ticker': 'C', 'score': 2.5},
+    {'ticker': 'D', 'score': False},
+    {'ticker': 'E', 'score': 0}
+]
+
+QUERIES = [
+    ('==', 1), ('==', True), ('==', 0), ('==', False), ('!=', 1), ('!=', True),
+    ('in', [1]), ('in', [True]), ('in', [True, 0]), ('not in', [1, False])
+]
+
+
+def build_index(records: list, index_keys: list=None, secondary_index_keys: list=None,
+                sorted_index_keys: list=None) -> MultiIndex:
+    multi_index = MultiIndex(['ticker'] + (index_keys or []), default_index_key='ticker',
+                             secondary_index_keys=secondary_index_keys, sorted_index_keys=sorted_index_keys)
+    for record in records:
+        multi_index.insert(dict(record))
+    return multi_index
+
+
+def query_tickers(multi_index: MultiIndex, op: str, value) -> list:
+    return [record['ticker'] for record in multi_index.where('score', op, value).all()]
+
+
+def test_sorted_range_and_scan_agree_on_bools():
+    sorted_index, unsorted_index = build_index(RECORDS, sorted_index_keys=['score']), build_index(RECORDS)
+    for op in ['==', '<', '<=', '>', '>=']:
+        assert 'sorted' in sorted_index.where('score', op, 1).explain()
+        for value in [0, 1, 2.5]:
+            assert query_tickers(sorted_index, op, value) == query_tickers(unsorted_index, op, value)
+
+    assert query_tickers(unsorted_index, '>=', 1) == ['A', 'C']
+    assert query_tickers(unsorted_index, '==', 0) == ['E']
+    assert query_tickers(unsorted_index, '!=', 1) == ['B', 'C', 'D', 'E']
+
+
+def test_secondary_index_and_scan_agree_on_bools():
+    secondary_index, unsorted_index = build_index(RECORDS, secondary_index_keys=['score']), build_index(RECORDS)
+    for op, value in QUERIES:
+        assert query_tickers(secondary_index, op, value) == query_tickers(unsorted_index, op, value)
+    assert 'secondary' in secondary_index.where('score', '==', 1).explain()
+
+    assert query_tickers(secondary_index, '==', 1) == ['A']
+    assert query_tickers(secondary_index, '==', True) == ['B']
+    assert query_tickers(secondary_index, 'in', [1]) == ['A']
+    assert query_tickers(secondary_index, 'in', [True, 0]) == ['B', 'E']
+    assert query_tickers(secondary_index, 'not in', [1, False]) == ['B', 'C', 'E']
+
+
+def test_unique_index_and_scan_agree_on_bools():
+    records = [{'ticker': 'A', 'score': 1}, {'ticker': 'B', 'score': False}, {'ticker': 'C', 'score': 2.5}]
+    unique_index, unsorted_index = build_index(records, index_keys=['score']), build_index(records)
+    for op, value in QUERIES:
+        assert query_tickers(unique_index, op, value) == query_tickers(unsorted_index, op, value)
+    assert 'unique' in unique_index.where('score', '==', True).explain()
+
+    assert query_tickers(unique_index, '==', True) == []
+    assert query_tickers(unique_index, '==', 0) == []
+    assert query_tickers(unique_index, 'in', [True, 2.5]) == ['C']
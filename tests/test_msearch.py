@@ -0,0 +1,20 @@
+from src.utils.mindex import MultiIndex
+from src.utils.msearch import NameSearchIndex
+
+
+def build_search_index(names: list) -> NameSearchIndex:
+    multi_index = MultiIndex(['ticker'], default_index_key='ticker')
+    for i, name in enumerate(names):
+        multi_index.insert({'ticker': 'T{}'.format(i), 'name': name})
+    return NameSearchIndex(multi_index, 'name')
+
+
+def test_similar_tokens_use_candidate_trigram_count():
+    search_index = build_search_index(['Aaaa Holdings', 'Banana Corp'])
+
+    # repeated trigrams are counted once on both sides of the jaccard
+    assert search_index.similar_tokens('aaaa') == [('aaaa', 1.0)]
+    assert search_index.similar_tokens('banana') == [('banana', 1.0)]
+    similar = dict(search_index.similar_tokens('aaa'))
+    assert similar['aaaa'] == 1.0
+    assert [r['ticker'] for r in search_index.search('aaaa holdngs', fuzzy=True)] == ['T0']
@@ -0,0 +1,22 @@
+from src.utils.mindex import MultiIndex
+from src.utils.msnapshot import MultiIndexSnapshot
+
+
+def test_numeric_keys_match_in_memory_lookups(tmp_path):
+    multi_index = MultiIndex(['name', 'c'], default_index_key='name', safe_mode=True)
+    multi_index.insert({'name': 'int', 'c': 1})
+    multi_index.insert({'name': 'float', 'c': 2.0})
+    multi_index.insert({'name': 'bool', 'c': False})
+    multi_index.insert({'name': 'fraction', 'c': 2.5})
+    MultiIndexSnapshot.write(multi_index, str(tmp_path / 'numeric.mvi'))
+    snapshot = MultiIndexSnapshot(str(tmp_path / 'numeric.mvi'))
+
+    for value in [1, 1.0, 2, 2.0, 2.5, 3, 'x']:
+        assert snapshot.get('c', value) == multi_index.get('c', value)
+    assert snapshot.get('c', 1.0)['name'] == 'int'
+
+    # booleans only match booleans
+    assert snapshot.get('c', True) is None
+    assert snapshot.get('c', False)['name'] == 'bool'
+    assert snapshot.get('c', 0) is None
+    assert snapshot.get('c', 0.0) is None
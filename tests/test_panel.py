@@ -0,0 +1,97 @@
+from datetime import date
+from pathlib import Path
+import pandas as pd
+import numpy as np
+import pytest
+
+from src.storage.bars import to_epoch_days
+from src.storage.panel import PricePanel
+from src.utils.mindex import MultiIndex
+
+
+def panel_bars(days: list, close: float) -> dict:
+    closes = [close + i for i in range(len(days))]
+    return {'date': np.array([to_epoch_days(date(2026, 1, d)) for d in days], dtype='int64'),
+            'close': closes, 'vwap': closes, 'volume': [1000.0] * len(days)}
+
+
+def test_panel_aligns_tickers_on_shared_calendar(tmp_path):
+    panel = PricePanel(str(tmp_path))
+    assert panel.read('close').shape == (0, 0)
+    assert panel.update({'A': panel_bars([5, 6, 7], 10.0), 'B': panel_bars([6, 8], 20.0), 'C': panel_bars([], 1.0)}) == 2
+
+    assert panel.get_dates() == [date(2026, 1, d) for d in [5, 6, 7, 8]]
+    assert panel.get_tickers() == ['A', 'B']
+    close = panel.read('close')
+    assert close.dtype == np.float32
+    np.testing.assert_array_equal(close, np.array([[10, np.nan], [11, 20], [12, np.nan], [np.nan, 21]], dtype='float32'))
+    assert panel.read_frame('volume').loc[date(2026, 1, 6), 'B'] == 1000.0
+
+
+def test_panel_appends_in_place_and_rebuilds_on_backfill(tmp_path):
+    panel = PricePanel(str(tmp_path), spare_dates=2, spare_tickers=1)
+    panel.update({'A': panel_bars([5, 6], 10.0)})
+    reader = PricePanel(str(tmp_path))
+
+    # new day and listing fit the spare capacity
+    panel.update({'A': panel_bars([7], 12.0), 'B': panel_bars([7], 20.0)})
+    assert panel.meta['generation'] == 1
+    assert reader.refresh()
+    np.testing.assert_array_equal(reader.read('close'), np.array([[10, np.nan], [11, np.nan], [12, 20]], dtype='float32'))
+    assert not reader.refresh()
+
+    # an earlier date rebuilds into a new generation
+    panel.update({'B': panel_bars([1], 19.0)})
+    assert panel.meta['generation'] == 2
+    assert sorted(p.name for p in Path(tmp_path).glob('close.*.bin')) == ['close.2.bin']
+    assert reader.refresh()
+    assert reader.get_dates()[0] == date(2026, 1, 1)
+    np.testing.assert_array_equal(reader.read('close')[:, 1], np.array([19, np.nan, np.nan, 20], dtype='float32'))
+
+
+def build_historical_quotes() -> MultiIndex:
+    multi_index = MultiIndex(['ticker'], default_index_key='ticker', safe_mode=True)
+    index = pd.Index([date(2026, 1, 5), date(2026, 1, 6)], name='date')
+    multi_index.insert({'ticker': 'A', 'historical_quotes': pd.DataFrame(
+        {'open': [1.0, 2.0], 'close': [1.5, 2.5], 'vwap': [1.2, 2.2], 'volume': [100.0, 200.0]}, index=index)})
+    return multi_index
+
+
+def test_panel_updates_from_historical_quotes(tmp_path):
+    multi_index = build_historical_quotes()
+    panel = PricePanel(str(tmp_path))
+    assert panel.update_from_historical_quotes(multi_index) == 1
+    np.testing.assert_array_equal(panel.read_frame('vwap')['A'].to_numpy(), np.array([1.2, 2.2], dtype='float32'))
+
+
+class FakeRedisConnector(object):
+
+    def __init__(self):
+        self.data = {}
+
+    def set(self, key: str, value) -> bool:
+        self.data[key] = value
+        return True
+
+
+class FakePolygonConnector(object):
+
+    def get_internal_tickers(self) -> MultiIndex:
+        return MultiIndex(['ticker'], default_index_key='ticker')
+
+    def get_internal_historical_quotes(self, internal_tickers: MultiIndex) -> MultiIndex:
+        return build_historical_quotes()
+
+
+def test_historical_loader_updates_price_panel(tmp_path, monkeypatch):
+    pytest.importorskip('cachelib')
+    from src.mem.historical import TickerHistoricalPricesMemLoader
+
+    monkeypatch.chdir(tmp_path)
+    redis_connector = FakeRedisConnector()
+    loader = TickerHistoricalPricesMemLoader(redis_connector, FakePolygonConnector(), str(tmp_path / 'panel'))
+    assert loader.update()
+    assert 'ticker_historical_prices' in redis_connector.data
+    panel = PricePanel(str(tmp_path / 'panel'))
+    assert panel.get_tickers() == ['A']
+    assert panel.read_frame('close').loc[date(2026, 1, 6), 'A'] == 2.5
@@ -0,0 +1,254 @@
+from datetime import date, datetime, timezone, timedelta
+import threading
+import pytest
+
+from src.api.polygon import PolygonAPIConnector
+from src.api.ratelimit import ThrottledError
+from src.storage.bars import BarStore, to_epoch_days
+from src.utils.functional.prices import parse_aggregate_bars
+from src.utils.mindex import MultiIndex
+from src.utils.logger import LoggingModule
+
+
+logger = LoggingModule('PolygonAPIConnectorTest').get_logger()
+
+
+def build_connector() -> PolygonAPIConnector:
+    connector = PolygonAPIConnector.__new__(PolygonAPIConnector)
+    connector.logger = logger
+    connector.max_concurrency = 1
+    connector._add_cache = lambda *args, **kwargs: None
+    connector.throttle_stats = {'throttled': 0, 'exhausted': 0, 'dropped': 0}
+    connector.throttle_stats_lock = threading.Lock()
+    connector.throttle_local = threading.local()
+    connector.flights = {}
+    connector.flight_lock = threading.Lock()
+    connector.single_flight_memo_secs = 0
+    return connector
+
+
+class ThrottlingSession(object):
+
+    def __init__(self):
+        self.requests = 0
+
+    def request(self, method: str, url: str, **kwargs):
+        self.requests += 1
+        return type('Response', (object,), {'status_code': 429, 'headers': {'Retry-After': '0'}})()
+
+
+class NoRateLimiter(object):
+
+    def acquire(self, host: str) -> None:
+        pass
+
+    def throttle(self, host: str, retry_after_secs: float=None) -> float:
+        return None
+
+
+def build_tickers(tickers: list) -> MultiIndex:
+    multi_index = MultiIndex(['ticker'], default_index_key='ticker', safe_mode=True)
+    for ticker in tickers:
+        multi_index.insert({'ticker': ticker})
+    return multi_index
+
+
+def test_ticker_details_skips_duplicate_symbol():
+    connector = build_connector()
+    symbols = {'GOOG': 'GOOGL', 'GOOGL': 'GOOGL', 'MSFT': 'MSFT'}
+    connector._fetch_ticker_details = lambda ticker: {'ticker': symbols[ticker], 'source': ticker, 'sic': None, 'sector': None}
+
+    details = PolygonAPIConnector.get_internal_ticker_details.__wrapped__(
+        connector, build_tickers(['GOOG', 'GOOGL', 'MSFT']), no_cache=True)
+
+    assert details is not None
+    assert len(details) == 2
+    assert details['GOOGL']['source'] == 'GOOG'
+    assert details['MSFT']['source'] == 'MSFT'
+
+
+def test_ticker_financials_skips_duplicate_and_failed_rows():
+    connector = build_connector()
+    connector._fetch_ticker_financials = lambda ticker: None if ticker == 'C' else {'ticker': 'A', 'source': ticker}
+
+    financials = PolygonAPIConnector.get_internal_ticker_financials.__wrapped__(
+        connector, build_tickers(['A', 'B', 'C']), no_cache=True)
+
+    assert financials is not None
+    assert len(financials) == 1
+    assert financials['A']['source'] == 'A'
+
+
+def test_ticker_dividends_skips_duplicate_record():
+    connector = build_connector()
+    connector._fetch_ticker_dividends = lambda ticker, ticker_quotes: {'ticker': 'A', 'dividend_yield': 0.01 if ticker == 'A' else 0.02}
+
+    dividends = PolygonAPIConnector.get_internal_ticker_dividends.__wrapped__(
+        connector, build_tickers(['A', 'B']), None, no_cache=True)
+
+    assert dividends is not None
+    assert [record['dividend_yield'] for record in dividends] == [0.01]
+
+
+def test_exhausted_throttle_retries_raise_and_count_dropped_rows():
+    connector = build_connector()
+    connector.http_session = ThrottlingSession()
+    connector.http_timeout = None
+    connector.max_throttle_retries = 2
+    connector.rate_limiter = NoRateLimiter()
+
+    with pytest.raises(ThrottledError):
+        connector._http_get('https://api.polygon.io/v1/meta/symbols/A/company')
+    assert connector.http_session.requests == 3
+
+    def fetch(ticker: str) -> dict:
+        try:
+            if ticker == 'B': connector._http_get('https://api.polygon.io/v1/meta/symbols/B/company')
+            return {'ticker': ticker}
+        except Exception:
+            return None
+
+    assert connector._map_concurrently(fetch, ['A', 'B', 'C']) == [{'ticker': 'A'}, None, {'ticker': 'C'}]
+    assert connector.get_throttle_stats() == {'throttled': 6, 'exhausted': 2, 'dropped': 1}
+
+
+def grouped_result(ticker: str, day: date, close: float) -> dict:
+    t = int(datetime(day.year, day.month, day.day, tzinfo=timezone.utc).timestamp() * 1000)
+    return {'T': ticker, 't': t, 'o': close, 'h': close, 'l': close, 'c': close, 'vw': close, 'v': 100.0, 'n': 10}
+
+
+def test_grouped_refresh_skips_today_and_retries_failed_days(tmp_path):
+    connector = build_connector()
+    connector.bar_store = BarStore(str(tmp_path))
+    start_date = date.today() - timedelta(days=10)
+    for ticker in ['A', 'B']:
+        connector.bar_store.append(ticker, parse_aggregate_bars([grouped_result(ticker, start_date, 1.0)]))
+
+    # fail the first request for one day
+    requested_days = []
+    failed_day = [d for d in (start_date + timedelta(days=i) for i in range(1, 10)) if d.weekday() < 5][0]
+    def fetch_grouped_quotes(day: date) -> list:
+        requested_days.append(day)
+        if day == failed_day and requested_days.count(day) == 1: return None
+        return [grouped_result(ticker, day, 2.0) for ticker in ['A', 'B', 'C']]
+    connector._fetch_grouped_quotes = fetch_grouped_quotes
+
+    range_tickers = connector._update_grouped_historical_quotes(['A', 'B', 'C'], 30, False)
+
+    assert range_tickers == ['C']
+    assert date.today() not in requested_days
+    assert requested_days.count(failed_day) == 2
+    last_day = max(d for d in requested_days)
+    for ticker in ['A', 'B']:
+        dates = connector.bar_store.read(ticker, ['date'])['date']
+        assert dates[-1] == to_epoch_days(last_day)
+        assert to_epoch_days(failed_day) in dates
+
+
+class SequencedSession(object):
+
+    def __init__(self, status_codes: list):
+        self.status_codes = status_codes
+
+    def request(self, method: str, url: str, **kwargs):
+        return type('Response', (object,), {'status_code': self.status_codes.pop(0), 'headers': {'Retry-After': '3'}})()
+
+
+class RecordingRateLimiter(NoRateLimiter):
+
+    def __init__(self):
+        self.throttles = []
+
+    def throttle(self, host: str, retry_after_secs: float=None) -> float:
+        self.throttles.append((host, retry_after_secs))
+        return 5.0
+
+
+def test_throttled_request_retries_after_backing_off():
+    connector = build_connector()
+    connector.http_session = SequencedSession([429, 429, 200])
+    connector.http_timeout = None
+    connector.max_throttle_retries = 2
+    connector.rate_limiter = RecordingRateLimiter()
+
+    response = connector._http_get('https://api.polygon.io/v1/meta/symbols/A/company')
+    assert response.status_code == 200
+    assert connector.rate_limiter.throttles == [('api.polygon.io', 3.0), ('api.polygon.io', 3.0)]
+    assert connector.get_throttle_stats() == {'throttled': 2, 'exhausted': 0, 'dropped': 0}
+
+
+
+TICKERS = ['AA', 'AB', 'AC', 'BA', 'BB', 'CA', 'ZZ']
+
+
+class TickersResponse(object):
+
+    def __init__(self, json_response: dict):
+        self.status_code = 200
+        self.headers = {}
+        self.json_response = json_response
+
+    def raise_for_status(self) -> None:
+        pass
+
+    def json(self) -> dict:
+        return self.json_response
+
+
+class TickersSession(object):
+    """
+        Serves the TICKERS universe two rows per page, filtered by the
+        ticker.gte/ticker.lt params and paged with next_url cursors.
+    """
+
+    def __init__(self):
+        self.ranges = []
+        self.lock = threading.Lock()
+
+    def request(self, method: str, url: str, params: dict=None, headers: dict=None, timeout=None):
+        if params is not None:
+            ticker_gte, ticker_lt = params.get('ticker.gte'), params.get('ticker.lt')
+            with self.lock:
+                self.ranges.append((ticker_gte, ticker_lt))
+            offset = 0
+        else:
+            ticker_gte, ticker_lt, offset = url.split('?')[1].split(',')
+            ticker_gte, ticker_lt, offset = ticker_gte or None, ticker_lt or None, int(offset)
+
+        tickers = [t for t in TICKERS if (ticker_gte is None or t >= ticker_gte) and (ticker_lt is None or t < ticker_lt)]
+        json_response = {'status': 'OK', 'results': [{
+            'ticker': t, 'name': t + ' Corp', 'locale': 'us', 'primary_exchange': 'XNAS',
+            'currency_name': 'usd', 'last_updated_utc': '2026-10-16T00:00:00Z'
+        } for t in tickers[offset:offset + 2]]}
+        if offset + 2 < len(tickers):
+            json_response['next_url'] = 'https://api.test/next?{},{},{}'.format(ticker_gte or '', ticker_lt or '', offset + 2)
+        return TickersResponse(json_response)
+
+
+def build_tickers_connector(max_concurrency: int) -> PolygonAPIConnector:
+    connector = build_connector()
+    connector.max_concurrency = max_concurrency
+    connector.api_domain = 'https://api.test/'
+    connector.api_key = 'key'
+    connector.http_session = TickersSession()
+    connector.http_timeout = None
+    connector.max_throttle_retries = 0
+    connector.rate_limiter = NoRateLimiter()
+    return connector
+
+
+@pytest.mark.parametrize('max_concurrency', [1, 4])
+def test_ticker_ranges_are_paged_and_merged_in_order(max_concurrency):
+    connector = build_tickers_connector(max_concurrency)
+    multi_index = PolygonAPIConnector.get_internal_tickers.__wrapped__(connector, no_cache=True, range_bounds=('B', 'C'))
+
+    assert [r['ticker'] for r in multi_index] == TICKERS
+    assert sorted(connector.http_session.ranges, key=str) == sorted([(None, 'B'), ('B', 'C'), ('C', None)], key=str)
+    assert multi_index['CA']['currency_code'] == 'USD'
+    assert [r['ticker'] for r in multi_index.get_group('exchange_mic', 'XNAS')] == TICKERS
+
+
+def test_ticker_range_past_max_iters_fails():
+    connector = build_tickers_connector(1)
+    assert PolygonAPIConnector.get_internal_tickers.__wrapped__(connector, max_iters=1, no_cache=True, range_bounds=()) is None
+    assert PolygonAPIConnector.get_internal_tickers.__wrapped__(connector, max_iters=3, no_cache=True, range_bounds=()) is not None
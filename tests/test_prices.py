@@ -0,0 +1,50 @@
+import numpy as np
+
+from src.utils.functional.prices import parse_aggregate_bars, merge_bars, MS_PER_DAY
+
+
+def bar_result(day: int, close: float, **kwargs) -> dict:
+    result = {'t': day * MS_PER_DAY + 4 * 3600000, 'o': close, 'h': close, 'l': close, 'c': close,
+              'vw': close, 'v': 100.0, 'n': 10}
+    result.update(kwargs)
+    return result
+
+
+def test_parse_aggregate_bars_types_and_missing_fields():
+    bars = parse_aggregate_bars([bar_result(1, 1.0), {'t': 2 * MS_PER_DAY, 'c': 2.0}])
+
+    assert bars['date'].tolist() == [1, 2]
+    assert bars['date'].dtype == np.int64 and bars['transactions'].dtype == np.int64
+    assert bars['close'].tolist() == [1.0, 2.0]
+    assert np.isnan(bars['vwap'][1]) and np.isnan(bars['volume'][1])
+    assert bars['transactions'].tolist() == [10, 0]
+
+
+def test_parse_aggregate_bars_sorts_and_keeps_first_bar_per_date():
+    bars = parse_aggregate_bars([bar_result(3, 3.0), bar_result(1, 1.0), bar_result(3, 3.5), bar_result(2, 2.0)])
+    assert bars['date'].tolist() == [1, 2, 3]
+    assert bars['close'].tolist() == [1.0, 2.0, 3.0]
+
+    empty_bars = parse_aggregate_bars([])
+    assert len(empty_bars['date']) == 0 and set(empty_bars) == set(bars)
+
+
+def test_merge_bars_appends_newer_bars():
+    old_bars = parse_aggregate_bars([bar_result(1, 1.0), bar_result(2, 2.0)])
+    new_bars = parse_aggregate_bars([bar_result(3, 3.0)])
+    merged_bars = merge_bars(old_bars, new_bars)
+
+    assert merged_bars['date'].tolist() == [1, 2, 3]
+    assert merged_bars['close'].tolist() == [1.0, 2.0, 3.0]
+    assert merge_bars(old_bars, parse_aggregate_bars([])) is old_bars
+    assert merge_bars(parse_aggregate_bars([]), new_bars) is new_bars
+
+
+def test_merge_bars_prefers_new_bars_on_shared_dates():
+    old_bars = parse_aggregate_bars([bar_result(1, 1.0), bar_result(3, 3.0), bar_result(5, 5.0), bar_result(7, 7.0)])
+    new_bars = parse_aggregate_bars([bar_result(2, 20.0), bar_result(3, 30.0), bar_result(7, 70.0), bar_result(8, 80.0)])
+    merged_bars = merge_bars(old_bars, new_bars)
+
+    assert merged_bars['date'].tolist() == [1, 2, 3, 5, 7, 8]
+    assert merged_bars['close'].tolist() == [1.0, 20.0, 30.0, 5.0, 70.0, 80.0]
+    assert all(len(values) == 6 for values in merged_bars.values())
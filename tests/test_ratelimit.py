@@ -0,0 +1,56 @@
+from email.utils import format_datetime
+from datetime import datetime, timezone, timedelta
+import pytest
+
+from src.api.ratelimit import TokenBucketRateLimiter
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def time(self) -> float:
+        return self.now
+
+    def sleep(self, secs: float) -> None:
+        self.sleeps.append(secs)
+        self.now += secs
+
+
+@pytest.fixture
+def clock(monkeypatch) -> FakeClock:
+    clock = FakeClock()
+    monkeypatch.setattr('src.api.ratelimit.time', clock)
+    return clock
+
+
+def test_local_bucket_allows_burst_then_paces(clock):
+    rate_limiter = TokenBucketRateLimiter({'api.test': {'rate-per-sec': 10, 'burst': 3}})
+    assert [rate_limiter.acquire('api.test') for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert rate_limiter.acquire('api.test') == pytest.approx(0.1)
+    assert rate_limiter.acquire('other.test') == 0.0
+    assert clock.sleeps == [0.1]
+
+
+def test_throttle_cuts_rate_to_floor_and_blocks(clock):
+    rate_limiter = TokenBucketRateLimiter({'api.test': {'rate-per-sec': 10, 'min-rate-per-sec': 3}})
+    assert rate_limiter.throttle('api.test', 2) == 5
+    assert rate_limiter.throttle('api.test') == 3
+    assert rate_limiter.throttle('other.test', 2) is None
+
+    # blocked for the retry time, refilling at the reduced rate meanwhile
+    assert rate_limiter.acquire('api.test') == pytest.approx(2.0)
+    bucket = rate_limiter.local_buckets['api.test']
+    assert bucket['tokens'] == pytest.approx(2 * 3 - 1)
+    assert bucket['rate'] == pytest.approx(3 + 10 * 0.01)
+
+
+def test_parse_retry_after():
+    assert TokenBucketRateLimiter.parse_retry_after('5') == 5.0
+    assert TokenBucketRateLimiter.parse_retry_after('-1') == 0.0
+    assert TokenBucketRateLimiter.parse_retry_after(None) is None
+    assert TokenBucketRateLimiter.parse_retry_after('soon') is None
+    retry_dt = datetime.now(tz=timezone.utc) + timedelta(seconds=30)
+    assert 28 < TokenBucketRateLimiter.parse_retry_after(format_datetime(retry_dt, usegmt=True)) <= 30